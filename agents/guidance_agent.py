@@ -1,7 +1,9 @@
-from typing import Dict, Any
+from typing import Dict, Any, Generator
 from llm.ollama_client import OllamaClient
+from llm.async_ollama_client import AsyncOllamaClient
 from llm.prompts import GUIDANCE_PROMPT
 from memory.context_store import MedicalContextStore
+from tools.context_builder import context_budget, serialize_context
 
 
 class GuidanceAgent:
@@ -13,29 +15,68 @@ class GuidanceAgent:
     - Encourages professional consultation
     """
 
-    def __init__(self, context_store: MedicalContextStore):
-        self.context_store = context_store
+    def __init__(self):
         self.llm = OllamaClient()
+        self.async_llm = AsyncOllamaClient()
 
-    def execute(self) -> Dict[str, Any]:
+    def execute(self, context_store: MedicalContextStore) -> Dict[str, Any]:
         """
-        Generate medical guidance from structured context.
+        Generate medical guidance from the request's structured context.
         """
 
-        context = self.context_store.get_context()
+        guidance_text = self.llm.generate_text(self._build_prompt(context_store))
 
-        prompt = f"""
+        return {
+            "status": "success",
+            "guidance": guidance_text
+        }
+
+    async def aexecute(self, context_store: MedicalContextStore) -> Dict[str, Any]:
+        """
+        Async variant of execute().
+        """
+
+        guidance_text = await self.async_llm.generate_text(
+            self._build_prompt(context_store)
+        )
+
+        return {
+            "status": "success",
+            "guidance": guidance_text
+        }
+
+    def execute_stream(
+        self,
+        context_store: MedicalContextStore
+    ) -> Generator[str, None, Dict[str, Any]]:
+        """
+        Streaming variant of execute().
+        Yields guidance tokens and returns the final output dict.
+        """
+
+        tokens = []
+        for token in self.llm.stream_text(self._build_prompt(context_store)):
+            tokens.append(token)
+            yield token
+
+        return {
+            "status": "success",
+            "guidance": "".join(tokens).strip()
+        }
+
+    def _build_prompt(self, context_store: MedicalContextStore) -> str:
+        template = f"""
 {GUIDANCE_PROMPT}
 
 PATIENT CONTEXT:
-{context}
+{{context}}
 
 Generate clear, cautious medical guidance.
 """
 
-        guidance_text = self.llm.generate_text(prompt)
+        # Compact, budgeted context instead of the raw dict, so prompt
+        # size stays bounded as report answers accumulate
+        budget = context_budget(self.llm.num_ctx, template)
+        context = serialize_context(context_store.get_context(), budget)
 
-        return {
-            "status": "success",
-            "guidance": guidance_text
-        }
+        return template.replace("{context}", context)
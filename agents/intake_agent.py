@@ -12,11 +12,14 @@ class IntakeAgent:
     - NO interpretation
     """
 
-    def __init__(self, context_store: MedicalContextStore):
-        self.context_store = context_store
-
-    def execute(self, intake_data: Dict[str, Any]) -> Dict[str, Any]:
+    def execute(
+        self,
+        intake_data: Dict[str, Any],
+        context_store: MedicalContextStore
+    ) -> Dict[str, Any]:
         """
+        context_store: the request's medical context
+
         intake_data example:
         {
             "demographics": {...},
@@ -34,11 +37,11 @@ class IntakeAgent:
         vitals = intake_data.get("vitals", {})
 
         # Update structured medical context
-        self.context_store.update_demographics(demographics)
-        self.context_store.update_symptoms(symptoms)
-        self.context_store.update_medications(medications)
-        self.context_store.update_allergies(allergies)
-        self.context_store.update_vitals(vitals)
+        context_store.update_demographics(demographics)
+        context_store.update_symptoms(symptoms)
+        context_store.update_medications(medications)
+        context_store.update_allergies(allergies)
+        context_store.update_vitals(vitals)
 
         structured_context = {
             "demographics": demographics,
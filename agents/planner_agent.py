@@ -15,9 +15,13 @@ class PlannerAgent:
     def __init__(self):
         pass
 
-    def plan(self, inputs: Dict[str, Any]) -> List[str]:
+    def plan(self, inputs: Dict[str, Any]) -> Dict[str, List[str]]:
         """
-        Decide agent execution order based on available inputs.
+        Decide which agents run and what each one waits on.
+
+        Returns a dependency graph {agent: [agents it depends on]},
+        listed in a valid execution order. Agents whose dependencies
+        are all complete may run concurrently.
 
         inputs example:
         {
@@ -28,24 +32,25 @@ class PlannerAgent:
         }
         """
 
-        plan = []
+        graph: Dict[str, List[str]] = {}
 
-        # Intake is ALWAYS first if provided
+        # Intake, vision and RAG each write a separate part of the
+        # context and do not depend on one another
         if inputs.get("intake"):
-            plan.append("intake_agent")
+            graph["intake_agent"] = []
 
         # Vision only if image exists
         if inputs.get("image_path"):
-            plan.append("vision_agent")
+            graph["vision_agent"] = []
 
         # RAG only if reports exist AND user asked something
         if inputs.get("report_uploaded") and inputs.get("user_query"):
-            plan.append("rag_report_agent")
+            graph["rag_report_agent"] = []
 
-        # Guidance is generated after data is gathered
-        plan.append("guidance_agent")
+        # Guidance is generated after ALL data is gathered
+        graph["guidance_agent"] = list(graph)
 
         # Safety agent ALWAYS runs last
-        plan.append("safety_agent")
+        graph["safety_agent"] = ["guidance_agent"]
 
-        return plan
+        return graph
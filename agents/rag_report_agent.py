@@ -1,8 +1,27 @@
-from typing import Dict, Any, List
+import asyncio
+import hashlib
+import os
+from typing import Dict, Any, List, Generator, Optional, Tuple
 from llm.ollama_client import OllamaClient
+from llm.async_ollama_client import AsyncOllamaClient
 from llm.prompts import RAG_REPORT_PROMPT
-from vector_store.chroma_store import ChromaVectorStore
+from llm.semantic_cache import SemanticAnswerCache
+from vector_store.base import VectorStore, create_vector_store, partition_key
+from vector_store.bm25_index import BM25Index, reciprocal_rank_fusion
 from memory.context_store import MedicalContextStore
+from tools.pdf_ingester import iter_pdf_pages, remove_running_lines
+from tools.text_utils import chunk_pages
+from tools.context_builder import context_budget, select_documents
+
+# Most chunks placed in the prompt
+RAG_TOP_K = 3
+
+# Depth of each ranked list (dense, BM25) fed into rank fusion
+RETRIEVAL_CANDIDATES = 10
+
+# Reuse answers to re-worded questions over unchanged reports. Off by
+# default: near-identical embeddings can still be different questions
+ANSWER_CACHE_ENABLED = os.environ.get("RAG_ANSWER_CACHE", "0") == "1"
 
 
 class RAGReportAgent:
@@ -12,44 +31,272 @@ class RAGReportAgent:
     - Answers ONLY from retrieved documents
     - Refuses if evidence is insufficient
     - No hallucination by design
+
+    The vector store backend comes from VECTOR_STORE_BACKEND unless
+    one is passed in. Retrieval is hybrid: dense results and an
+    in-process BM25 index (for exact lab names) are merged with
+    reciprocal rank fusion.
+
+    With RAG_ANSWER_CACHE=1, answers are cached semantically (see
+    SemanticAnswerCache): a re-worded question over the same reports,
+    naming the same report terms and numbers, gets the earlier
+    grounded answer without an LLM call.
     """
 
-    def __init__(self, context_store: MedicalContextStore):
-        self.context_store = context_store
-        self.vector_store = ChromaVectorStore()
+    def __init__(
+        self,
+        vector_store: Optional[VectorStore] = None,
+        answer_cache: Optional[SemanticAnswerCache] = None
+    ):
+        self.vector_store = vector_store or create_vector_store()
+        self.lexical_index = BM25Index(
+            loader=lambda partition: self.vector_store.documents(partition=partition)
+        )
+        self.answer_cache = answer_cache or (
+            SemanticAnswerCache() if ANSWER_CACHE_ENABLED else None
+        )
         self.llm = OllamaClient()
+        self.async_llm = AsyncOllamaClient()
 
-    def ingest_reports(self, documents: List[Dict[str, str]]):
+    def ingest_reports(
+        self,
+        documents: List[Dict[str, Any]],
+        partition: Optional[Dict[str, str]] = None
+    ):
         """
         documents: [
-            {"id": str, "text": str, "source": str}
+            {"id": str, "source": str,
+             "text": str,                              # or:
+             "pages": [str, ...],                      # page texts, or:
+             "path": str}                              # internal: a stored PDF
         ]
+        partition: {"tenant_id": ..., "patient_id": ..., "session_id": ...}
+                   chunks are tagged with these ids and stored in
+                   that partition only
+
+        Each report is split into overlapping, token-budgeted chunks
+        with page provenance. Chunks are content-addressed, so only
+        chunks not already stored are embedded, and chunks left over
+        from a previous version of the same report id are removed.
         """
-        self.vector_store.add_documents(documents)
+        key = partition_key(partition)
+        tags = {k: v for k, v in (partition or {}).items() if v}
+        fingerprint = self.lexical_index.fingerprint(key)
+
+        for doc in documents:
+            chunks = list(self._chunk_document(doc, tags))
+            keep_ids = [chunk["id"] for chunk in chunks]
+
+            self.vector_store.add_documents(chunks, partition=key)
+            self.vector_store.remove_stale(doc["id"], keep_ids, partition=key)
+
+            self.lexical_index.add_documents(chunks, partition=key)
+            self.lexical_index.remove_stale(doc["id"], keep_ids, partition=key)
+
+        if self.answer_cache is not None and self.lexical_index.fingerprint(key) != fingerprint:
+            self.answer_cache.invalidate(key)
+
+    def _chunk_document(self, doc: Dict[str, Any], tags: Dict[str, str]):
+        if doc.get("path"):
+            # Server-side PDF: stream pages straight into the chunker
+            numbered = iter_pdf_pages(doc["path"])
+        else:
+            pages = remove_running_lines(doc["pages"]) if doc.get("pages") else [doc["text"]]
+            numbered = ((i + 1, page) for i, page in enumerate(pages))
+
+        for index, chunk in enumerate(chunk_pages(numbered)):
+            metadata = {
+                **tags,
+                "report_id": doc["id"],
+                "chunk": index,
+                "page_start": chunk["page_start"],
+                "page_end": chunk["page_end"],
+                "char_start": chunk["char_start"],
+                "char_end": chunk["char_end"]
+            }
+            if chunk["section"]:
+                metadata["section"] = chunk["section"]
+
+            yield {
+                # Content address: same text in the same report, same id
+                "id": f"{doc['id']}::{_content_hash(chunk['text'])}",
+                "text": chunk["text"],
+                "source": doc["source"],
+                "metadata": metadata
+            }
 
-    def execute(self, query: str) -> Dict[str, Any]:
+    async def aingest_reports(
+        self,
+        documents: List[Dict[str, Any]],
+        partition: Optional[Dict[str, str]] = None
+    ):
+        """
+        Async variant of ingest_reports().
+        The vector store is synchronous, so it runs in a worker thread.
+        """
+        await asyncio.to_thread(self.ingest_reports, documents, partition)
+
+    def execute(
+        self,
+        query: str,
+        context_store: MedicalContextStore,
+        partition: Optional[Dict[str, str]] = None
+    ) -> Dict[str, Any]:
         """
         query: user question about uploaded reports
+        context_store: the request's medical context
+        partition: restrict retrieval to this patient/session's reports
         """
 
-        retrieved_docs = self.vector_store.query(query)
+        cached, cache_key = self._cached_answer(query, partition)
+        if cached is not None:
+            return self._record_answer(query, cached["answer"], cached["sources"], context_store)
+
+        retrieved_docs = self._retrieve(query, partition)
 
         if not retrieved_docs:
-            return {
-                "answer": (
-                    "The provided documents do not contain sufficient "
-                    "information to answer this question safely."
-                ),
-                "sources": []
-            }
+            return self._insufficient_evidence()
+
+        answer = self.llm.generate_text(self._build_prompt(query, retrieved_docs))
+
+        return self._cache_answer(cache_key, self._record_answer(
+            query, answer, _sources(retrieved_docs), context_store
+        ))
+
+    async def aexecute(
+        self,
+        query: str,
+        context_store: MedicalContextStore,
+        partition: Optional[Dict[str, str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Async variant of execute().
+        """
+
+        cached, cache_key = await asyncio.to_thread(self._cached_answer, query, partition)
+        if cached is not None:
+            return self._record_answer(query, cached["answer"], cached["sources"], context_store)
+
+        retrieved_docs = await asyncio.to_thread(self._retrieve, query, partition)
+
+        if not retrieved_docs:
+            return self._insufficient_evidence()
+
+        answer = await self.async_llm.generate_text(
+            self._build_prompt(query, retrieved_docs)
+        )
 
+        return self._cache_answer(cache_key, self._record_answer(
+            query, answer, _sources(retrieved_docs), context_store
+        ))
+
+    def execute_stream(
+        self,
+        query: str,
+        context_store: MedicalContextStore,
+        partition: Optional[Dict[str, str]] = None
+    ) -> Generator[str, None, Dict[str, Any]]:
+        """
+        Streaming variant of execute().
+        Yields answer tokens; the generator's return value is the
+        same dict execute() would return.
+        """
+
+        cached, cache_key = self._cached_answer(query, partition)
+        if cached is not None:
+            yield cached["answer"]
+            return self._record_answer(query, cached["answer"], cached["sources"], context_store)
+
+        retrieved_docs = self._retrieve(query, partition)
+
+        if not retrieved_docs:
+            output = self._insufficient_evidence()
+            yield output["answer"]
+            return output
+
+        tokens = []
+        for token in self.llm.stream_text(self._build_prompt(query, retrieved_docs)):
+            tokens.append(token)
+            yield token
+
+        return self._cache_answer(cache_key, self._record_answer(
+            query, "".join(tokens).strip(), _sources(retrieved_docs), context_store
+        ))
+
+    # --------------------------------------------------
+    # INTERNAL METHODS
+    # --------------------------------------------------
+
+    def _cached_answer(
+        self,
+        query: str,
+        partition: Optional[Dict[str, str]]
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[tuple]]:
+        """
+        (cached answer or None, key to store a fresh answer under).
+        The corpus fingerprint is taken before retrieval, so an answer
+        is never filed under a report set it wasn't grounded in.
+        """
+        if self.answer_cache is None:
+            return None, None
+
+        key = partition_key(partition)
+        if self.lexical_index.is_lexical(query, partition=key):
+            # Answered from BM25 alone; don't embed just for the cache
+            return None, None
+
+        fingerprint = self.lexical_index.fingerprint(key)
+        # Same embedding text as dense retrieval, so that lookup is a
+        # hit in the embedding cache
+        vector = self.vector_store.embedding_generator.embed_query(query)
+        terms = self.lexical_index.key_terms(query, partition=key)
+
+        cache_key = (vector, key, fingerprint, terms)
+        return self.answer_cache.get(*cache_key), cache_key
+
+    def _cache_answer(self, cache_key: Optional[tuple], output: Dict[str, Any]) -> Dict[str, Any]:
+        if cache_key is not None:
+            self.answer_cache.set(*cache_key, output)
+        return output
+
+    def _retrieve(
+        self,
+        query: str,
+        partition: Optional[Dict[str, str]]
+    ) -> List[Dict[str, Any]]:
+        key = partition_key(partition)
+
+        lexical = self.lexical_index.query(query, top_k=RETRIEVAL_CANDIDATES, partition=key)
+
+        # Keyword queries ("troponin", "HbA1c trend") that BM25 fully
+        # covers skip the embedding round trip
+        if lexical and self.lexical_index.is_lexical(query, partition=key):
+            ranked = lexical
+        else:
+            dense = self.vector_store.query(query, top_k=RETRIEVAL_CANDIDATES, partition=key)
+            ranked = reciprocal_rank_fusion([dense, lexical], top_k=RETRIEVAL_CANDIDATES)
+
+        # Drop near-duplicates and trim to the prompt's token budget
+        budget = context_budget(self.llm.num_ctx, self._build_prompt(query, []))
+        return select_documents(query, ranked, budget, max_documents=RAG_TOP_K)
+
+    def _insufficient_evidence(self) -> Dict[str, Any]:
+        return {
+            "answer": (
+                "The provided documents do not contain sufficient "
+                "information to answer this question safely."
+            ),
+            "sources": []
+        }
+
+    def _build_prompt(self, query: str, retrieved_docs: List[Dict[str, str]]) -> str:
         # Build grounded context
         context_text = "\n\n".join(
-            f"[Source: {doc['source']}]\n{doc['text']}"
+            f"[Source: {_cite(doc)}]\n{doc['text']}"
             for doc in retrieved_docs
         )
 
-        prompt = f"""
+        return f"""
 {RAG_REPORT_PROMPT}
 
 DOCUMENTS:
@@ -59,16 +306,38 @@ QUESTION:
 {query}
 """
 
-        answer = self.llm.generate_text(prompt)
-
+    def _record_answer(
+        self,
+        query: str,
+        answer: str,
+        sources: List[str],
+        context_store: MedicalContextStore
+    ) -> Dict[str, Any]:
         # Store summary in medical context
-        self.context_store.add_report_summary({
+        context_store.add_report_summary({
             "question": query,
             "answer": answer,
-            "sources": list(set(doc["source"] for doc in retrieved_docs))
+            "sources": sources
         })
 
         return {
             "answer": answer,
-            "sources": list(set(doc["source"] for doc in retrieved_docs))
+            "sources": sources
         }
+
+
+def _sources(retrieved_docs: List[Dict[str, Any]]) -> List[str]:
+    return list(set(doc["source"] for doc in retrieved_docs))
+
+
+def _cite(doc: Dict[str, Any]) -> str:
+    page = doc.get("page_start")
+    if not page:
+        return doc["source"]
+    if doc.get("page_end") and doc["page_end"] != page:
+        return f"{doc['source']}, pp. {page}-{doc['page_end']}"
+    return f"{doc['source']}, p. {page}"
+
+
+def _content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
@@ -1,5 +1,6 @@
 from typing import Dict, Any
 from llm.ollama_client import OllamaClient
+from llm.async_ollama_client import AsyncOllamaClient
 from llm.prompts import SAFETY_PROMPT
 
 
@@ -17,6 +18,7 @@ class SafetyAgent:
 
     def __init__(self):
         self.llm = OllamaClient()
+        self.async_llm = AsyncOllamaClient()
 
         self.blocked_terms = [
             "diagnosis",
@@ -42,13 +44,33 @@ class SafetyAgent:
         text = response.get("guidance", "")
 
         # Step 1: Hard safety check (string-based)
-        lowered = text.lower()
-        for term in self.blocked_terms:
-            if term in lowered:
-                text = self._rewrite_unsafely_strong_text(text)
-                break
+        if self._contains_blocked_terms(text):
+            text = self._rewrite_unsafely_strong_text(text)
 
         # Step 2: Ensure disclaimer is present
+        return self._finalize(text)
+
+    async def aexecute(self, response: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Async variant of execute().
+        """
+
+        text = response.get("guidance", "")
+
+        if self._contains_blocked_terms(text):
+            text = await self.async_llm.generate_text(self._rewrite_prompt(text))
+
+        return self._finalize(text)
+
+    # --------------------------------------------------
+    # INTERNAL METHODS
+    # --------------------------------------------------
+
+    def _contains_blocked_terms(self, text: str) -> bool:
+        lowered = text.lower()
+        return any(term in lowered for term in self.blocked_terms)
+
+    def _finalize(self, text: str) -> Dict[str, Any]:
         if "consult" not in text.lower():
             text += self._default_disclaimer()
 
@@ -57,16 +79,15 @@ class SafetyAgent:
             "final_output": text
         }
 
-    # --------------------------------------------------
-    # INTERNAL METHODS
-    # --------------------------------------------------
-
     def _rewrite_unsafely_strong_text(self, text: str) -> str:
         """
         Use LLM to soften unsafe medical language.
         """
 
-        prompt = f"""
+        return self.llm.generate_text(self._rewrite_prompt(text))
+
+    def _rewrite_prompt(self, text: str) -> str:
+        return f"""
 {SAFETY_PROMPT}
 
 CONTENT TO REVIEW:
@@ -75,8 +96,6 @@ CONTENT TO REVIEW:
 Rewrite this to be medically safe.
 """
 
-        return self.llm.generate_text(prompt)
-
     def _default_disclaimer(self) -> str:
         return (
             "\n\n⚠️ **Important Medical Disclaimer**:\n"
@@ -1,9 +1,24 @@
-from typing import Dict, Any
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
 from llm.ollama_client import OllamaClient
-from llm.prompts import VISION_PROMPT
-from tools.image_loader import load_medical_image
+from llm.async_ollama_client import AsyncOllamaClient
+from llm.prompts import VISION_PROMPT, VISION_PROMPT_VERSION
+from llm.response_cache import ResponseCache
+from tools.image_loader import prepare_vision_image
+from tools.dicom_loader import is_dicom_path, prepare_vision_series
 from memory.context_store import MedicalContextStore
 
+# Persistent cache of vision findings, shared across sessions
+VISION_CACHE_PATH = "./vision_cache.db"
+VISION_CACHE_ENABLED = os.environ.get("VISION_CACHE", "1") == "1"
+VISION_CACHE_MAX_ENTRIES = 5000
+VISION_CACHE_TTL_SECONDS = 30 * 24 * 60 * 60
+
+# Concurrent vision calls for the slices of one DICOM series
+MAX_PARALLEL_SLICES = int(os.environ.get("MAX_PARALLEL_SLICES", "4"))
+
 
 class VisionAgent:
     """
@@ -13,39 +28,173 @@ class VisionAgent:
     - Produces observations ONLY
     - NO diagnosis
     - NO medical claims
+
+    Findings are cached by decoded-pixel hash + vision model + prompt
+    version (VISION_CACHE=0 disables), so re-analyzing the same scan,
+    in any container format or session, skips the model call.
+
+    DICOM series (a .dcm file or a directory of them) are reduced to a
+    bounded set of representative slices, sent either as one montage
+    or as one call per slice, in parallel (see tools/dicom_loader).
     """
 
-    def __init__(self, context_store: MedicalContextStore):
-        self.context_store = context_store
+    def __init__(self, cache: Optional[ResponseCache] = None):
         self.llm = OllamaClient()
+        self.async_llm = AsyncOllamaClient()
+        self.cache = cache or (
+            ResponseCache(
+                disk_path=VISION_CACHE_PATH,
+                max_memory_entries=256,
+                max_disk_entries=VISION_CACHE_MAX_ENTRIES,
+                ttl_seconds=VISION_CACHE_TTL_SECONDS
+            )
+            if VISION_CACHE_ENABLED else None
+        )
 
-    def execute(self, image_path: str) -> Dict[str, Any]:
+    def execute(
+        self,
+        image_path: str,
+        context_store: MedicalContextStore
+    ) -> Dict[str, Any]:
         """
         image_path: path to uploaded medical image
+        context_store: the request's medical context
         """
 
-        # Step 1: Validate & load image (no AI yet)
-        image_info = load_medical_image(image_path)
+        # Step 1: Validate, decode once, downscale & re-encode (no AI yet)
+        image_info = _prepare(image_path)
+        frames = image_info.get("frames") or [image_info]
+
+        cache_keys = [self._cache_key(frame) for frame in frames]
+        responses = [
+            self.cache.get(key) if self.cache is not None else None
+            for key in cache_keys
+        ]
+        missing = [i for i, text in enumerate(responses) if text is None]
+
+        # Step 2: Call Ollama vision model with the compact payload(s)
+        def analyze(i: int) -> str:
+            return self.llm.analyze_image(
+                image=frames[i]["image_bytes"],
+                prompt=self._build_prompt(image_info, frames[i])
+            )
+
+        if len(missing) > 1:
+            with ThreadPoolExecutor(max_workers=MAX_PARALLEL_SLICES) as pool:
+                results = list(pool.map(analyze, missing))
+        else:
+            results = [analyze(i) for i in missing]
+
+        for i, text in zip(missing, results):
+            responses[i] = text
+            if self.cache is not None:
+                self.cache.set(cache_keys[i], text)
+
+        return self._record_findings(
+            self._combine(frames, responses), context_store
+        )
+
+    async def aexecute(
+        self,
+        image_path: str,
+        context_store: MedicalContextStore
+    ) -> Dict[str, Any]:
+        """
+        Async variant of execute().
+        """
 
-        # Step 2: Vision model prompt
-        prompt = f"""
+        image_info = await asyncio.to_thread(_prepare, image_path)
+        frames = image_info.get("frames") or [image_info]
+
+        cache_keys = [self._cache_key(frame) for frame in frames]
+        responses: List[Optional[str]] = [None] * len(frames)
+        if self.cache is not None:
+            responses = [
+                await asyncio.to_thread(self.cache.get, key) for key in cache_keys
+            ]
+        missing = [i for i, text in enumerate(responses) if text is None]
+
+        limit = asyncio.Semaphore(MAX_PARALLEL_SLICES)
+
+        async def analyze(i: int) -> str:
+            async with limit:
+                return await self.async_llm.analyze_image(
+                    image=frames[i]["image_bytes"],
+                    prompt=self._build_prompt(image_info, frames[i])
+                )
+
+        results = await asyncio.gather(*(analyze(i) for i in missing))
+
+        for i, text in zip(missing, results):
+            responses[i] = text
+            if self.cache is not None:
+                await asyncio.to_thread(self.cache.set, cache_keys[i], text)
+
+        return self._record_findings(
+            self._combine(frames, responses), context_store
+        )
+
+    # --------------------------------------------------
+    # INTERNAL METHODS
+    # --------------------------------------------------
+
+    def _cache_key(self, image_info: Dict[str, Any]) -> str:
+        # Not the full prompt: its metadata lines (format, original
+        # size) differ between container formats of the same scan
+        return ResponseCache.make_key(
+            kind="vision",
+            model=self.llm.vision_model,
+            prompt_version=VISION_PROMPT_VERSION,
+            prompt=VISION_PROMPT,
+            pixels=image_info["pixel_hash"]
+        )
+
+    def _build_prompt(
+        self,
+        image_info: Dict[str, Any],
+        frame: Optional[Dict[str, Any]] = None
+    ) -> str:
+        layout = ""
+        if "slice_count" in image_info:
+            if frame is not None and "slice" in frame:
+                layout = (
+                    f"- Series: {image_info['modality']}, slice "
+                    f"{frame['slice'] + 1} of {image_info['slice_count']}\n"
+                )
+            else:
+                layout = (
+                    f"- Series: {image_info['modality']}, montage of "
+                    f"{len(image_info['selected_slices'])} of "
+                    f"{image_info['slice_count']} slices, in scan order "
+                    f"left to right, top to bottom\n"
+                )
+
+        return f"""
 {VISION_PROMPT}
 
 Image metadata:
 - Format: {image_info['format']}
 - Mode: {image_info['mode']}
 - Size: {image_info['size']}
-
+{layout}
 Describe only what is visually observable in this image.
 """
 
-        # Step 3: Call Ollama vision model
-        response_text = self.llm.analyze_image(
-            image_path=image_path,
-            prompt=prompt
+    @staticmethod
+    def _combine(frames: List[Dict[str, Any]], responses: List[str]) -> str:
+        if len(frames) == 1:
+            return responses[0]
+        return "\n\n".join(
+            f"Slice {frame['slice'] + 1}: {text.strip()}"
+            for frame, text in zip(frames, responses)
         )
 
-        # Step 4: Build safe findings object
+    def _record_findings(
+        self,
+        response_text: str,
+        context_store: MedicalContextStore
+    ) -> Dict[str, Any]:
+        # Build safe findings object
         findings = {
             "observations": response_text,
             "confidence": "moderate",
@@ -55,11 +204,17 @@ Describe only what is visually observable in this image.
             )
         }
 
-        # Step 5: Store in structured medical context
-        self.context_store.update_imaging(findings)
+        # Store in structured medical context
+        context_store.update_imaging(findings)
 
         return {
             "status": "success",
             "message": "Image analyzed successfully (non-diagnostic).",
             "findings": findings
         }
+
+
+def _prepare(image_path: str) -> Dict[str, Any]:
+    if is_dicom_path(image_path):
+        return prepare_vision_series(image_path)
+    return prepare_vision_image(image_path)
@@ -1,15 +1,78 @@
-from flask import Flask, request, jsonify
+import json
+import os
+import threading
+from typing import Optional
+from flask import Flask, Response, request, jsonify, stream_with_context
+from llm.response_cache import ResponseCache, configure_response_cache
 from orchestrator import MedicalAIOrchestrator
+from tools.blob_store import MultipartUpload, UPLOAD_CHUNK_BYTES
 
 app = Flask(__name__)
 
-# Initialize orchestrator ONCE
-orchestrator = MedicalAIOrchestrator()
+# Built on first use, not at import: PDF extraction workers are
+# spawned and re-import the main module, and must not open the stores
+_orchestrator: Optional[MedicalAIOrchestrator] = None
+_orchestrator_lock = threading.Lock()
+
+
+def get_orchestrator() -> MedicalAIOrchestrator:
+    """
+    The process-wide orchestrator, created ONCE; it is safe to share
+    across worker threads since every request gets its own medical
+    context.
+    """
+    global _orchestrator
+    with _orchestrator_lock:
+        if _orchestrator is None:
+            # Opt-in LLM response cache (memory + SQLite)
+            if os.environ.get("LLM_RESPONSE_CACHE") == "1":
+                configure_response_cache(ResponseCache())
+
+            orchestrator = MedicalAIOrchestrator()
+            orchestrator.warm_start()
+            _orchestrator = orchestrator
+        return _orchestrator
 
 
 @app.route("/health", methods=["GET"])
 def health_check():
-    return jsonify({"status": "ok"})
+    return jsonify({"status": "ok", **get_orchestrator().stats()})
+
+
+@app.route("/upload", methods=["POST"])
+def upload():
+    """
+    multipart/form-data with one or more file parts (images, DICOM,
+    PDF reports). Each file is streamed to the blob store in chunks;
+    identical content gets the same id and is stored once.
+
+    Returns {"success": True, "data": {"blobs": [
+        {"field", "filename", "blob_id", "size", "type", "deduplicated"}
+    ]}}; pass the ids to /analyze.
+    """
+
+    try:
+        # Read the raw stream; request.files would spool every part first
+        upload = MultipartUpload(get_orchestrator().blob_store, request.content_type)
+        try:
+            for chunk in iter(lambda: request.stream.read(UPLOAD_CHUNK_BYTES), b""):
+                upload.feed(chunk)
+        except BaseException:
+            # Client went away mid-body: drop the partial blob
+            upload.abort()
+            raise
+        result = upload.close()
+
+        return jsonify({
+            "success": True,
+            "data": {"blobs": result["blobs"]}
+        })
+
+    except ValueError as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 400
 
 
 @app.route("/analyze", methods=["POST"])
@@ -17,10 +80,13 @@ def analyze_patient():
     """
     Expected JSON payload:
     {
+        "session_id": "...",                        # optional, follow-up turn
+        "tenant_id": "...", "patient_id": "...",    # optional, RAG partition
         "intake": {...},
-        "image_path": "data/images/example.png",   # optional
+        "image_blob_id": "<id from /upload>",       # optional
         "reports": [
-            {"id": "r1", "text": "...", "source": "report.pdf"}
+            {"id": "r1", "blob_id": "<id from /upload>", "source": "report.pdf"},
+            {"id": "r2", "text": "...", "source": "notes.txt"}
         ],                                          # optional
         "user_query": "What does the report mention?"
     }
@@ -29,10 +95,13 @@ def analyze_patient():
     try:
         data = request.get_json(force=True)
 
-        result = orchestrator.run({
+        result = get_orchestrator().run({
+            "session_id": data.get("session_id"),
+            "tenant_id": data.get("tenant_id"),
+            "patient_id": data.get("patient_id"),
             "intake": data.get("intake"),
-            "image_path": data.get("image_path"),
-            "reports": data.get("reports", []),
+            "image_blob_id": data.get("image_blob_id"),
+            "reports": _client_reports(data),
             "user_query": data.get("user_query")
         })
 
@@ -48,7 +117,64 @@ def analyze_patient():
         }), 500
 
 
+@app.route("/analyze/stream", methods=["POST"])
+def analyze_patient_stream():
+    """
+    Same payload as /analyze, answered as Server-Sent Events.
+
+    Events:
+    - stage:    an agent finished ({"stage": ..., "data": ...})
+    - token:    a generated token from RAG or guidance ({"stage": ..., "data": ...})
+    - complete: the same "data" object /analyze returns
+    - error:    {"error": "..."}
+    """
+
+    data = request.get_json(force=True)
+
+    inputs = {
+        "session_id": data.get("session_id"),
+        "tenant_id": data.get("tenant_id"),
+        "patient_id": data.get("patient_id"),
+        "intake": data.get("intake"),
+        "image_blob_id": data.get("image_blob_id"),
+        "reports": _client_reports(data),
+        "user_query": data.get("user_query")
+    }
+
+    orchestrator = get_orchestrator()
+
+    def generate():
+        try:
+            for event in orchestrator.run_stream(inputs):
+                name = event.pop("event")
+                yield _sse(name, event if name != "complete" else event["data"])
+        except Exception as e:
+            yield _sse("error", {"error": str(e)})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+
+def _client_reports(data) -> list:
+    # Server-local "path" is internal only (set from blob ids)
+    return [
+        {k: v for k, v in report.items() if k != "path"}
+        for report in data.get("reports") or []
+    ]
+
+
+def _sse(event: str, payload) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
 if __name__ == "__main__":
+    get_orchestrator()
     app.run(
         host="0.0.0.0",
         port=5000,
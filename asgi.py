@@ -0,0 +1,120 @@
+import asyncio
+import contextlib
+import os
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from llm.async_ollama_client import close_async_transport
+from llm.response_cache import ResponseCache, configure_response_cache
+from orchestrator import MedicalAIOrchestrator
+from tools.blob_store import MultipartUpload
+
+
+async def health_check(request: Request):
+    orchestrator = request.app.state.orchestrator
+    return JSONResponse({"status": "ok", **orchestrator.stats()})
+
+
+async def upload(request: Request):
+    """
+    Async counterpart of /upload in app.py; same request and response.
+    """
+
+    try:
+        upload = MultipartUpload(
+            request.app.state.orchestrator.blob_store,
+            request.headers.get("content-type")
+        )
+        try:
+            async for chunk in request.stream():
+                # Blob writes are blocking file I/O
+                await asyncio.to_thread(upload.feed, chunk)
+        except BaseException:
+            # Client went away mid-body: drop the partial blob
+            upload.abort()
+            raise
+        result = await asyncio.to_thread(upload.close)
+
+        return JSONResponse({
+            "success": True,
+            "data": {"blobs": result["blobs"]}
+        })
+
+    except ValueError as e:
+        return JSONResponse({
+            "success": False,
+            "error": str(e)
+        }, status_code=400)
+
+
+async def analyze_patient(request: Request):
+    """
+    Async counterpart of /analyze in app.py; same payload and response.
+
+    Run with:
+        uvicorn asgi:app --host 0.0.0.0 --port 5000
+    """
+
+    try:
+        data = await request.json()
+
+        result = await request.app.state.orchestrator.arun({
+            "session_id": data.get("session_id"),
+            "tenant_id": data.get("tenant_id"),
+            "patient_id": data.get("patient_id"),
+            "intake": data.get("intake"),
+            "image_blob_id": data.get("image_blob_id"),
+            "reports": _client_reports(data),
+            "user_query": data.get("user_query")
+        })
+
+        return JSONResponse({
+            "success": True,
+            "data": result
+        })
+
+    except Exception as e:
+        return JSONResponse({
+            "success": False,
+            "error": str(e)
+        }, status_code=500)
+
+
+def _client_reports(data) -> list:
+    # Server-local "path" is internal only (set from blob ids)
+    return [
+        {k: v for k, v in report.items() if k != "path"}
+        for report in data.get("reports") or []
+    ]
+
+
+def build_orchestrator() -> MedicalAIOrchestrator:
+    # Opt-in LLM response cache (memory + SQLite)
+    if os.environ.get("LLM_RESPONSE_CACHE") == "1":
+        configure_response_cache(ResponseCache())
+
+    orchestrator = MedicalAIOrchestrator()
+    orchestrator.warm_start()
+    return orchestrator
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app: Starlette):
+    # Initialize orchestrator ONCE, at server startup rather than at
+    # import: spawned PDF extraction workers re-import modules
+    app.state.orchestrator = await asyncio.to_thread(build_orchestrator)
+    yield
+    await close_async_transport()
+
+
+app = Starlette(
+    routes=[
+        Route("/health", health_check, methods=["GET"]),
+        Route("/upload", upload, methods=["POST"]),
+        Route("/analyze", analyze_patient, methods=["POST"]),
+    ],
+    lifespan=lifespan
+)
@@ -0,0 +1,346 @@
+import asyncio
+import base64
+import os
+import random
+from typing import List, Dict, Optional, Any, Union
+
+import httpx
+import numpy as np
+
+from llm.ollama_client import (
+    OLLAMA_URL,
+    POOL_SIZE,
+    MAX_RETRIES,
+    BACKOFF_FACTOR,
+    BACKOFF_JITTER,
+    RETRY_STATUS_CODES,
+    ENDPOINT_TIMEOUTS,
+    EMBED_BATCH_SIZE,
+    EMBED_CONCURRENCY,
+    NUM_CTX,
+)
+from llm.response_cache import ResponseCache, get_response_cache
+
+# Connections the async transport may open. Sized for the number of
+# analyses in flight (one event loop serves them all), not for
+# Ollama's own parallelism; excess requests wait in Ollama's queue
+ASYNC_POOL_SIZE = int(os.environ.get("OLLAMA_ASYNC_POOL_SIZE", "256"))
+
+# Seconds to wait for a free connection; None waits until one frees
+# up (the read timeout still bounds each request once sent)
+POOL_TIMEOUT: Optional[float] = None
+
+
+class AsyncOllamaTransport:
+    """
+    Async counterpart of OllamaTransport, built on httpx.AsyncClient.
+
+    The underlying client is bound to the event loop it was first used
+    on, so one transport should be shared per loop (see
+    get_async_transport).
+    """
+
+    def __init__(
+        self,
+        base_url: str = OLLAMA_URL,
+        pool_size: int = ASYNC_POOL_SIZE,
+        max_retries: int = MAX_RETRIES,
+        backoff_factor: float = BACKOFF_FACTOR,
+        backoff_jitter: float = BACKOFF_JITTER,
+        timeouts: Optional[Dict[str, Any]] = None
+    ):
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.backoff_jitter = backoff_jitter
+        self.timeouts = dict(ENDPOINT_TIMEOUTS)
+        if timeouts:
+            self.timeouts.update(timeouts)
+
+        # Unknown until the first batched embedding call
+        self.batch_embed_supported: Optional[bool] = None
+
+        self.client = httpx.AsyncClient(
+            base_url=base_url.rstrip("/"),
+            limits=httpx.Limits(
+                max_connections=pool_size,
+                # Idle connections beyond the sync pool's size are closed
+                max_keepalive_connections=min(pool_size, POOL_SIZE)
+            )
+        )
+
+    async def post(
+        self,
+        path: str,
+        payload: Dict[str, Any],
+        kind: str = "generate"
+    ) -> httpx.Response:
+        """
+        POST a JSON payload, retrying connection errors and 503s
+        with jittered exponential backoff.
+        """
+
+        connect, read = self.timeouts.get(kind, self.timeouts["generate"])
+        # httpx applies the read timeout to the pool wait unless told
+        # otherwise; queued calls would fail with an unretried PoolTimeout
+        timeout = httpx.Timeout(read, connect=connect, pool=POOL_TIMEOUT)
+
+        attempt = 0
+        while True:
+            try:
+                response = await self.client.post(
+                    path,
+                    json=payload,
+                    timeout=timeout
+                )
+            except (httpx.ConnectError, httpx.RemoteProtocolError):
+                if attempt >= self.max_retries:
+                    raise
+            else:
+                if (
+                    response.status_code not in RETRY_STATUS_CODES
+                    or attempt >= self.max_retries
+                ):
+                    response.raise_for_status()
+                    return response
+
+            delay = self.backoff_factor * (2 ** attempt)
+            delay += random.uniform(0, self.backoff_jitter)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+_async_transport: Optional[AsyncOllamaTransport] = None
+
+
+def get_async_transport() -> AsyncOllamaTransport:
+    """
+    Returns the process-wide async transport, creating it on first use.
+    Must be called from within the serving event loop.
+    """
+    global _async_transport
+
+    if _async_transport is None:
+        _async_transport = AsyncOllamaTransport()
+    return _async_transport
+
+
+async def close_async_transport():
+    global _async_transport
+
+    if _async_transport is not None:
+        await _async_transport.aclose()
+        _async_transport = None
+
+
+class AsyncOllamaClient:
+    """
+    Async sibling of OllamaClient with the same models and methods,
+    for use under an event loop (see asgi.py).
+    """
+
+    def __init__(
+        self,
+        text_model: str = "llama3",
+        vision_model: str = "llava",
+        embedding_model: str = "nomic-embed-text",
+        transport: Optional[AsyncOllamaTransport] = None,
+        embed_batch_size: int = EMBED_BATCH_SIZE,
+        cache: Optional[ResponseCache] = None,
+        num_ctx: int = NUM_CTX,
+        embed_concurrency: int = EMBED_CONCURRENCY
+    ):
+        self.text_model = text_model
+        self.num_ctx = num_ctx
+        self.vision_model = vision_model
+        self.embedding_model = embedding_model
+        self.embed_batch_size = embed_batch_size
+        self.embed_concurrency = embed_concurrency
+        self._transport = transport
+        self._cache = cache
+
+    @property
+    def transport(self) -> AsyncOllamaTransport:
+        return self._transport or get_async_transport()
+
+    @property
+    def cache(self) -> Optional[ResponseCache]:
+        # Opt-in: None unless passed in or enabled process-wide
+        return self._cache or get_response_cache()
+
+    # ------------------------------------------------------------------
+    # TEXT GENERATION
+    # ------------------------------------------------------------------
+
+    async def generate_text(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        temperature: float = 0.2
+    ) -> str:
+        cache = self.cache
+        if cache is not None:
+            key = cache.key_for(
+                self.text_model, prompt, system_prompt, temperature, num_ctx=self.num_ctx
+            )
+            cached = await asyncio.to_thread(cache.get, key)
+            if cached is not None:
+                return cached
+
+        payload = {
+            "model": self.text_model,
+            "prompt": prompt,
+            "temperature": temperature,
+            "options": {"num_ctx": self.num_ctx},
+            "stream": False
+        }
+
+        if system_prompt:
+            payload["system"] = system_prompt
+
+        response = await self.transport.post(
+            "/api/generate",
+            payload,
+            kind="generate"
+        )
+
+        text = response.json().get("response", "").strip()
+        if cache is not None:
+            await asyncio.to_thread(cache.set, key, text)
+        return text
+
+    # ------------------------------------------------------------------
+    # VISION (IMAGE + TEXT)
+    # ------------------------------------------------------------------
+
+    async def analyze_image(
+        self,
+        image: Union[str, bytes],
+        prompt: str
+    ) -> str:
+        """
+        Sends an image + prompt to a vision-capable model (LLaVA).
+        `image` is a file path or already-encoded image bytes.
+        """
+
+        if isinstance(image, bytes):
+            image_bytes = image
+        else:
+            image_bytes = await asyncio.to_thread(_read_bytes, image)
+
+        cache = self.cache
+        if cache is not None:
+            key = cache.key_for(self.vision_model, prompt, image_bytes=image_bytes)
+            cached = await asyncio.to_thread(cache.get, key)
+            if cached is not None:
+                return cached
+
+        image_base64 = base64.b64encode(image_bytes).decode("utf-8")
+
+        payload = {
+            "model": self.vision_model,
+            "prompt": prompt,
+            "images": [image_base64],
+            "stream": False
+        }
+
+        response = await self.transport.post(
+            "/api/generate",
+            payload,
+            kind="vision"
+        )
+
+        text = response.json().get("response", "").strip()
+        if cache is not None:
+            await asyncio.to_thread(cache.set, key, text)
+        return text
+
+    # ------------------------------------------------------------------
+    # EMBEDDINGS
+    # ------------------------------------------------------------------
+
+    async def embed_texts(
+        self,
+        texts: List[str],
+        batch_size: Optional[int] = None
+    ) -> np.ndarray:
+        """
+        Generate embeddings for a list of texts, as one
+        (len(texts), dim) float32 array, batched through
+        /api/embed, or concurrently through /api/embeddings on older
+        servers. Output order matches input.
+        """
+
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+
+        batch_size = batch_size or self.embed_batch_size
+        transport = self.transport
+
+        if transport.batch_embed_supported is not False:
+            try:
+                embeddings = await self._embed_batched(texts, batch_size)
+                transport.batch_embed_supported = True
+                return embeddings
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code not in (404, 405, 501):
+                    raise
+                transport.batch_embed_supported = False
+
+        # Bounded like the sync client, so a large ingest can't queue
+        # thousands of requests on the connection pool at once
+        semaphore = asyncio.Semaphore(max(1, self.embed_concurrency))
+
+        async def embed_one(text: str) -> List[float]:
+            async with semaphore:
+                return await self._embed_single(text)
+
+        # gather() preserves input order
+        return np.asarray(await asyncio.gather(
+            *(embed_one(text) for text in texts)
+        ), dtype=np.float32)
+
+    async def _embed_batched(
+        self,
+        texts: List[str],
+        batch_size: int
+    ) -> np.ndarray:
+        embeddings: Optional[np.ndarray] = None
+
+        for start in range(0, len(texts), batch_size):
+            batch = texts[start:start + batch_size]
+            response = await self.transport.post(
+                "/api/embed",
+                {"model": self.embedding_model, "input": batch},
+                kind="embeddings"
+            )
+
+            batch_embeddings = response.json().get("embeddings") or []
+            if len(batch_embeddings) != len(batch):
+                raise ValueError(
+                    f"Expected {len(batch)} embeddings, "
+                    f"got {len(batch_embeddings)}"
+                )
+
+            if embeddings is None:
+                dim = len(batch_embeddings[0])
+                embeddings = np.empty((len(texts), dim), dtype=np.float32)
+            embeddings[start:start + len(batch)] = batch_embeddings
+
+        return embeddings
+
+    async def _embed_single(self, text: str) -> List[float]:
+        response = await self.transport.post(
+            "/api/embeddings",
+            {"model": self.embedding_model, "prompt": text},
+            kind="embeddings"
+        )
+
+        return response.json().get("embedding")
+
+
+def _read_bytes(image_path: str) -> bytes:
+    with open(image_path, "rb") as f:
+        return f.read()
@@ -1,9 +1,168 @@
 import requests
 import base64
-from typing import List, Dict, Optional
+import random
+import threading
+import time
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Any, Iterator, Union
+from requests.adapters import HTTPAdapter
+import numpy as np
+from llm.response_cache import ResponseCache, get_response_cache
 
 OLLAMA_URL = "http://localhost:11434"
 
+# --------------------------------------------------
+# TRANSPORT SETTINGS
+# --------------------------------------------------
+
+POOL_SIZE = 16
+MAX_RETRIES = 3
+BACKOFF_FACTOR = 0.5
+BACKOFF_JITTER = 0.25
+RETRY_STATUS_CODES = (503,)
+CONNECT_TIMEOUT = 5
+
+# Embedding fan-out
+EMBED_BATCH_SIZE = 32
+EMBED_CONCURRENCY = 4
+
+# Context window requested for text generation; prompt builders
+# budget their context against it (see tools/context_builder.py)
+NUM_CTX = int(os.environ.get("OLLAMA_NUM_CTX", "4096"))
+
+# (connect, read) timeouts per kind of call
+ENDPOINT_TIMEOUTS = {
+    "generate": (CONNECT_TIMEOUT, 120),
+    "vision": (CONNECT_TIMEOUT, 180),
+    "embeddings": (CONNECT_TIMEOUT, 60),
+}
+
+
+class OllamaTransport:
+    """
+    Pooled, keep-alive HTTP transport to the Ollama server.
+
+    One instance is shared by every OllamaClient in the process so
+    connections are reused across agents instead of being reopened
+    on every call.
+    """
+
+    def __init__(
+        self,
+        base_url: str = OLLAMA_URL,
+        pool_size: int = POOL_SIZE,
+        max_retries: int = MAX_RETRIES,
+        backoff_factor: float = BACKOFF_FACTOR,
+        backoff_jitter: float = BACKOFF_JITTER,
+        timeouts: Optional[Dict[str, Any]] = None
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.backoff_jitter = backoff_jitter
+        self.timeouts = dict(ENDPOINT_TIMEOUTS)
+        if timeouts:
+            self.timeouts.update(timeouts)
+
+        # Unknown until the first batched embedding call
+        self.batch_embed_supported: Optional[bool] = None
+
+        # Retries are handled in post() so POST bodies are retried too
+        adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            max_retries=0
+        )
+
+        self.session = requests.Session()
+        self.session.headers.update({"Connection": "keep-alive"})
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def post(
+        self,
+        path: str,
+        payload: Dict[str, Any],
+        kind: str = "generate",
+        **kwargs
+    ) -> requests.Response:
+        """
+        POST a JSON payload, retrying connection resets and 503s
+        with jittered exponential backoff.
+        """
+
+        url = f"{self.base_url}{path}"
+        timeout = self.timeouts.get(kind, self.timeouts["generate"])
+
+        attempt = 0
+        while True:
+            try:
+                response = self.session.post(
+                    url,
+                    json=payload,
+                    timeout=timeout,
+                    **kwargs
+                )
+            except requests.ConnectionError:
+                if attempt >= self.max_retries:
+                    raise
+            else:
+                if (
+                    response.status_code not in RETRY_STATUS_CODES
+                    or attempt >= self.max_retries
+                ):
+                    response.raise_for_status()
+                    return response
+                response.close()
+
+            self._sleep_before_retry(attempt)
+            attempt += 1
+
+    def close(self):
+        self.session.close()
+
+    # --------------------------------------------------
+    # INTERNAL
+    # --------------------------------------------------
+
+    def _sleep_before_retry(self, attempt: int):
+        delay = self.backoff_factor * (2 ** attempt)
+        delay += random.uniform(0, self.backoff_jitter)
+        time.sleep(delay)
+
+
+_transport: Optional[OllamaTransport] = None
+_transport_lock = threading.Lock()
+
+
+def get_transport() -> OllamaTransport:
+    """
+    Returns the process-wide transport, creating it on first use.
+    """
+    global _transport
+
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                _transport = OllamaTransport()
+    return _transport
+
+
+def configure_transport(**kwargs) -> OllamaTransport:
+    """
+    Replace the process-wide transport (e.g. to change pool size).
+    Accepts the same keyword arguments as OllamaTransport.
+    """
+    global _transport
+
+    with _transport_lock:
+        if _transport is not None:
+            _transport.close()
+        _transport = OllamaTransport(**kwargs)
+    return _transport
+
 
 class OllamaClient:
     """
@@ -15,11 +174,30 @@ class OllamaClient:
         self,
         text_model: str = "llama3",
         vision_model: str = "llava",
-        embedding_model: str = "nomic-embed-text"
+        embedding_model: str = "nomic-embed-text",
+        transport: Optional[OllamaTransport] = None,
+        embed_batch_size: int = EMBED_BATCH_SIZE,
+        embed_concurrency: int = EMBED_CONCURRENCY,
+        cache: Optional[ResponseCache] = None,
+        num_ctx: int = NUM_CTX
     ):
         self.text_model = text_model
+        self.num_ctx = num_ctx
         self.vision_model = vision_model
         self.embedding_model = embedding_model
+        self.embed_batch_size = embed_batch_size
+        self.embed_concurrency = embed_concurrency
+        self._transport = transport
+        self._cache = cache
+
+    @property
+    def transport(self) -> OllamaTransport:
+        return self._transport or get_transport()
+
+    @property
+    def cache(self) -> Optional[ResponseCache]:
+        # Opt-in: None unless passed in or enabled process-wide
+        return self._cache or get_response_cache()
 
     # ------------------------------------------------------------------
     # TEXT GENERATION
@@ -31,24 +209,102 @@ class OllamaClient:
         system_prompt: Optional[str] = None,
         temperature: float = 0.2
     ) -> str:
+        cache = self.cache
+        if cache is not None:
+            key = cache.key_for(
+                self.text_model, prompt, system_prompt, temperature, num_ctx=self.num_ctx
+            )
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+
         payload = {
             "model": self.text_model,
             "prompt": prompt,
             "temperature": temperature,
+            "options": {"num_ctx": self.num_ctx},
             "stream": False
         }
 
         if system_prompt:
             payload["system"] = system_prompt
 
-        response = requests.post(
-            f"{OLLAMA_URL}/api/generate",
-            json=payload,
-            timeout=120
+        response = self.transport.post(
+            "/api/generate",
+            payload,
+            kind="generate"
         )
 
-        response.raise_for_status()
-        return response.json().get("response", "").strip()
+        text = response.json().get("response", "").strip()
+        if cache is not None:
+            cache.set(key, text)
+        return text
+
+    def stream_text(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        temperature: float = 0.2
+    ) -> Iterator[str]:
+        """
+        Same as generate_text, but yields tokens as Ollama produces them.
+        A cached response is yielded as a single chunk.
+        """
+
+        cache = self.cache
+        if cache is not None:
+            key = cache.key_for(
+                self.text_model, prompt, system_prompt, temperature, num_ctx=self.num_ctx
+            )
+            cached = cache.get(key)
+            if cached is not None:
+                yield cached
+                return
+
+        payload = {
+            "model": self.text_model,
+            "prompt": prompt,
+            "temperature": temperature,
+            "options": {"num_ctx": self.num_ctx},
+            "stream": True
+        }
+
+        if system_prompt:
+            payload["system"] = system_prompt
+
+        tokens = []
+        for token in self._stream_generate(payload, kind="generate"):
+            tokens.append(token)
+            yield token
+
+        if cache is not None:
+            cache.set(key, "".join(tokens).strip())
+
+    def _stream_generate(
+        self,
+        payload: Dict[str, Any],
+        kind: str
+    ) -> Iterator[str]:
+        response = self.transport.post(
+            "/api/generate",
+            payload,
+            kind=kind,
+            stream=True
+        )
+
+        # Ollama streams newline-delimited JSON objects
+        with response:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if chunk.get("error"):
+                    raise RuntimeError(chunk["error"])
+                token = chunk.get("response")
+                if token:
+                    yield token
+                if chunk.get("done"):
+                    break
 
     # ------------------------------------------------------------------
     # VISION (IMAGE + TEXT)
@@ -56,15 +312,23 @@ class OllamaClient:
 
     def analyze_image(
         self,
-        image_path: str,
+        image: Union[str, bytes],
         prompt: str
     ) -> str:
         """
         Sends an image + prompt to a vision-capable model (LLaVA).
+        `image` is a file path, or already-encoded image bytes (see
+        tools.image_loader.prepare_vision_image).
         """
 
-        with open(image_path, "rb") as f:
-            image_bytes = f.read()
+        image_bytes = image if isinstance(image, bytes) else _read_bytes(image)
+
+        cache = self.cache
+        if cache is not None:
+            key = cache.key_for(self.vision_model, prompt, image_bytes=image_bytes)
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
 
         image_base64 = base64.b64encode(image_bytes).decode("utf-8")
 
@@ -75,41 +339,115 @@ class OllamaClient:
             "stream": False
         }
 
-        response = requests.post(
-            f"{OLLAMA_URL}/api/generate",
-            json=payload,
-            timeout=180
+        response = self.transport.post(
+            "/api/generate",
+            payload,
+            kind="vision"
         )
 
-        response.raise_for_status()
-        return response.json().get("response", "").strip()
+        text = response.json().get("response", "").strip()
+        if cache is not None:
+            cache.set(key, text)
+        return text
 
     # ------------------------------------------------------------------
     # EMBEDDINGS
     # ------------------------------------------------------------------
 
-    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+    def embed_texts(
+        self,
+        texts: List[str],
+        batch_size: Optional[int] = None
+    ) -> np.ndarray:
         """
-        Generate embeddings for a list of texts.
-        Used by RAG pipeline.
+        Generate embeddings for a list of texts, as one
+        (len(texts), dim) float32 array. Used by RAG pipeline.
+
+        Uses the multi-input /api/embed endpoint in batches of
+        `batch_size`; on servers without it, falls back to concurrent
+        single-text /api/embeddings calls. Output order matches input.
         """
 
-        embeddings = []
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+
+        batch_size = batch_size or self.embed_batch_size
+        transport = self.transport
 
-        for text in texts:
+        if transport.batch_embed_supported is not False:
+            try:
+                embeddings = self._embed_batched(texts, batch_size)
+                transport.batch_embed_supported = True
+                return embeddings
+            except requests.HTTPError as e:
+                status = getattr(e.response, "status_code", None)
+                if status not in (404, 405, 501):
+                    raise
+                # Older Ollama without /api/embed
+                transport.batch_embed_supported = False
+
+        return self._embed_concurrent(texts)
+
+    def _embed_batched(
+        self,
+        texts: List[str],
+        batch_size: int
+    ) -> np.ndarray:
+        embeddings: Optional[np.ndarray] = None
+
+        for start in range(0, len(texts), batch_size):
+            batch = texts[start:start + batch_size]
             payload = {
                 "model": self.embedding_model,
-                "prompt": text
+                "input": batch
             }
 
-            response = requests.post(
-                f"{OLLAMA_URL}/api/embeddings",
-                json=payload,
-                timeout=60
+            response = self.transport.post(
+                "/api/embed",
+                payload,
+                kind="embeddings"
             )
 
-            response.raise_for_status()
-            embedding = response.json().get("embedding")
-            embeddings.append(embedding)
+            batch_embeddings = response.json().get("embeddings") or []
+            if len(batch_embeddings) != len(batch):
+                raise ValueError(
+                    f"Expected {len(batch)} embeddings, "
+                    f"got {len(batch_embeddings)}"
+                )
+
+            # Fill one preallocated float32 block instead of keeping
+            # every batch around as Python floats
+            if embeddings is None:
+                dim = len(batch_embeddings[0])
+                embeddings = np.empty((len(texts), dim), dtype=np.float32)
+            embeddings[start:start + len(batch)] = batch_embeddings
 
         return embeddings
+
+    def _embed_concurrent(self, texts: List[str]) -> np.ndarray:
+        if len(texts) == 1:
+            return np.asarray([self._embed_single(texts[0])], dtype=np.float32)
+
+        workers = max(1, min(self.embed_concurrency, len(texts)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # map() preserves input order
+            return np.asarray(list(executor.map(self._embed_single, texts)), dtype=np.float32)
+
+    def _embed_single(self, text: str) -> List[float]:
+        payload = {
+            "model": self.embedding_model,
+            "prompt": text
+        }
+
+        response = self.transport.post(
+            "/api/embeddings",
+            payload,
+            kind="embeddings"
+        )
+
+        return response.json().get("embedding")
+
+
+def _read_bytes(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
@@ -67,6 +67,11 @@ Always include:
 - A disclaimer recommending specialist review
 """
 
+# Part of the vision result cache key; bump when the framing around
+# VISION_PROMPT in VisionAgent changes (edits to the text above are
+# picked up automatically)
+VISION_PROMPT_VERSION = "1"
+
 
 # =========================================================
 # RAG REPORT (PDF) AGENT PROMPT
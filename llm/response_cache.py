@@ -0,0 +1,223 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+# Cache bounds
+MAX_MEMORY_ENTRIES = 512
+MAX_DISK_ENTRIES = 20000
+CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+DEFAULT_CACHE_PATH = "./llm_cache.db"
+
+# Expired / over-limit disk entries are pruned every N writes
+PRUNE_EVERY_WRITES = 100
+
+
+class ResponseCache:
+    """
+    Two-tier cache for LLM responses.
+
+    - Memory tier: LRU of the hottest entries
+    - Disk tier (optional): SQLite, survives restarts
+
+    Entries expire after `ttl_seconds`; both tiers are size-bounded
+    (the disk tier is pruned every PRUNE_EVERY_WRITES writes, so it
+    may briefly run over max_disk_entries).
+
+    Calls do blocking SQLite I/O; from async code, run them in a
+    worker thread.
+    """
+
+    def __init__(
+        self,
+        disk_path: Optional[str] = DEFAULT_CACHE_PATH,
+        max_memory_entries: int = MAX_MEMORY_ENTRIES,
+        max_disk_entries: int = MAX_DISK_ENTRIES,
+        ttl_seconds: float = CACHE_TTL_SECONDS
+    ):
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._writes = 0
+
+        self._db: Optional[sqlite3.Connection] = None
+        if disk_path:
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS responses_last_access "
+                "ON responses (last_access)"
+            )
+            self._db.commit()
+
+    # --------------------------------------------------
+    # KEYS
+    # --------------------------------------------------
+
+    @staticmethod
+    def make_key(**parts: Any) -> str:
+        """
+        Stable key from the request parts (model, prompt, system,
+        temperature, image hash, ...).
+        """
+        encoded = json.dumps(parts, sort_keys=True, default=str).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+
+    @classmethod
+    def key_for(
+        cls,
+        model: str,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        temperature: float = 0.0,
+        image_bytes: Optional[bytes] = None,
+        num_ctx: Optional[int] = None
+    ) -> str:
+        """
+        Key for a generate / vision call. Images are keyed by content
+        hash, not path.
+        """
+        image_hash = hashlib.sha256(image_bytes).hexdigest() if image_bytes else None
+        return cls.make_key(
+            model=model,
+            prompt=prompt,
+            system=system_prompt,
+            temperature=temperature,
+            image=image_hash,
+            # A different context window can truncate the prompt
+            # differently, so it is part of the request
+            num_ctx=num_ctx
+        )
+
+    # --------------------------------------------------
+    # ACCESS
+    # --------------------------------------------------
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, created_at = entry
+                if now - created_at <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, created_at FROM responses WHERE key = ?",
+                    (key,)
+                ).fetchone()
+                if row is not None:
+                    value, created_at = row
+                    if now - created_at <= self.ttl_seconds:
+                        self._db.execute(
+                            "UPDATE responses SET last_access = ? WHERE key = ?",
+                            (now, key)
+                        )
+                        self._db.commit()
+                        self._remember(key, value, created_at)
+                        self.hits += 1
+                        self.disk_hits += 1
+                        return value
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: str):
+        now = time.time()
+
+        with self._lock:
+            self._remember(key, value, now)
+
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                    (key, value, now, now)
+                )
+                self._writes += 1
+                if self._writes % PRUNE_EVERY_WRITES == 0:
+                    self._prune_disk(now)
+                self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory)
+            }
+
+    # --------------------------------------------------
+    # INTERNAL
+    # --------------------------------------------------
+
+    def _remember(self, key: str, value: str, created_at: float):
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _prune_disk(self, now: float):
+        self._db.execute(
+            "DELETE FROM responses WHERE created_at < ?",
+            (now - self.ttl_seconds,)
+        )
+        count = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        if count > self.max_disk_entries:
+            self._db.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY last_access LIMIT ?)",
+                (count - self.max_disk_entries,)
+            )
+
+
+_response_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """
+    Returns the process-wide response cache, or None if caching
+    has not been enabled.
+    """
+    return _response_cache
+
+
+def configure_response_cache(cache: Optional[ResponseCache]) -> Optional[ResponseCache]:
+    """
+    Enable (or, with None, disable) response caching for every
+    OllamaClient and AsyncOllamaClient in the process.
+    """
+    global _response_cache
+
+    _response_cache = cache
+    return cache
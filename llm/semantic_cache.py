@@ -0,0 +1,162 @@
+import itertools
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+# Cosine similarity at or above which two questions share an answer
+# (they must also name the same key terms; see get())
+SIMILARITY_THRESHOLD = 0.97
+MAX_ENTRIES = 1024
+
+
+class _Bucket:
+    """
+    Cached answers for one partition at one corpus fingerprint.
+    """
+
+    def __init__(self, fingerprint: str):
+        self.fingerprint = fingerprint
+        self.ids: List[int] = []
+        self.vectors: Optional[np.ndarray] = None
+        self.terms: List[frozenset] = []
+        self.answers: List[Dict[str, Any]] = []
+
+    def add(self, entry_id: int, vector: np.ndarray, terms: frozenset, answer: Dict[str, Any]):
+        self.ids.append(entry_id)
+        self.terms.append(terms)
+        self.answers.append(answer)
+        row = vector[None, :]
+        self.vectors = row if self.vectors is None else np.vstack([self.vectors, row])
+
+    def remove(self, entry_id: int):
+        row = self.ids.index(entry_id)
+        del self.ids[row]
+        del self.terms[row]
+        del self.answers[row]
+        self.vectors = np.delete(self.vectors, row, axis=0) if self.ids else None
+
+
+class SemanticAnswerCache:
+    """
+    Answers to report questions, matched by question meaning.
+
+    Entries are scoped to a partition (patient / session) and to the
+    fingerprint of that partition's chunk set, so an answer is only
+    reused while it is grounded in exactly the same reports. A lookup
+    hits when the questions have the same key terms (report terms and
+    numbers; "troponin" vs "potassium", "day 1" vs "day 3" never
+    match, however close their embeddings) and a cosine similarity of
+    at least `threshold`. Size is bounded with LRU eviction.
+    """
+
+    def __init__(
+        self,
+        threshold: float = SIMILARITY_THRESHOLD,
+        max_entries: int = MAX_ENTRIES
+    ):
+        self.threshold = threshold
+        self.max_entries = max_entries
+
+        self._buckets: Dict[Optional[str], _Bucket] = {}
+        self._lru: "OrderedDict[int, Optional[str]]" = OrderedDict()
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    # --------------------------------------------------
+    # ACCESS
+    # --------------------------------------------------
+
+    def get(
+        self,
+        question_vector: np.ndarray,
+        partition: Optional[str],
+        fingerprint: str,
+        terms: frozenset = frozenset()
+    ) -> Optional[Dict[str, Any]]:
+        vector = _normalize(question_vector)
+
+        with self._lock:
+            bucket = self._current_bucket(partition, fingerprint)
+            if bucket is None or bucket.vectors is None:
+                self.misses += 1
+                return None
+
+            similarities = bucket.vectors @ vector
+            same_terms = np.array([entry == terms for entry in bucket.terms])
+            similarities = np.where(same_terms, similarities, -np.inf)
+            row = int(np.argmax(similarities))
+            if similarities[row] < self.threshold:
+                self.misses += 1
+                return None
+
+            self._lru.move_to_end(bucket.ids[row])
+            self.hits += 1
+            return dict(bucket.answers[row])
+
+    def set(
+        self,
+        question_vector: np.ndarray,
+        partition: Optional[str],
+        fingerprint: str,
+        terms: frozenset,
+        answer: Dict[str, Any]
+    ):
+        vector = _normalize(question_vector)
+
+        with self._lock:
+            bucket = self._current_bucket(partition, fingerprint)
+            if bucket is None:
+                bucket = self._buckets[partition] = _Bucket(fingerprint)
+
+            entry_id = next(self._ids)
+            bucket.add(entry_id, vector, terms, dict(answer))
+            self._lru[entry_id] = partition
+
+            while len(self._lru) > self.max_entries:
+                oldest, oldest_partition = self._lru.popitem(last=False)
+                self._buckets[oldest_partition].remove(oldest)
+
+    def invalidate(self, partition: Optional[str]):
+        """
+        Drop every answer for `partition` (its reports changed).
+        """
+        with self._lock:
+            self._drop(partition)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._lru),
+                "partitions": len(self._buckets)
+            }
+
+    # --------------------------------------------------
+    # INTERNAL
+    # --------------------------------------------------
+
+    def _current_bucket(self, partition: Optional[str], fingerprint: str) -> Optional[_Bucket]:
+        # Caller holds self._lock
+        bucket = self._buckets.get(partition)
+        if bucket is not None and bucket.fingerprint != fingerprint:
+            # Report set changed since these answers were cached
+            self._drop(partition)
+            return None
+        return bucket
+
+    def _drop(self, partition: Optional[str]):
+        bucket = self._buckets.pop(partition, None)
+        if bucket is not None:
+            for entry_id in bucket.ids:
+                self._lru.pop(entry_id, None)
+
+
+def _normalize(vector: np.ndarray) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32).ravel()
+    return vector / max(float(np.linalg.norm(vector)), 1e-12)
@@ -1,13 +1,25 @@
-from typing import Dict, Any
+import copy
+from typing import Dict, Any, Optional
+
+# Most recent report Q&A summaries kept in context
+MAX_REPORT_SUMMARIES = 10
 
 
 class MedicalContextStore:
     """
     Stores structured, non-diagnostic medical context
     aggregated from multiple agents.
+
+    One instance per request (or session); never share it between
+    concurrent requests.
     """
 
-    def __init__(self):
+    def __init__(
+        self,
+        max_reports: int = MAX_REPORT_SUMMARIES,
+        context: Optional[Dict[str, Any]] = None
+    ):
+        self.max_reports = max_reports
         self.context: Dict[str, Any] = {
             "demographics": {},
             "symptoms": [],
@@ -18,6 +30,11 @@ class MedicalContextStore:
             "reports": [],
         }
 
+        # Resume from a previous turn's context (copied, so concurrent
+        # turns of the same session don't share mutable state)
+        if context:
+            self.context.update(copy.deepcopy(context))
+
     # --------------------------------------------------
     # UPDATE METHODS
     # --------------------------------------------------
@@ -41,7 +58,10 @@ class MedicalContextStore:
         self.context["imaging"] = imaging_findings
 
     def add_report_summary(self, report_summary: Dict[str, Any]):
-        self.context["reports"].append(report_summary)
+        reports = self.context["reports"]
+        reports.append(report_summary)
+        if len(reports) > self.max_reports:
+            del reports[:-self.max_reports]
 
     # --------------------------------------------------
     # ACCESS
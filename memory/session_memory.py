@@ -1,16 +1,87 @@
-from typing import Dict, Any
+from typing import Dict, Any, Optional, List
+from collections import OrderedDict
+from dataclasses import dataclass, field, asdict
 import uuid
 import datetime
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Store bounds
+MAX_SESSIONS = 1000
+MAX_SESSION_BYTES = 256 * 1024 * 1024
+SESSION_TTL_SECONDS = 60 * 60
+MAX_RAG_REPORTS = 10
+
+# Cold-session spill store; off by default since it writes patient
+# context to disk (SESSION_SPILL=1 enables it)
+DEFAULT_SPILL_PATH = "./session_store.db"
+SESSION_SPILL_ENABLED = os.environ.get("SESSION_SPILL", "0") == "1"
+# Spilled sessions older than this are dropped from disk
+SPILL_TTL_SECONDS = 7 * 24 * 60 * 60
+
+
+@dataclass(slots=True)
+class SessionRecord:
+    """
+    Compact per-session record.
+
+    agent_outputs only holds the current turn's outputs; it is
+    cleared by SessionMemory.end_turn() once the turn is done.
+    """
+
+    created_at: str
+    patient_context: Dict[str, Any] = field(default_factory=dict)
+    imaging_findings: Optional[Dict[str, Any]] = None
+    rag_reports: List[Dict[str, Any]] = field(default_factory=list)
+    agent_outputs: Dict[str, Any] = field(default_factory=dict)
+    final_response: Any = None
+    input_fingerprints: Dict[str, str] = field(default_factory=dict)
+    last_access: float = 0.0
+    approx_bytes: int = 0
 
 
 class SessionMemory:
     """
     Per-session memory store.
     Each patient interaction gets a unique session.
+
+    Bounded by session count, approximate memory and idle TTL, with
+    least-recently-used sessions evicted first. When `spill_path` is
+    set, evicted sessions are written to SQLite and transparently
+    reloaded by get_session().
     """
 
-    def __init__(self):
-        self.sessions: Dict[str, Dict[str, Any]] = {}
+    def __init__(
+        self,
+        max_sessions: int = MAX_SESSIONS,
+        max_bytes: int = MAX_SESSION_BYTES,
+        ttl_seconds: float = SESSION_TTL_SECONDS,
+        spill_path: Optional[str] = None
+    ):
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+
+        # LRU order: oldest first
+        self.sessions: "OrderedDict[str, SessionRecord]" = OrderedDict()
+        self.total_bytes = 0
+        self.evictions = 0
+
+        # Guards self.sessions across concurrent requests
+        self._lock = threading.RLock()
+
+        self._spill: Optional[sqlite3.Connection] = None
+        if spill_path:
+            self._spill = sqlite3.connect(spill_path, check_same_thread=False)
+            self._spill.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "session_id TEXT PRIMARY KEY, data TEXT NOT NULL, "
+                "spilled_at REAL NOT NULL)"
+            )
+            self._spill.commit()
 
     # --------------------------------------------------
     # SESSION MANAGEMENT
@@ -18,51 +89,216 @@ class SessionMemory:
 
     def create_session(self) -> str:
         session_id = str(uuid.uuid4())
-        self.sessions[session_id] = {
-            "created_at": datetime.datetime.utcnow().isoformat(),
-            "patient_context": {},
-            "imaging_findings": None,
-            "rag_reports": [],
-            "agent_outputs": {},
-            "final_response": None
-        }
+        with self._lock:
+            record = SessionRecord(
+                created_at=datetime.datetime.utcnow().isoformat()
+            )
+            self.sessions[session_id] = record
+            self._touch(session_id, record)
         return session_id
 
     def get_session(self, session_id: str) -> Dict[str, Any]:
-        return self.sessions.get(session_id, {})
+        with self._lock:
+            record = self._load(session_id)
+            if record is None:
+                return {}
+            return _public_fields(record)
+
+    def has_session(self, session_id: str) -> bool:
+        with self._lock:
+            return self._load(session_id) is not None
 
     def clear_session(self, session_id: str):
-        if session_id in self.sessions:
-            del self.sessions[session_id]
+        with self._lock:
+            record = self.sessions.pop(session_id, None)
+            if record is not None:
+                self.total_bytes -= record.approx_bytes
+            if self._spill is not None:
+                self._spill.execute(
+                    "DELETE FROM sessions WHERE session_id = ?", (session_id,)
+                )
+                self._spill.commit()
+
+    def end_turn(self, session_id: str):
+        """
+        Drop the per-turn agent outputs once a turn is complete.
+        """
+        with self._lock:
+            record = self._require(session_id)
+            record.agent_outputs = {}
+            self._touch(session_id, record)
 
     # --------------------------------------------------
     # CONTEXT UPDATES
     # --------------------------------------------------
 
     def update_patient_context(self, session_id: str, context: Dict[str, Any]):
-        self._ensure_session(session_id)
-        self.sessions[session_id]["patient_context"] = context
+        with self._lock:
+            record = self._require(session_id)
+            record.patient_context = context
+            self._touch(session_id, record)
 
     def update_imaging_findings(self, session_id: str, findings: Dict[str, Any]):
-        self._ensure_session(session_id)
-        self.sessions[session_id]["imaging_findings"] = findings
+        with self._lock:
+            record = self._require(session_id)
+            record.imaging_findings = findings
+            self._touch(session_id, record)
 
     def add_rag_report(self, session_id: str, report: Dict[str, Any]):
-        self._ensure_session(session_id)
-        self.sessions[session_id]["rag_reports"].append(report)
+        with self._lock:
+            record = self._require(session_id)
+            record.rag_reports.append(report)
+            if len(record.rag_reports) > MAX_RAG_REPORTS:
+                del record.rag_reports[:-MAX_RAG_REPORTS]
+            self._touch(session_id, record)
 
     def add_agent_output(self, session_id: str, agent_name: str, output: Any):
-        self._ensure_session(session_id)
-        self.sessions[session_id]["agent_outputs"][agent_name] = output
+        with self._lock:
+            record = self._require(session_id)
+            record.agent_outputs[agent_name] = output
+            self._touch(session_id, record)
 
     def set_final_response(self, session_id: str, response: str):
-        self._ensure_session(session_id)
-        self.sessions[session_id]["final_response"] = response
+        with self._lock:
+            record = self._require(session_id)
+            record.final_response = response
+            self._touch(session_id, record)
+
+    def update_input_fingerprints(self, session_id: str, fingerprints: Dict[str, str]):
+        with self._lock:
+            record = self._require(session_id)
+            record.input_fingerprints.update(fingerprints)
+            self._touch(session_id, record)
+
+    # --------------------------------------------------
+    # ACCOUNTING
+    # --------------------------------------------------
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            spilled = 0
+            if self._spill is not None:
+                spilled = self._spill.execute(
+                    "SELECT COUNT(*) FROM sessions"
+                ).fetchone()[0]
+            return {
+                "sessions": len(self.sessions),
+                "approx_bytes": self.total_bytes,
+                "evictions": self.evictions,
+                "spilled": spilled
+            }
 
     # --------------------------------------------------
     # INTERNAL
     # --------------------------------------------------
 
-    def _ensure_session(self, session_id: str):
-        if session_id not in self.sessions:
+    def _require(self, session_id: str) -> SessionRecord:
+        record = self._load(session_id)
+        if record is None:
             raise ValueError(f"Session {session_id} does not exist")
+        return record
+
+    def _load(self, session_id: str) -> Optional[SessionRecord]:
+        record = self.sessions.get(session_id)
+        if record is not None:
+            now = time.time()
+            if self._expired(record, now):
+                self._evict(session_id)
+            else:
+                # Reads count as use for LRU order and the idle TTL
+                record.last_access = now
+                self.sessions.move_to_end(session_id)
+                return record
+
+        record = self._unspill(session_id)
+        if record is not None:
+            self.sessions[session_id] = record
+            self._touch(session_id, record)
+        return record
+
+    def _touch(self, session_id: str, record: SessionRecord):
+        size = _approx_size(record)
+        self.total_bytes += size - record.approx_bytes
+        record.approx_bytes = size
+        record.last_access = time.time()
+        self.sessions.move_to_end(session_id)
+        self._enforce_bounds(keep=session_id)
+
+    def _expired(self, record: SessionRecord, now: float) -> bool:
+        return now - record.last_access > self.ttl_seconds
+
+    def _enforce_bounds(self, keep: str):
+        now = time.time()
+        while len(self.sessions) > 1:
+            oldest_id, oldest = next(iter(self.sessions.items()))
+            if oldest_id == keep:
+                break
+            over_limit = (
+                len(self.sessions) > self.max_sessions
+                or self.total_bytes > self.max_bytes
+            )
+            if not over_limit and not self._expired(oldest, now):
+                break
+            self._evict(oldest_id)
+
+    def _evict(self, session_id: str):
+        record = self.sessions.pop(session_id)
+        self.total_bytes -= record.approx_bytes
+        self.evictions += 1
+
+        if self._spill is not None:
+            self._spill.execute(
+                "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)",
+                (session_id, json.dumps(asdict(record), default=str), time.time())
+            )
+            self._spill.execute(
+                "DELETE FROM sessions WHERE spilled_at < ?",
+                (time.time() - SPILL_TTL_SECONDS,)
+            )
+            self._spill.commit()
+
+    def _unspill(self, session_id: str) -> Optional[SessionRecord]:
+        if self._spill is None:
+            return None
+
+        row = self._spill.execute(
+            "SELECT data FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        self._spill.execute(
+            "DELETE FROM sessions WHERE session_id = ?", (session_id,)
+        )
+        self._spill.commit()
+
+        record = SessionRecord(**json.loads(row[0]))
+        record.approx_bytes = 0
+        return record
+
+
+def _public_fields(record: SessionRecord) -> Dict[str, Any]:
+    return {
+        "created_at": record.created_at,
+        "patient_context": record.patient_context,
+        "imaging_findings": record.imaging_findings,
+        "rag_reports": record.rag_reports,
+        "agent_outputs": record.agent_outputs,
+        "final_response": record.final_response,
+        "input_fingerprints": record.input_fingerprints
+    }
+
+
+def _approx_size(record: SessionRecord) -> int:
+    # Serialized size is a cheap, stable proxy for the record's footprint
+    return len(json.dumps(
+        [
+            record.patient_context,
+            record.imaging_findings,
+            record.rag_reports,
+            record.agent_outputs,
+            record.final_response,
+            record.input_fingerprints
+        ],
+        default=str
+    ))
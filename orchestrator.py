@@ -1,7 +1,16 @@
-from typing import Dict, Any
+import asyncio
+import hashlib
+import json
+import os
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Iterator, Generator, Callable, List, Optional, Tuple
 
-from memory.session_memory import SessionMemory
+from memory.session_memory import SessionMemory, DEFAULT_SPILL_PATH, SESSION_SPILL_ENABLED
 from memory.context_store import MedicalContextStore
+from tools.blob_store import BlobStore, blob_digest
+from tools.dicom_loader import is_dicom_path
+from tools.image_loader import SUPPORTED_IMAGE_FORMATS
 
 from agents.intake_agent import IntakeAgent
 from agents.vision_agent import VisionAgent
@@ -15,21 +24,55 @@ class MedicalAIOrchestrator:
     """
     Central orchestrator for the Medical AI Assistant.
     Controls agent execution, memory, and safety.
+
+    Agents are stateless and shared; each run gets its own
+    MedicalContextStore, so one orchestrator can serve concurrent
+    requests.
+
+    Passing an existing "session_id" continues that session: the
+    previous turn's context is restored and only stages whose inputs
+    changed are re-run.
     """
 
     def __init__(self):
         # Memory layers
-        self.session_memory = SessionMemory()
-        self.context_store = MedicalContextStore()
+        self.session_memory = SessionMemory(
+            spill_path=DEFAULT_SPILL_PATH if SESSION_SPILL_ENABLED else None
+        )
+
+        # Uploaded images / reports, referenced by blob id
+        self.blob_store = BlobStore()
 
         # Agents
-        self.intake_agent = IntakeAgent(self.context_store)
-        self.vision_agent = VisionAgent(self.context_store)
-        self.rag_agent = RAGReportAgent(self.context_store)
+        self.intake_agent = IntakeAgent()
+        self.vision_agent = VisionAgent()
+        self.rag_agent = RAGReportAgent()
         self.planner_agent = PlannerAgent()
-        self.guidance_agent = GuidanceAgent(self.context_store)
+        self.guidance_agent = GuidanceAgent()
         self.safety_agent = SafetyAgent()
 
+    def warm_start(self):
+        """
+        Load persisted indexes (and a local embedding model, if
+        configured) up front so the first request doesn't pay for it.
+        """
+        self.rag_agent.vector_store.open()
+        self.rag_agent.vector_store.embedding_generator.load()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sessions": self.session_memory.stats(),
+            "vector_index": self.rag_agent.vector_store.stats(),
+            "answer_cache": (
+                self.rag_agent.answer_cache.stats()
+                if self.rag_agent.answer_cache is not None else None
+            ),
+            "vision_cache": (
+                self.vision_agent.cache.stats()
+                if self.vision_agent.cache is not None else None
+            )
+        }
+
     # --------------------------------------------------
     # MAIN ENTRY
     # --------------------------------------------------
@@ -38,64 +81,406 @@ class MedicalAIOrchestrator:
         """
         inputs example:
         {
+            "session_id": "...",                # optional, follow-up turn
+            "tenant_id": "...",                 # optional, retrieval partition
+            "patient_id": "...",                # optional, retrieval partition
             "intake": {...},
-            "image_path": "data/images/mri.png",
+            "image_blob_id": "<sha256>.png",    # from the blob store, or:
+            "image_path": "data/images/mri.png",  # trusted callers only;
+                                                # the HTTP apps never pass it
             "reports": [
-                {"id": "r1", "text": "...", "source": "report.pdf"}
+                {"id": "r1", "text": "...", "source": "report.pdf"},
+                {"id": "r2", "pages": ["...", ...], "source": "labs.pdf"},
+                {"id": "r3", "blob_id": "<sha256>.pdf", "source": "summary.pdf"}
             ],
             "user_query": "What does the report mention about troponin?"
         }
         """
 
-        # Create new session
-        session_id = self.session_memory.create_session()
+        result = None
+        for event in self._execute(inputs, stream=False):
+            if event["event"] == "complete":
+                result = event["data"]
+        return result
+
+    def run_stream(self, inputs: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """
+        Streaming variant of run().
+
+        Yields events as the pipeline progresses:
+        - {"event": "stage", "stage": <agent>, "data": <output>}
+        - {"event": "token", "stage": <agent>, "data": <text>}
+        - {"event": "complete", "data": <same dict run() returns>}
+
+        Tokens from agents running concurrently may interleave;
+        use "stage" to tell them apart.
+        """
+
+        yield from self._execute(inputs, stream=True)
+
+    async def arun(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Async variant of run(), for ASGI servers (see asgi.py).
+        Ollama calls are awaited, so the event loop can serve other
+        analyses while this one waits on the model.
+        """
+
+        # Session restore, blob lookups and fingerprint hashing block on
+        # disk; keep them off the event loop
+        session_id, context_store, turn = await asyncio.to_thread(self._begin_turn, inputs)
+        graph = self._plan(turn)
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def run_node(step: str, deps: List[str]):
+            await asyncio.gather(*(tasks[dep] for dep in deps))
+            output = await self._arun_step(session_id, step, turn, context_store)
+            self._record_step(session_id, step, output)
+
+        # Graph is listed in execution order, so deps are created first
+        for step, deps in graph.items():
+            tasks[step] = asyncio.ensure_future(run_node(step, deps))
+
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.to_thread(self._abort_turn, session_id, turn)
+            raise
+
+        await asyncio.to_thread(self._end_turn, session_id, context_store, turn)
+        return await asyncio.to_thread(self._build_result, session_id, context_store)
+
+    # --------------------------------------------------
+    # EXECUTION
+    # --------------------------------------------------
+
+    def _begin_turn(
+        self,
+        inputs: Dict[str, Any]
+    ) -> Tuple[str, MedicalContextStore, Dict[str, Any]]:
+        """
+        Resolve the session and decide which inputs are new this turn.
+
+        Returns (session_id, context_store, turn). In `turn`, intake and
+        image_path are None when the session already processed the same
+        content, and "ingest_reports" is False when the same reports
+        were already ingested.
+        """
+
+        # Resolve and validate every input before touching the session
+        # store, so a rejected request leaves no session behind
+        image_path, image_fingerprint = self._resolve_image(inputs)
+        reports = inputs.get("reports") or []
+
+        fingerprints = {
+            "intake": _fingerprint(inputs.get("intake")),
+            "image": image_fingerprint or _file_fingerprint(image_path),
+            # Blob ids are content hashes, so uploaded PDFs are
+            # fingerprinted by content without reading them
+            "reports": _fingerprint([_without_path(report) for report in reports]),
+        }
+
+        reports = [self._resolve_report(report) for report in reports]
+
+        session_id = inputs.get("session_id")
+        if session_id and self.session_memory.has_session(session_id):
+            session = self.session_memory.get_session(session_id)
+            context_store = MedicalContextStore(context=session["patient_context"])
+            previous = dict(session["input_fingerprints"])
+        else:
+            # Unknown or missing id: start fresh
+            session_id = self.session_memory.create_session()
+            context_store = MedicalContextStore()
+            previous = None
+
+        new_session = previous is None
+        previous = previous or {}
+
+        def is_new(key: str) -> bool:
+            return fingerprints[key] is not None and fingerprints[key] != previous.get(key)
+
+        turn = {
+            "intake": inputs.get("intake") if is_new("intake") else None,
+            "image_path": image_path if is_new("image") else None,
+            "reports": reports,
+            "ingest_reports": is_new("reports"),
+            "has_reports": bool(reports) or "reports" in previous,
+            "user_query": inputs.get("user_query"),
+            "new_session": new_session,
+            "fingerprints": {k: v for k, v in fingerprints.items() if v is not None},
+            # Retrieval only ever sees this patient's (or session's) reports
+            "partition": {
+                "tenant_id": inputs.get("tenant_id") or "default",
+                "patient_id": inputs.get("patient_id"),
+                "session_id": session_id
+            }
+        }
+
+        return session_id, context_store, turn
+
+    def _resolve_image(self, inputs: Dict[str, Any]) -> Tuple[Optional[str], Optional[str]]:
+        """
+        (local image path or None, content fingerprint if known).
+        """
+        blob_id = inputs.get("image_blob_id")
+        if blob_id:
+            path = self.blob_store.path(blob_id)
+            if blob_id.endswith(".pdf"):
+                raise ValueError(f"Image blob is not an image: {blob_id}")
+            # Blob ids are content hashes: same value, no re-read
+            return path, blob_digest(blob_id)
+
+        image_path = inputs.get("image_path")
+        if image_path:
+            if not os.path.exists(image_path):
+                raise FileNotFoundError(f"Image not found: {image_path}")
+            if not (is_dicom_path(image_path) or image_path.lower().endswith(SUPPORTED_IMAGE_FORMATS)):
+                raise ValueError("Unsupported image format")
+        return image_path, None
+
+    def _resolve_report(self, report: Dict[str, Any]) -> Dict[str, Any]:
+        # "path" is internal: it is only ever set from a blob id here,
+        # never taken from the request, so clients can't point the RAG
+        # agent at arbitrary server-local files
+        report = _without_path(report)
+        if not report.get("blob_id"):
+            return report
+        if not report["blob_id"].endswith(".pdf"):
+            raise ValueError(f"Report blob is not a PDF: {report['blob_id']}")
+        return {**report, "path": self.blob_store.path(report["blob_id"])}
+
+    def _end_turn(
+        self,
+        session_id: str,
+        context_store: MedicalContextStore,
+        turn: Dict[str, Any]
+    ):
+        # Only recorded once the turn succeeds, so failed stages re-run
+        self.session_memory.update_patient_context(session_id, context_store.get_context())
+        self.session_memory.update_input_fingerprints(session_id, turn["fingerprints"])
+        self.session_memory.end_turn(session_id)
+
+    def _abort_turn(self, session_id: str, turn: Dict[str, Any]):
+        # A failed first turn never reached the client, so nobody can
+        # continue its session; don't leave it behind
+        if turn["new_session"]:
+            self.session_memory.clear_session(session_id)
 
-        # Decide execution plan
-        plan = self.planner_agent.plan({
-            "intake": inputs.get("intake"),
-            "image_path": inputs.get("image_path"),
-            "report_uploaded": bool(inputs.get("reports")),
-            "user_query": inputs.get("user_query")
+    def _plan(self, turn: Dict[str, Any]) -> Dict[str, List[str]]:
+        return self.planner_agent.plan({
+            "intake": turn["intake"],
+            "image_path": turn["image_path"],
+            "report_uploaded": turn["has_reports"],
+            "user_query": turn["user_query"]
         })
 
-        # Execute plan
-        for step in plan:
+    def _execute(self, inputs: Dict[str, Any], stream: bool) -> Iterator[Dict[str, Any]]:
+        """
+        Run the plan's dependency graph on a thread pool.
+
+        Workers report tokens and completions through a single queue,
+        so events are yielded from the caller's thread in the order
+        they happen.
+        """
+
+        # Resolve session and its own medical context
+        session_id, context_store, turn = self._begin_turn(inputs)
+
+        try:
+            # Decide execution plan
+            pending = dict(self._plan(turn))
+            completed = set()
+            running = 0
+            events: "queue.Queue[Dict[str, Any]]" = queue.Queue()
 
-            if step == "intake_agent":
-                output = self.intake_agent.execute(inputs["intake"])
-                self.session_memory.add_agent_output(session_id, step, output)
+            def run_node(step: str):
+                try:
+                    output = self._run_step(
+                        session_id, step, turn, context_store, stream, events.put
+                    )
+                    self._record_step(session_id, step, output)
+                    events.put({"event": "stage", "stage": step, "data": output})
+                except BaseException as e:
+                    events.put({"event": "failed", "stage": step, "error": e})
 
-            elif step == "vision_agent":
-                output = self.vision_agent.execute(inputs["image_path"])
-                self.session_memory.update_imaging_findings(session_id, output["findings"])
-                self.session_memory.add_agent_output(session_id, step, output)
+            with ThreadPoolExecutor(max_workers=max(1, len(pending))) as pool:
+                while pending or running:
+                    # Start every node whose dependencies are done
+                    for step, deps in list(pending.items()):
+                        if all(dep in completed for dep in deps):
+                            del pending[step]
+                            running += 1
+                            pool.submit(run_node, step)
 
-            elif step == "rag_report_agent":
-                # Ingest reports first (one-time per session)
-                self.rag_agent.ingest_reports(inputs["reports"])
-                output = self.rag_agent.execute(inputs["user_query"])
-                self.session_memory.add_rag_report(session_id, output)
-                self.session_memory.add_agent_output(session_id, step, output)
+                    event = events.get()
 
-            elif step == "guidance_agent":
-                output = self.guidance_agent.execute()
-                self.session_memory.add_agent_output(session_id, step, output)
+                    if event["event"] == "failed":
+                        raise event["error"]
 
-            elif step == "safety_agent":
-                previous = self.session_memory.get_session(session_id)["agent_outputs"].get(
-                    "guidance_agent", {}
+                    if event["event"] == "stage":
+                        running -= 1
+                        completed.add(event["stage"])
+
+                    yield event
+
+            self._end_turn(session_id, context_store, turn)
+        except BaseException:
+            self._abort_turn(session_id, turn)
+            raise
+
+        yield {"event": "complete", "data": self._build_result(session_id, context_store)}
+
+    def _run_step(
+        self,
+        session_id: str,
+        step: str,
+        inputs: Dict[str, Any],
+        context_store: MedicalContextStore,
+        stream: bool,
+        emit: Callable[[Dict[str, Any]], None]
+    ) -> Dict[str, Any]:
+
+        if step == "intake_agent":
+            return self.intake_agent.execute(inputs["intake"], context_store)
+
+        if step == "vision_agent":
+            return self.vision_agent.execute(inputs["image_path"], context_store)
+
+        if step == "rag_report_agent":
+            # Ingest reports first (one-time per session)
+            if inputs["ingest_reports"]:
+                self.rag_agent.ingest_reports(inputs["reports"], inputs["partition"])
+            if stream:
+                return self._relay_tokens(
+                    step,
+                    self.rag_agent.execute_stream(
+                        inputs["user_query"], context_store, inputs["partition"]
+                    ),
+                    emit
                 )
-                output = self.safety_agent.execute(previous)
-                self.session_memory.set_final_response(session_id, output)
-                self.session_memory.add_agent_output(session_id, step, output)
+            return self.rag_agent.execute(
+                inputs["user_query"], context_store, inputs["partition"]
+            )
+
+        if step == "guidance_agent":
+            if stream:
+                return self._relay_tokens(
+                    step, self.guidance_agent.execute_stream(context_store), emit
+                )
+            return self.guidance_agent.execute(context_store)
+
+        if step == "safety_agent":
+            return self.safety_agent.execute(self._guidance_output(session_id))
 
+        raise ValueError(f"Unknown plan step: {step}")
+
+    async def _arun_step(
+        self,
+        session_id: str,
+        step: str,
+        inputs: Dict[str, Any],
+        context_store: MedicalContextStore
+    ) -> Dict[str, Any]:
+
+        if step == "intake_agent":
+            # Pure CPU, nothing to await
+            return self.intake_agent.execute(inputs["intake"], context_store)
+
+        if step == "vision_agent":
+            return await self.vision_agent.aexecute(inputs["image_path"], context_store)
+
+        if step == "rag_report_agent":
+            if inputs["ingest_reports"]:
+                await self.rag_agent.aingest_reports(inputs["reports"], inputs["partition"])
+            return await self.rag_agent.aexecute(
+                inputs["user_query"], context_store, inputs["partition"]
+            )
+
+        if step == "guidance_agent":
+            return await self.guidance_agent.aexecute(context_store)
+
+        if step == "safety_agent":
+            return await self.safety_agent.aexecute(self._guidance_output(session_id))
+
+        raise ValueError(f"Unknown plan step: {step}")
+
+    def _record_step(self, session_id: str, step: str, output: Dict[str, Any]):
+        if step == "vision_agent":
+            self.session_memory.update_imaging_findings(session_id, output["findings"])
+        elif step == "rag_report_agent":
+            self.session_memory.add_rag_report(session_id, output)
+        elif step == "safety_agent":
+            self.session_memory.set_final_response(session_id, output)
+
+        self.session_memory.add_agent_output(session_id, step, output)
+
+    def _guidance_output(self, session_id: str) -> Dict[str, Any]:
+        return self.session_memory.get_session(session_id)["agent_outputs"].get(
+            "guidance_agent", {}
+        )
+
+    def _build_result(
+        self,
+        session_id: str,
+        context_store: MedicalContextStore
+    ) -> Dict[str, Any]:
         # Final response ONLY from safety agent
         final_session = self.session_memory.get_session(session_id)
 
         return {
             "session_id": session_id,
-            "patient_context": self.context_store.get_context(),
+            "patient_context": context_store.get_context(),
             "imaging_findings": final_session.get("imaging_findings"),
             "uploaded_reports": final_session.get("rag_reports"),
             "final_output": final_session.get("final_response")
         }
+
+    def _relay_tokens(
+        self,
+        step: str,
+        agent_stream: Generator[str, None, Dict[str, Any]],
+        emit: Callable[[Dict[str, Any]], None]
+    ) -> Dict[str, Any]:
+        """
+        Re-emit an agent's tokens as events and hand back its output.
+        """
+        while True:
+            try:
+                token = next(agent_stream)
+            except StopIteration as done:
+                return done.value
+            emit({"event": "token", "stage": step, "data": token})
+
+
+def _fingerprint(value: Any) -> Optional[str]:
+    if not value:
+        return None
+    encoded = json.dumps(value, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def _without_path(report: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in report.items() if k != "path"}
+
+
+def _file_fingerprint(path: Optional[str]) -> Optional[str]:
+    # Content hash, so a re-upload under a new temp path still matches
+    if not path:
+        return None
+    digest = hashlib.sha256()
+    if os.path.isdir(path):
+        # DICOM series: names, sizes and mtimes, without reading
+        # hundreds of slices on every turn
+        for root, _, files in sorted(os.walk(path)):
+            for name in sorted(files):
+                stat = os.stat(os.path.join(root, name))
+                relative = os.path.relpath(os.path.join(root, name), path)
+                digest.update(f"{relative}\0{stat.st_size}\0{stat.st_mtime_ns}\0".encode("utf-8"))
+        return digest.hexdigest()
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"Image not found: {path}")
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
@@ -0,0 +1,147 @@
+"""
+Recall / latency / memory trade-off of the NumPy vector store's
+storage modes (float32, float16, int8).
+
+    python -m scripts.benchmark_vector_store --reports data/reports
+    python -m scripts.benchmark_vector_store --synthetic 20000
+
+With --reports, every .pdf / .txt under the directory is chunked the
+way RAGReportAgent does it and embedded with the configured model
+(through the embedding cache, so re-runs are cheap). Queries are
+sampled chunk texts. Recall@k is measured against exact float32
+search; latency excludes query embedding.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from tools.text_utils import chunk_pages
+from vector_store.numpy_store import NumpyVectorStore, STORAGE_DTYPES
+
+
+class _PrecomputedEmbeddings:
+    # Stands in for EmbeddingGenerator so every mode sees the same vectors
+    def __init__(self, vectors: Dict[str, np.ndarray]):
+        self.vectors = vectors
+
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+        return np.stack([self.vectors[text] for text in texts])
+
+
+def load_report_chunks(directory: str) -> List[str]:
+    texts = []
+    for root, _, files in os.walk(directory):
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            if name.lower().endswith(".pdf"):
+                from tools.pdf_ingester import iter_pdf_pages
+                numbered = iter_pdf_pages(path)
+            elif name.lower().endswith(".txt"):
+                with open(path, "r", encoding="utf-8", errors="replace") as f:
+                    pages = f.read().split("\f")
+                numbered = ((i + 1, page) for i, page in enumerate(pages))
+            else:
+                continue
+            texts.extend(chunk["text"] for chunk in chunk_pages(numbered))
+    # Same text, same vector; the store would dedupe it anyway
+    return list(dict.fromkeys(texts))
+
+
+def build_corpus(args) -> Dict[str, np.ndarray]:
+    if args.reports:
+        from vector_store.embeddings import EmbeddingGenerator
+        texts = load_report_chunks(args.reports)
+        if not texts:
+            raise SystemExit(f"No .pdf or .txt reports under {args.reports}")
+        vectors = EmbeddingGenerator().embed_documents(texts)
+    else:
+        rng = np.random.default_rng(args.seed)
+        texts = [f"chunk-{i}" for i in range(args.synthetic)]
+        # Low-rank structure plus noise, closer to real embeddings than iid noise
+        basis = rng.standard_normal((64, args.dim)).astype(np.float32)
+        vectors = rng.standard_normal((len(texts), 64)).astype(np.float32) @ basis
+        vectors += 0.5 * rng.standard_normal(vectors.shape).astype(np.float32)
+    return dict(zip(texts, vectors))
+
+
+def run(args):
+    corpus = build_corpus(args)
+    texts = list(corpus)
+    rng = np.random.default_rng(args.seed)
+    queries = list(rng.choice(texts, size=min(args.queries, len(texts)), replace=False))
+
+    # Perturb the queries so they are not exact copies of a stored chunk.
+    # Kept apart from the corpus: the indexed chunks stay unperturbed
+    query_vectors = {}
+    for query in queries:
+        noise = rng.standard_normal(corpus[query].shape).astype(np.float32)
+        scale = args.query_noise * float(np.linalg.norm(corpus[query])) / np.sqrt(noise.size)
+        query_vectors[query] = (corpus[query] + scale * noise).astype(np.float32)
+
+    documents = [
+        {"id": str(i), "text": text, "source": "bench", "metadata": {"report_id": "bench"}}
+        for i, text in enumerate(texts)
+    ]
+
+    print(f"{len(texts)} chunks, dim {len(next(iter(corpus.values())))}, "
+          f"{len(queries)} queries, top_k={args.top_k}")
+    print(f"{'storage':<8} {'recall@k':>9} {'mean ms':>9} {'p95 ms':>9} {'index MB':>9}")
+
+    exact = None
+    for storage in STORAGE_DTYPES:
+        with tempfile.TemporaryDirectory() as directory:
+            store = NumpyVectorStore(
+                persist_directory=directory,
+                storage=storage,
+                embedding_generator=_PrecomputedEmbeddings(corpus)
+            )
+            store.add_documents(documents)
+
+            # Reload so quantized modes run as they would after a restart;
+            # from here on only queries are embedded
+            store = NumpyVectorStore(
+                persist_directory=directory,
+                storage=storage,
+                embedding_generator=_PrecomputedEmbeddings(query_vectors)
+            )
+            store.open()
+
+            latencies, results = [], []
+            for query in queries:
+                started = time.perf_counter()
+                hits = store.query(query, top_k=args.top_k)
+                latencies.append((time.perf_counter() - started) * 1000)
+                results.append([hit["text"] for hit in hits])
+
+            if exact is None:
+                exact = results
+            recall = np.mean([
+                len(set(got) & set(want)) / len(want)
+                for got, want in zip(results, exact)
+            ])
+
+            print(f"{storage:<8} {recall:>9.3f} {np.mean(latencies):>9.3f} "
+                  f"{np.percentile(latencies, 95):>9.3f} "
+                  f"{store.stats()['index_bytes'] / 2**20:>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--reports", help="directory of .pdf / .txt reports")
+    source.add_argument("--synthetic", type=int, default=20000, help="synthetic chunk count")
+    parser.add_argument("--dim", type=int, default=768, help="synthetic dimension")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--query-noise", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=0)
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
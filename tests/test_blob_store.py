@@ -0,0 +1,121 @@
+import hashlib
+import os
+
+import pytest
+
+from tools.blob_store import BlobStore, MultipartUpload
+
+BOUNDARY = "----test-boundary"
+CONTENT_TYPE = f"multipart/form-data; boundary={BOUNDARY}"
+
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 64
+
+
+def _body(parts):
+    out = b""
+    for name, filename, data in parts:
+        disposition = f'form-data; name="{name}"'
+        if filename:
+            disposition += f'; filename="{filename}"'
+        out += (
+            f"--{BOUNDARY}\r\nContent-Disposition: {disposition}\r\n\r\n"
+        ).encode("latin-1") + data + b"\r\n"
+    return out + f"--{BOUNDARY}--\r\n".encode("latin-1")
+
+
+def _upload(store, body, sizes):
+    upload = MultipartUpload(store, CONTENT_TYPE)
+    start = 0
+    for size in sizes:
+        upload.feed(body[start:start + size])
+        start += size
+    upload.feed(body[start:])
+    return upload.close()
+
+
+def _leftovers(store):
+    return os.listdir(store.tmp_dir)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return BlobStore(root=str(tmp_path / "blobs"))
+
+
+def test_upload_parsed_the_same_however_the_body_is_split(store):
+    body = _body([("note", None, b"chest x-ray"), ("file", "scan.png", PNG)])
+    expected_id = f"{hashlib.sha256(PNG).hexdigest()}.png"
+
+    # Splits inside the boundary, the headers and the file data
+    boundary_at = body.index(BOUNDARY.encode(), 10)
+    for sizes in ([1] * 200, [boundary_at + 3], [7, 13, 4096], [len(body) - 5]):
+        result = _upload(store, body, sizes)
+
+        assert result["fields"] == {"note": "chest x-ray"}
+        [blob] = result["blobs"]
+        assert blob["blob_id"] == expected_id
+        assert blob["size"] == len(PNG)
+        with open(store.path(expected_id), "rb") as f:
+            assert f.read() == PNG
+
+    assert _leftovers(store) == []
+
+
+def test_same_content_stored_once(store):
+    body = _body([("file", "a.png", PNG)])
+    first = _upload(store, body, [])["blobs"][0]
+    second = _upload(store, body, [])["blobs"][0]
+
+    assert first["blob_id"] == second["blob_id"]
+    assert not first["deduplicated"]
+    assert second["deduplicated"]
+
+
+def test_truncated_body_is_rejected_and_cleaned_up(store):
+    body = _body([("file", "scan.png", PNG)])
+    upload = MultipartUpload(store, CONTENT_TYPE)
+    upload.feed(body[:len(body) // 2])
+
+    with pytest.raises(ValueError):
+        upload.close()
+
+    assert _leftovers(store) == []
+    assert [d for d in os.listdir(store.root) if d != "tmp"] == []
+
+
+def test_unsupported_file_type_is_rejected(store):
+    body = _body([("file", "notes.exe", b"MZ" + b"\x00" * 512)])
+
+    with pytest.raises(ValueError):
+        _upload(store, body, [])
+
+    assert _leftovers(store) == []
+
+
+def test_non_multipart_body_is_rejected(store):
+    with pytest.raises(ValueError):
+        MultipartUpload(store, "application/json")
+
+
+@pytest.mark.parametrize("blob_id", [
+    "",
+    "../etc/passwd",
+    "0" * 64,
+    "0" * 64 + ".exe",
+    "0" * 63 + ".png",
+    "A" * 64 + ".png",
+    "0" * 64 + ".png/../../x",
+    "/abs/" + "0" * 64 + ".png",
+    "0" * 64 + ".png\n",
+    "\n" + "0" * 64 + ".png",
+    None,
+    ["0" * 64 + ".png"],
+])
+def test_invalid_blob_ids_are_rejected(store, blob_id):
+    with pytest.raises(ValueError):
+        store.path_for(blob_id)
+
+
+def test_unknown_blob_id_is_not_found(store):
+    with pytest.raises(FileNotFoundError):
+        store.path("0" * 64 + ".png")
@@ -0,0 +1,100 @@
+from vector_store.bm25_index import BM25Index, query_terms, reciprocal_rank_fusion
+
+CHUNKS = [
+    {"id": "r1::a", "text": "Troponin I was 0.02 ng/mL on day 1.", "source": "labs.pdf",
+     "metadata": {"report_id": "r1"}},
+    {"id": "r1::b", "text": "HbA1c 7.9% and LDL-C 130 mg/dL.", "source": "labs.pdf",
+     "metadata": {"report_id": "r1"}},
+    {"id": "r2::a", "text": "Chest x-ray shows no consolidation.", "source": "cxr.pdf",
+     "metadata": {"report_id": "r2"}},
+]
+
+
+def _index(partition="clinic/p1"):
+    index = BM25Index()
+    index.add_documents(CHUNKS, partition=partition)
+    return index
+
+
+def _doc(doc_id):
+    return {"id": doc_id}
+
+
+def test_query_terms_keep_lab_names_and_drop_stopwords():
+    assert query_terms("What does the report say about HbA1c and LDL-C?") == ["hba1c", "ldl-c"]
+
+
+def test_query_ranks_exact_lab_names_first():
+    hits = _index().query("LDL-C level", top_k=3, partition="clinic/p1")
+
+    assert hits[0]["id"] == "r1::b"
+    assert hits[0]["source"] == "labs.pdf" and hits[0]["report_id"] == "r1"
+
+
+def test_partitions_and_stale_chunks():
+    index = _index()
+    assert index.query("troponin", partition="clinic/p2") == []
+
+    index.remove_stale("r1", ["r1::b"], partition="clinic/p1")
+    assert index.query("troponin", partition="clinic/p1") == []
+    assert [d["id"] for d in index.query("consolidation", partition="clinic/p1")] == ["r2::a"]
+
+
+def test_evicted_partition_is_rebuilt_from_the_loader():
+    loads = []
+
+    def loader(partition):
+        loads.append(partition)
+        return [{**c["metadata"], "id": c["id"], "text": c["text"], "source": c["source"]} for c in CHUNKS]
+
+    index = BM25Index(loader=loader, max_partitions=1)
+    assert index.query("troponin", partition="a")[0]["id"] == "r1::a"
+    index.query("troponin", partition="b")          # evicts "a"
+    assert index.query("troponin", partition="a")[0]["id"] == "r1::a"
+    assert loads == ["a", "b", "a"]
+
+
+def test_is_lexical_only_for_short_fully_indexed_queries():
+    index = _index()
+
+    assert index.is_lexical("troponin", partition="clinic/p1")
+    # "trend" is not in the reports
+    assert not index.is_lexical("HbA1c trend", partition="clinic/p1")
+    assert index.is_lexical("HbA1c LDL-C troponin", partition="clinic/p1")
+    # Too many terms, even though all are indexed
+    assert not index.is_lexical("HbA1c LDL-C troponin consolidation", partition="clinic/p1")
+    assert not index.is_lexical("what is the", partition="clinic/p1")
+    assert not index.is_lexical("troponin", partition="clinic/p2")
+
+
+def test_fingerprint_tracks_the_chunk_set():
+    index = _index()
+    before = index.fingerprint("clinic/p1")
+
+    index.add_documents(CHUNKS[:1], partition="clinic/p1")
+    assert index.fingerprint("clinic/p1") == before
+
+    index.remove_stale("r2", [], partition="clinic/p1")
+    assert index.fingerprint("clinic/p1") != before
+
+
+def test_rrf_rewards_agreement_between_rankings():
+    dense = [_doc("a"), _doc("b"), _doc("c")]
+    lexical = [_doc("d"), _doc("b"), _doc("e")]
+
+    fused = reciprocal_rank_fusion([dense, lexical], top_k=5)
+
+    # b is second in both lists; every other chunk is in only one
+    assert [d["id"] for d in fused] == ["b", "a", "d", "c", "e"]
+
+
+def test_rrf_sums_reciprocal_ranks_and_truncates():
+    fused = reciprocal_rank_fusion([[_doc("x"), _doc("y")], [_doc("y")]], top_k=1, k=0)
+
+    # y: 1/2 + 1/1 beats x: 1/1
+    assert [d["id"] for d in fused] == ["y"]
+    assert reciprocal_rank_fusion([[], []], top_k=3) == []
+def test_key_terms_keep_indexed_terms_and_numbers():
+    terms = _index().key_terms("Was troponin higher on day 3 than baseline?", partition="clinic/p1")
+
+    assert terms == frozenset({"troponin", "day", "3"})
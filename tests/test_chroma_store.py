@@ -0,0 +1,83 @@
+import hashlib
+
+import numpy as np
+import pytest
+
+pytest.importorskip("chromadb")
+
+from vector_store import chroma_store
+from vector_store.base import partition_key
+from vector_store.chroma_store import ChromaVectorStore
+
+
+class _FakeEmbeddings:
+    def embed_documents(self, texts):
+        return np.stack([_vector(text) for text in texts])
+
+    def embed_query(self, query):
+        return _vector(query)
+
+
+def _vector(text):
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:4], "little")
+    return np.random.default_rng(seed).standard_normal(16).astype(np.float32)
+
+
+def _docs(report_id, count, session_id=None):
+    metadata = {"report_id": report_id}
+    if session_id:
+        metadata["session_id"] = session_id
+    return [
+        {"id": f"{report_id}::{i}", "text": f"{report_id} chunk {i}",
+         "source": f"{report_id}.pdf", "metadata": dict(metadata)}
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ChromaVectorStore(
+        persist_directory=str(tmp_path / "chroma"),
+        embedding_generator=_FakeEmbeddings()
+    )
+
+
+def test_document_count_is_kept_without_recounting(store, monkeypatch):
+    store.add_documents(_docs("r1", 4), partition="clinic/p1")
+    store.add_documents(_docs("r2", 3), partition="clinic/p2")
+    assert store.stats()["documents"] == 7
+
+    calls = []
+    get_collection = store.client.get_collection
+    monkeypatch.setattr(
+        store.client, "get_collection",
+        lambda *args, **kwargs: calls.append(args) or get_collection(*args, **kwargs)
+    )
+
+    store.add_documents(_docs("r3", 2), partition="clinic/p3")
+    store.remove_stale("r1", ["r1::0"], partition="clinic/p1")
+    for _ in range(5):
+        assert store.stats()["documents"] == 6
+    assert calls == []
+
+    # Periodic recount picks up writes made by other processes
+    other = ChromaVectorStore(
+        persist_directory=store.persist_directory,
+        embedding_generator=_FakeEmbeddings()
+    )
+    other.add_documents(_docs("r4", 5), partition="clinic/p4")
+    monkeypatch.setattr(chroma_store, "DOCUMENT_RECOUNT_SECONDS", -1)
+    assert store.stats()["documents"] == 11
+
+
+def test_session_chunks_share_the_tenant_collection(store):
+    a = partition_key({"tenant_id": "clinic", "session_id": "a"})
+    b = partition_key({"tenant_id": "clinic", "session_id": "b"})
+    store.add_documents(_docs("r1", 2, session_id="a"), partition=a)
+    store.add_documents(_docs("r1", 3, session_id="b"), partition=b)
+
+    assert sorted(d["id"] for d in store.documents(partition=a)) == ["r1::0", "r1::1"]
+    assert store.remove_stale("r1", ["r1::0"], partition=b) == 2
+    assert len(store.documents(partition=a)) == 2
+    assert [d["id"] for d in store.query("r1 chunk 0", top_k=5, partition=b)] == ["r1::0"]
+    assert store.stats()["documents"] == 3
@@ -0,0 +1,202 @@
+import hashlib
+
+import numpy as np
+import pytest
+
+from vector_store import numpy_store
+from vector_store.base import partition_key
+from vector_store.numpy_store import NumpyVectorStore, STORAGE_DTYPES
+
+DIM = 32
+
+
+class _FakeEmbeddings:
+    # Stable pseudo-random vector per text; counts embedded texts
+    def __init__(self):
+        self.embedded = 0
+
+    def embed_documents(self, texts):
+        self.embedded += len(texts)
+        return np.stack([_vector(text) for text in texts])
+
+
+def _vector(text):
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:4], "little")
+    return np.random.default_rng(seed).standard_normal(DIM).astype(np.float32)
+
+
+def _docs(report_id, count, start=0):
+    return [
+        {
+            "id": f"{report_id}::{i}",
+            "text": f"{report_id} chunk {i}",
+            "source": f"{report_id}.pdf",
+            "metadata": {"report_id": report_id, "chunk": i}
+        }
+        for i in range(start, start + count)
+    ]
+
+
+def _store(directory, storage, embeddings=None):
+    return NumpyVectorStore(
+        persist_directory=None if directory is None else str(directory),
+        storage=storage,
+        embedding_generator=embeddings or _FakeEmbeddings()
+    )
+
+
+def _top_id(store, text):
+    return store.query(text, top_k=1)[0]["id"]
+
+
+@pytest.mark.parametrize("storage", list(STORAGE_DTYPES))
+def test_add_delete_reopen_add_round_trip(tmp_path, storage):
+    # More rows than the initial capacity, so the buffers grow
+    store = _store(tmp_path, storage)
+    assert store.add_documents(_docs("r1", 300)) == 300
+    assert store.add_documents(_docs("r2", 20)) == 20
+    assert _top_id(store, "r1 chunk 299") == "r1::299"
+
+    # Drop the second half of r1
+    keep = [doc["id"] for doc in _docs("r1", 150)]
+    assert store.remove_stale("r1", keep) == 150
+    assert store.stats()["documents"] == 170
+    assert all(hit["id"] != "r1::299" for hit in store.query("r1 chunk 299", top_k=10))
+
+    reopened = _store(tmp_path, storage)
+    assert sorted(doc["id"] for doc in reopened.documents()) == sorted(
+        keep + [doc["id"] for doc in _docs("r2", 20)]
+    )
+    assert _top_id(reopened, "r2 chunk 7") == "r2::7"
+    hit = reopened.query("r1 chunk 3", top_k=1)[0]
+    assert hit["text"] == "r1 chunk 3"
+    assert hit["report_id"] == "r1" and hit["chunk"] == 3 and hit["source"] == "r1.pdf"
+
+    # Appending after a reload grows past the read-only memory maps
+    assert reopened.add_documents(_docs("r3", 300)) == 300
+    assert _top_id(reopened, "r3 chunk 250") == "r3::250"
+    assert _top_id(reopened, "r1 chunk 100") == "r1::100"
+
+    final = _store(tmp_path, storage)
+    assert final.stats()["documents"] == 470
+    for text, doc_id in (("r1 chunk 0", "r1::0"), ("r2 chunk 19", "r2::19"), ("r3 chunk 299", "r3::299")):
+        assert _top_id(final, text) == doc_id
+
+
+@pytest.mark.parametrize("storage", list(STORAGE_DTYPES))
+def test_known_ids_are_not_re_embedded(tmp_path, storage):
+    embeddings = _FakeEmbeddings()
+    store = _store(tmp_path, storage, embeddings)
+    store.add_documents(_docs("r1", 10))
+
+    relabeled = _docs("r1", 10)
+    relabeled[0]["metadata"]["section"] = "IMPRESSION"
+    assert store.add_documents(relabeled) == 0
+    assert embeddings.embedded == 10
+
+    reopened = _store(tmp_path, storage, embeddings)
+    assert reopened.query("r1 chunk 0", top_k=1)[0]["section"] == "IMPRESSION"
+    assert reopened.add_documents(_docs("r1", 10)) == 0
+    # Queries are embedded too; no chunk was
+    assert embeddings.embedded == 11
+
+
+@pytest.mark.parametrize("storage", ["float16", "int8"])
+def test_quantized_block_scan_matches_exact_search(tmp_path, storage, monkeypatch):
+    # Several scan blocks, the last one partial
+    monkeypatch.setattr(numpy_store, "SCAN_BLOCK_ROWS", 37)
+    docs = _docs("r1", 500)
+    exact = _store(tmp_path / "exact", "float32")
+    quantized = _store(tmp_path / "quantized", storage)
+    exact.add_documents(docs)
+    quantized.add_documents(docs)
+    quantized = _store(tmp_path / "quantized", storage)
+
+    queries = [f"query {i}" for i in range(25)]
+    want = exact.query_many(queries, top_k=5)
+    got = quantized.query_many(queries, top_k=5)
+
+    for expected, actual in zip(want, got):
+        assert [hit["id"] for hit in actual] == [hit["id"] for hit in expected]
+        # Re-scored against the float32 vectors: same order, same hits
+        assert len(actual) == 5
+
+
+@pytest.mark.parametrize("saved, loaded", [
+    ("float32", "int8"),
+    ("int8", "float16"),
+    ("float16", "float32"),
+])
+def test_storage_mode_change_re_encodes(tmp_path, saved, loaded):
+    _store(tmp_path, saved).add_documents(_docs("r1", 50))
+
+    store = _store(tmp_path, loaded)
+    assert store.stats()["documents"] == 50
+    assert _top_id(store, "r1 chunk 42") == "r1::42"
+
+    store.add_documents(_docs("r2", 5))
+    reopened = _store(tmp_path, loaded)
+    assert _top_id(reopened, "r2 chunk 4") == "r2::4"
+    assert _top_id(reopened, "r1 chunk 1") == "r1::1"
+
+
+@pytest.mark.parametrize("storage", list(STORAGE_DTYPES))
+def test_in_memory_store(storage):
+    store = _store(None, storage)
+    store.add_documents(_docs("r1", 300))
+    store.remove_stale("r1", [f"r1::{i}" for i in range(0, 300, 2)])
+    store.add_documents(_docs("r2", 3))
+
+    assert store.stats()["documents"] == 153
+    assert _top_id(store, "r1 chunk 298") == "r1::298"
+    assert _top_id(store, "r2 chunk 1") == "r2::1"
+
+
+def test_partitions_are_isolated(tmp_path):
+    store = _store(tmp_path, "float32")
+    store.add_documents(_docs("r1", 5), partition="clinic/p1")
+    store.add_documents(_docs("r2", 5), partition="clinic/p2")
+
+    assert {hit["report_id"] for hit in store.query("r1 chunk 1", top_k=10, partition="clinic/p2")} == {"r2"}
+    assert store.documents() == []
+    assert store.stats()["documents"] == 10
+
+
+def test_unknown_storage_is_rejected():
+    with pytest.raises(ValueError):
+        _store(None, "bfloat16")
+
+
+def _session_docs(session_id, texts):
+    return [
+        {
+            "id": f"r1::{i}",
+            "text": text,
+            "source": "r1.pdf",
+            "metadata": {"report_id": "r1", "session_id": session_id}
+        }
+        for i, text in enumerate(texts)
+    ]
+
+
+@pytest.mark.parametrize("storage", list(STORAGE_DTYPES))
+def test_sessions_share_the_tenant_partition(tmp_path, storage):
+    store = _store(tmp_path, storage)
+    a = partition_key({"tenant_id": "clinic", "session_id": "a"})
+    b = partition_key({"tenant_id": "clinic", "session_id": "b"})
+    # Same report id and chunk ids in both sessions
+    store.add_documents(_session_docs("a", ["shared text", "only a"]), partition=a)
+    store.add_documents(_session_docs("b", ["shared text", "only b"]), partition=b)
+
+    assert [hit["id"] for hit in store.query("only a", top_k=5, partition=a)] == ["r1::1", "r1::0"]
+    assert {hit["text"] for hit in store.documents(partition=b)} == {"shared text", "only b"}
+
+    assert store.remove_stale("r1", ["r1::0"], partition=a) == 1
+    assert {hit["text"] for hit in store.documents(partition=a)} == {"shared text"}
+    assert {hit["text"] for hit in store.documents(partition=b)} == {"shared text", "only b"}
+
+    # One directory for the tenant, none per session
+    reopened = _store(tmp_path, storage)
+    assert len(list((tmp_path / "medical_reports").iterdir())) == 1
+    assert [hit["id"] for hit in reopened.query("only b", top_k=1, partition=b)] == ["r1::1"]
+    assert reopened.stats()["documents"] == 3
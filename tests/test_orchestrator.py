@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+from vector_store import base
+
+
+@pytest.fixture
+def orchestrator(tmp_path, monkeypatch):
+    # Every store the orchestrator opens lands in tmp_path
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(base, "VECTOR_STORE_BACKEND", "numpy")
+    from orchestrator import MedicalAIOrchestrator
+    return MedicalAIOrchestrator()
+
+
+def _blob(orchestrator, data):
+    return orchestrator.blob_store.put([data])["blob_id"]
+
+
+def _sessions(orchestrator):
+    return orchestrator.session_memory.stats()["sessions"]
+
+
+def test_rejected_inputs_create_no_session(orchestrator, tmp_path):
+    pdf_blob = _blob(orchestrator, b"%PDF-1.4\n" + b"\x00" * 200)
+    png_blob = _blob(orchestrator, b"\x89PNG\r\n\x1a\n" + b"\x00" * 200)
+    notes = tmp_path / "notes.txt"
+    notes.write_text("not an image")
+
+    bad_inputs = [
+        {"image_blob_id": "../../etc/passwd"},
+        {"image_blob_id": "0" * 64 + ".png"},
+        {"image_blob_id": pdf_blob},
+        {"image_path": str(notes)},
+        {"image_path": str(tmp_path / "missing.png")},
+        {"reports": [{"id": "r1", "blob_id": png_blob, "source": "r1.pdf"}]},
+        {"reports": [{"id": "r1", "blob_id": "nope", "source": "r1.pdf"}]},
+    ]
+    for inputs in bad_inputs:
+        with pytest.raises((ValueError, FileNotFoundError)):
+            orchestrator.run({"user_query": "What does the scan show?", **inputs})
+
+    assert _sessions(orchestrator) == 0
+
+
+def _fail(*args, **kwargs):
+    raise RuntimeError("model unavailable")
+
+
+def test_failed_first_turn_leaves_no_session(orchestrator):
+    orchestrator.intake_agent.execute = _fail
+    orchestrator.intake_agent.aexecute = _fail
+
+    with pytest.raises(RuntimeError):
+        orchestrator.run({"intake": {"age": 40}})
+    with pytest.raises(RuntimeError):
+        list(orchestrator.run_stream({"intake": {"age": 40}}))
+    with pytest.raises(RuntimeError):
+        asyncio.run(orchestrator.arun({"intake": {"age": 40}}))
+
+    assert _sessions(orchestrator) == 0
+
+
+def test_failed_follow_up_turn_keeps_the_session(orchestrator):
+    session_id = orchestrator.session_memory.create_session()
+    orchestrator.intake_agent.execute = _fail
+
+    with pytest.raises(RuntimeError):
+        orchestrator.run({"session_id": session_id, "intake": {"age": 40}})
+
+    assert orchestrator.session_memory.has_session(session_id)
+
+
+def test_session_spill_is_opt_in(orchestrator, tmp_path, monkeypatch):
+    orchestrator.session_memory.create_session()
+    assert orchestrator.session_memory.stats()["spilled"] == 0
+    assert not (tmp_path / "session_store.db").exists()
+
+    import orchestrator as orchestrator_module
+    monkeypatch.setattr(orchestrator_module, "SESSION_SPILL_ENABLED", True)
+    assert orchestrator_module.MedicalAIOrchestrator().session_memory._spill is not None
+    assert (tmp_path / "session_store.db").exists()
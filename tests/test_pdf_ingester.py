@@ -0,0 +1,80 @@
+import os
+import time
+
+import fitz
+
+from tools import pdf_ingester
+from tools.pdf_ingester import iter_pdf_pages, prune_pdf_cache
+
+
+def _pdf(path, pages):
+    doc = fitz.open()
+    for text in pages:
+        doc.new_page().insert_text((72, 72), text)
+    doc.save(path)
+    doc.close()
+    return str(path)
+
+
+def _cache_file(cache_dir, name, size, age):
+    path = os.path.join(cache_dir, name)
+    with open(path, "w") as f:
+        f.write("x" * size)
+    stamp = time.time() - age
+    os.utime(path, (stamp, stamp))
+    return path
+
+
+def test_pages_are_cached_by_content(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    first = _pdf(tmp_path / "a.pdf", ["Sodium 140 mmol/L", "Potassium 4.1 mmol/L"])
+
+    pages = list(iter_pdf_pages(first, use_cache=True, cache_dir=cache_dir))
+    assert [n for n, _ in pages] == [1, 2]
+    assert "Sodium 140" in pages[0][1]
+    assert len(os.listdir(cache_dir)) == 1
+
+    os.rename(first, tmp_path / "b.pdf")
+    again = list(iter_pdf_pages(str(tmp_path / "b.pdf"), use_cache=True, cache_dir=cache_dir))
+    assert again == pages
+
+
+def test_prune_drops_expired_then_least_recently_used(tmp_path):
+    cache_dir = str(tmp_path)
+    expired = _cache_file(cache_dir, "expired.jsonl", 10, age=100)
+    old = _cache_file(cache_dir, "old.jsonl", 40, age=30)
+    recent = _cache_file(cache_dir, "recent.jsonl", 40, age=10)
+    other = _cache_file(cache_dir, "notes.tmp", 1000, age=1000)
+
+    removed = prune_pdf_cache(cache_dir, ttl_seconds=60, max_bytes=50)
+
+    assert removed == 2
+    assert not os.path.exists(expired)
+    assert not os.path.exists(old)
+    assert os.path.exists(recent)
+    assert os.path.exists(other)
+
+
+def test_expired_cache_entry_is_rebuilt(tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / "cache")
+    path = _pdf(tmp_path / "a.pdf", ["Troponin negative"])
+    list(iter_pdf_pages(path, use_cache=True, cache_dir=cache_dir))
+    [name] = os.listdir(cache_dir)
+    cached = os.path.join(cache_dir, name)
+    with open(cached, "w") as f:
+        f.write('[1, "stale"]\n')
+
+    monkeypatch.setattr(pdf_ingester, "PDF_CACHE_TTL_SECONDS", -1)
+    pages = list(iter_pdf_pages(path, use_cache=True, cache_dir=cache_dir))
+
+    assert "Troponin negative" in pages[0][1]
+
+
+def test_cache_write_prunes(tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / "cache")
+    monkeypatch.setattr(pdf_ingester, "PDF_CACHE_MAX_BYTES", 0)
+    path = _pdf(tmp_path / "a.pdf", ["Hemoglobin 13.2 g/dL"])
+
+    pages = list(iter_pdf_pages(path, use_cache=True, cache_dir=cache_dir))
+
+    assert pages and os.listdir(cache_dir) == []
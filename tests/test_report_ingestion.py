@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+
+from agents.rag_report_agent import RAGReportAgent
+from vector_store.base import partition_key
+from vector_store.embeddings import EmbeddingGenerator
+from vector_store.numpy_store import NumpyVectorStore
+
+PARTITION = {"tenant_id": "clinic", "patient_id": "p1", "session_id": "s1"}
+
+
+class _CountingClient:
+    # Deterministic fake embedding model that records every text it embeds
+    embedding_model = "fake-embed"
+
+    def __init__(self):
+        self.embedded = []
+
+    def embed_texts(self, texts, batch_size=None):
+        self.embedded.extend(texts)
+        return np.stack([_vector(text) for text in texts])
+
+
+def _vector(text):
+    rng = np.random.default_rng(abs(hash(text)) % (2 ** 32))
+    return rng.standard_normal(16).astype(np.float32)
+
+
+def _report(findings):
+    pages = [
+        "LABORATORY RESULTS\n\n" + " ".join(
+            f"{name} was {value} on day {day}." for day in range(8)
+            for name, value in findings
+        ),
+        "IMPRESSION:\n\nNo acute findings.",
+    ]
+    return {"id": "r1", "source": "labs.pdf", "pages": pages}
+
+
+def _agent(tmp_path, client, cache_dir=None):
+    generator = EmbeddingGenerator(cache_dir=cache_dir)
+    generator.client = client
+    store = NumpyVectorStore(
+        persist_directory=str(tmp_path / "index"),
+        embedding_generator=generator
+    )
+    return RAGReportAgent(vector_store=store)
+
+
+@pytest.fixture
+def client():
+    return _CountingClient()
+
+
+def test_reingesting_the_same_report_embeds_nothing(tmp_path, client):
+    agent = _agent(tmp_path, client)
+    report = _report([("Sodium", 140), ("Potassium", 4.1)])
+
+    agent.ingest_reports([report], partition=PARTITION)
+    first = len(client.embedded)
+    count = agent.vector_store.stats()["documents"]
+    assert first > 0
+
+    agent.ingest_reports([report], partition=PARTITION)
+
+    assert len(client.embedded) == first
+    assert agent.vector_store.stats()["documents"] == count
+
+
+def test_reingest_after_restart_embeds_nothing(tmp_path, client):
+    report = _report([("Sodium", 140)])
+    _agent(tmp_path, client).ingest_reports([report], partition=PARTITION)
+    first = len(client.embedded)
+
+    # Fresh store over the same persisted index
+    _agent(tmp_path, client).ingest_reports([report], partition=PARTITION)
+
+    assert len(client.embedded) == first
+
+
+def test_embedding_cache_covers_a_rebuilt_index(tmp_path, client):
+    report = _report([("Sodium", 140)])
+    cache_dir = str(tmp_path / "embedding_cache")
+    _agent(tmp_path / "a", client, cache_dir).ingest_reports([report], partition=PARTITION)
+    first = len(client.embedded)
+
+    # Empty index, warm cache
+    _agent(tmp_path / "b", client, cache_dir).ingest_reports([report], partition=PARTITION)
+
+    assert len(client.embedded) == first
+
+
+def test_revised_report_embeds_only_changed_chunks(tmp_path, client):
+    agent = _agent(tmp_path, client)
+    agent.ingest_reports([_report([("Sodium", 140)])], partition=PARTITION)
+    first = len(client.embedded)
+
+    revised = _report([("Sodium", 140)])
+    revised["pages"][1] = "IMPRESSION:\n\nMild hyponatremia."
+    agent.ingest_reports([revised], partition=PARTITION)
+
+    assert client.embedded[first:] == ["IMPRESSION: Mild hyponatremia."]
+    texts = [doc["text"] for doc in agent.vector_store.documents(partition=partition_key(PARTITION))]
+    assert "IMPRESSION: Mild hyponatremia." in texts
+    assert "IMPRESSION: No acute findings." not in texts
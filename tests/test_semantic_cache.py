@@ -0,0 +1,133 @@
+import numpy as np
+
+from agents.rag_report_agent import RAGReportAgent
+from llm.semantic_cache import SemanticAnswerCache
+from memory.context_store import MedicalContextStore
+from vector_store.embeddings import EmbeddingGenerator
+from vector_store.numpy_store import NumpyVectorStore
+
+ANSWER = {"answer": "Troponin was normal.", "sources": ["labs.pdf"]}
+TROPONIN = frozenset({"troponin"})
+
+
+def _unit(*values):
+    vector = np.zeros(8, dtype=np.float32)
+    vector[:len(values)] = values
+    return vector
+
+
+def test_hit_needs_same_terms_and_close_meaning():
+    cache = SemanticAnswerCache(threshold=0.97)
+    cache.set(_unit(1, 0), "p1", "fp", TROPONIN, ANSWER)
+
+    assert cache.get(_unit(1, 0.1), "p1", "fp", TROPONIN) == ANSWER
+    # Close embedding, different lab
+    assert cache.get(_unit(1, 0.1), "p1", "fp", frozenset({"potassium"})) is None
+    # Same lab, different question
+    assert cache.get(_unit(1, 1), "p1", "fp", TROPONIN) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_answers_are_scoped_to_partition_and_report_set():
+    cache = SemanticAnswerCache()
+    cache.set(_unit(1), "p1", "fp1", TROPONIN, ANSWER)
+
+    assert cache.get(_unit(1), "p2", "fp1", TROPONIN) is None
+    # Reports changed: the partition's answers are dropped
+    assert cache.get(_unit(1), "p1", "fp2", TROPONIN) is None
+    assert cache.get(_unit(1), "p1", "fp1", TROPONIN) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_invalidate_drops_only_that_partition():
+    cache = SemanticAnswerCache()
+    cache.set(_unit(1), "p1", "fp", TROPONIN, ANSWER)
+    cache.set(_unit(1), "p2", "fp", TROPONIN, ANSWER)
+
+    cache.invalidate("p1")
+
+    assert cache.get(_unit(1), "p1", "fp", TROPONIN) is None
+    assert cache.get(_unit(1), "p2", "fp", TROPONIN) == ANSWER
+    assert cache.stats()["entries"] == 1
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = SemanticAnswerCache(max_entries=2)
+    cache.set(_unit(1, 0), "p1", "fp", TROPONIN, {"answer": "a"})
+    cache.set(_unit(0, 1), "p1", "fp", TROPONIN, {"answer": "b"})
+    cache.get(_unit(1, 0), "p1", "fp", TROPONIN)
+    cache.set(_unit(0, 0, 1), "p2", "fp", TROPONIN, {"answer": "c"})
+
+    assert cache.get(_unit(0, 1), "p1", "fp", TROPONIN) is None
+    assert cache.get(_unit(1, 0), "p1", "fp", TROPONIN) == {"answer": "a"}
+    assert cache.stats()["entries"] == 2
+
+
+def test_cached_answers_are_copies():
+    cache = SemanticAnswerCache()
+    cache.set(_unit(1), "p1", "fp", TROPONIN, dict(ANSWER))
+
+    cache.get(_unit(1), "p1", "fp", TROPONIN)["answer"] = "changed"
+
+    assert cache.get(_unit(1), "p1", "fp", TROPONIN) == ANSWER
+
+
+# --------------------------------------------------
+# RAG AGENT
+# --------------------------------------------------
+
+class _Embeddings:
+    # Every text embeds to the same direction, so only key terms and
+    # the report set decide whether a cached answer is reused
+    embedding_model = "fake-embed"
+
+    def embed_texts(self, texts, batch_size=None):
+        return np.ones((len(texts), 8), dtype=np.float32)
+
+
+def _agent(tmp_path):
+    generator = EmbeddingGenerator(cache_dir=None)
+    generator.client = _Embeddings()
+    store = NumpyVectorStore(persist_directory=str(tmp_path), embedding_generator=generator)
+    agent = RAGReportAgent(vector_store=store, answer_cache=SemanticAnswerCache())
+
+    prompts = []
+
+    def generate_text(prompt):
+        prompts.append(prompt)
+        return f"answer {len(prompts)}"
+
+    agent.llm.generate_text = generate_text
+    return agent, prompts
+
+
+def _report(report_id, text):
+    return {"id": report_id, "source": f"{report_id}.pdf", "text": text}
+
+
+def test_agent_reuses_answers_until_reports_change(tmp_path):
+    partition = {"tenant_id": "clinic", "patient_id": "p1"}
+    agent, prompts = _agent(tmp_path)
+    agent.ingest_reports([_report("r1", "Troponin I was 0.02 ng/mL on day 1.")], partition=partition)
+
+    question = "How did the troponin level look on day 1 of the admission?"
+    first = agent.execute(question, MedicalContextStore(), partition=partition)
+    again = agent.execute(question.replace("look", "appear"), MedicalContextStore(), partition=partition)
+
+    assert first["answer"] == again["answer"] == "answer 1"
+    assert len(prompts) == 1
+
+    # Different day: a different question however close the embedding
+    agent.execute(question.replace("day 1", "day 3"), MedicalContextStore(), partition=partition)
+    assert len(prompts) == 2
+
+    # A new report invalidates the partition's answers
+    agent.ingest_reports([_report("r2", "Troponin I was 0.5 ng/mL on day 2.")], partition=partition)
+    assert agent.answer_cache.stats()["entries"] == 0
+    agent.execute(question, MedicalContextStore(), partition=partition)
+    assert len(prompts) == 3
+
+    # Re-ingesting unchanged reports keeps them
+    agent.ingest_reports([_report("r2", "Troponin I was 0.5 ng/mL on day 2.")], partition=partition)
+    agent.execute(question, MedicalContextStore(), partition=partition)
+    assert len(prompts) == 3
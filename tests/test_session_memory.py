@@ -0,0 +1,115 @@
+import time
+
+import pytest
+
+from memory import session_memory
+from memory.session_memory import SessionMemory
+
+
+@pytest.fixture
+def spill_path(tmp_path):
+    return str(tmp_path / "sessions.db")
+
+
+def _filled(memory, session_id, n):
+    memory.update_patient_context(session_id, {"age": n, "symptoms": ["cough"]})
+    memory.add_rag_report(session_id, {"answer": f"report {n}", "sources": ["labs.pdf"]})
+    memory.update_input_fingerprints(session_id, {"image": f"sha-{n}"})
+
+
+def test_least_recently_used_session_is_spilled_and_reloaded(spill_path):
+    memory = SessionMemory(max_sessions=2, spill_path=spill_path)
+    first = memory.create_session()
+    _filled(memory, first, 1)
+    expected = memory.get_session(first)
+
+    second = memory.create_session()
+    memory.get_session(first)          # first is now most recent
+    third = memory.create_session()    # evicts second, not first
+
+    assert second not in memory.sessions
+    assert first in memory.sessions
+    assert memory.stats() == {
+        "sessions": 2, "approx_bytes": memory.total_bytes,
+        "evictions": 1, "spilled": 1
+    }
+
+    memory.get_session(third)
+    memory.create_session()            # evicts first
+    assert first not in memory.sessions
+
+    assert memory.get_session(first) == expected
+    assert first in memory.sessions
+    assert memory.has_session(second)
+
+
+def test_reloaded_session_accepts_updates(spill_path):
+    memory = SessionMemory(max_sessions=1, spill_path=spill_path)
+    first = memory.create_session()
+    _filled(memory, first, 1)
+    memory.create_session()
+
+    memory.add_rag_report(first, {"answer": "report 2", "sources": []})
+
+    reports = memory.get_session(first)["rag_reports"]
+    assert [r["answer"] for r in reports] == ["report 1", "report 2"]
+    # A reloaded session is no longer on disk
+    assert memory.stats()["spilled"] == 1
+
+
+def test_byte_bound_evicts_and_accounting_stays_consistent(spill_path):
+    memory = SessionMemory(max_bytes=600, spill_path=spill_path)
+    ids = [memory.create_session() for _ in range(10)]
+    for n, session_id in enumerate(ids):
+        _filled(memory, session_id, n)
+
+    assert memory.total_bytes <= 600
+    assert memory.total_bytes == sum(r.approx_bytes for r in memory.sessions.values())
+    assert memory.evictions > 0
+
+    for n, session_id in enumerate(ids):
+        assert memory.get_session(session_id)["patient_context"]["age"] == n
+
+
+def test_spilled_sessions_survive_a_restart(spill_path):
+    memory = SessionMemory(max_sessions=1, spill_path=spill_path)
+    first = memory.create_session()
+    _filled(memory, first, 7)
+    memory.create_session()
+
+    restarted = SessionMemory(spill_path=spill_path)
+
+    assert restarted.get_session(first)["input_fingerprints"] == {"image": "sha-7"}
+
+
+def test_idle_sessions_expire_to_the_spill(spill_path):
+    memory = SessionMemory(ttl_seconds=0.05, spill_path=spill_path)
+    first = memory.create_session()
+    _filled(memory, first, 1)
+    time.sleep(0.1)
+
+    memory.create_session()
+
+    assert first not in memory.sessions
+    assert memory.get_session(first)["patient_context"]["age"] == 1
+
+
+def test_without_spill_evicted_sessions_are_gone():
+    memory = SessionMemory(max_sessions=1)
+    first = memory.create_session()
+    memory.create_session()
+
+    assert memory.get_session(first) == {}
+    with pytest.raises(ValueError):
+        memory.update_patient_context(first, {})
+
+
+def test_old_spilled_sessions_are_dropped(spill_path, monkeypatch):
+    memory = SessionMemory(max_sessions=1, spill_path=spill_path)
+    first = memory.create_session()
+    memory.create_session()             # spills first
+
+    monkeypatch.setattr(session_memory, "SPILL_TTL_SECONDS", -1)
+    memory.create_session()             # next spill prunes older rows
+
+    assert memory.get_session(first) == {}
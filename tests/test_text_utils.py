@@ -0,0 +1,82 @@
+from tools.text_utils import chunk_pages, chunk_text, estimate_tokens
+
+
+def _pages():
+    return [
+        (1, "LABORATORY RESULTS\n\n" + " ".join(
+            f"Sodium on day {i} was {130 + i} mmol/L." for i in range(12)
+        )),
+        (2, " ".join(
+            f"Potassium on day {i} was {3 + i / 10:.1f} mmol/L." for i in range(12)
+        )),
+        (3, "IMPRESSION:\n\nStable electrolytes. No acute findings."),
+    ]
+
+
+def test_chunks_point_back_to_their_page_text():
+    pages = dict(_pages())
+    chunks = list(chunk_pages(_pages(), max_tokens=40, overlap_tokens=10))
+
+    assert len(chunks) > 3
+    for chunk in chunks:
+        assert chunk["page_start"] <= chunk["page_end"]
+        first = pages[chunk["page_start"]][chunk["char_start"]:]
+        last = pages[chunk["page_end"]][:chunk["char_end"]]
+        # The chunk opens and closes with the text at its offsets
+        assert first.startswith(chunk["text"].split(" ", 1)[0])
+        assert last.endswith(chunk["text"].rsplit(" ", 1)[-1])
+        if chunk["page_start"] == chunk["page_end"]:
+            span = pages[chunk["page_start"]][chunk["char_start"]:chunk["char_end"]]
+            assert " ".join(span.split()) == chunk["text"]
+
+
+def test_chunks_cover_every_page_and_keep_sections():
+    chunks = list(chunk_pages(_pages(), max_tokens=40, overlap_tokens=10))
+
+    assert {c["page_start"] for c in chunks} | {c["page_end"] for c in chunks} == {1, 2, 3}
+    assert chunks[0]["section"] == "LABORATORY RESULTS"
+    assert chunks[-1]["section"] == "IMPRESSION"
+    assert chunks[-1]["text"] == "IMPRESSION: Stable electrolytes. No acute findings."
+
+
+def test_consecutive_chunks_overlap_within_budget():
+    chunks = list(chunk_pages(_pages(), max_tokens=40, overlap_tokens=10))
+
+    for chunk in chunks:
+        assert estimate_tokens(chunk["text"]) <= 40
+
+    overlapping = 0
+    for prev, nxt in zip(chunks, chunks[1:]):
+        if prev["section"] != nxt["section"]:
+            continue
+        # The next chunk starts inside the previous one
+        if (nxt["page_start"], nxt["char_start"]) < (prev["page_end"], prev["char_end"]):
+            overlapping += 1
+            head = nxt["text"].split(". ", 1)[0]
+            assert head in prev["text"]
+            assert estimate_tokens(head) <= 10
+    assert overlapping > 0
+
+
+def test_no_overlap_when_disabled():
+    chunks = list(chunk_pages(_pages(), max_tokens=40, overlap_tokens=0))
+
+    for prev, nxt in zip(chunks, chunks[1:]):
+        assert (nxt["page_start"], nxt["char_start"]) >= (prev["page_end"], prev["char_end"])
+
+
+def test_oversized_sentence_is_split():
+    text = " ".join(f"w{i}" for i in range(100))
+    chunks = list(chunk_text(text, max_tokens=30, overlap_tokens=0))
+
+    assert len(chunks) == 4
+    assert " ".join(c["text"] for c in chunks) == text
+    assert all(c["page_start"] == c["page_end"] == 1 for c in chunks)
+
+
+def test_form_feeds_are_page_breaks():
+    chunks = list(chunk_text("First page.\fSecond page.", max_tokens=3, overlap_tokens=0))
+
+    assert [(c["page_start"], c["text"]) for c in chunks] == [
+        (1, "First page."), (2, "Second page.")
+    ]
@@ -0,0 +1,254 @@
+import hashlib
+import os
+import re
+import tempfile
+from typing import Dict, Any, Iterable, List, Optional
+
+from werkzeug.http import parse_options_header
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NEED_DATA
+
+# Uploaded images and reports, stored once per distinct content
+BLOB_STORE_PATH = "./blob_store"
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_MB", "512")) * 1024 * 1024
+
+# Read size for request bodies
+UPLOAD_CHUNK_BYTES = 1 << 16
+
+# Plain form fields are small; anything bigger should be a file part
+MAX_FIELD_BYTES = 64 * 1024
+
+# Content sniffing: (offset, magic bytes, blob extension)
+_SIGNATURES = (
+    (0, b"\x89PNG\r\n\x1a\n", "png"),
+    (0, b"\xff\xd8\xff", "jpg"),
+    (0, b"BM", "bmp"),
+    (0, b"II*\x00", "tiff"),
+    (0, b"MM\x00*", "tiff"),
+    (0, b"%PDF-", "pdf"),
+    (128, b"DICM", "dcm"),
+)
+_SNIFF_BYTES = 132
+
+# "<sha256 of the content>.<type>"; ids never contain path separators
+_BLOB_ID_RE = re.compile(r"[0-9a-f]{64}\.(png|jpg|bmp|tiff|pdf|dcm)")
+
+
+class BlobWriter:
+    """
+    Streams one blob to a temp file, hashing as it goes. commit()
+    moves it to its content address (or drops it if already stored).
+    """
+
+    def __init__(self, store: "BlobStore"):
+        self.store = store
+        self.size = 0
+        self.kind: Optional[str] = None
+        self._head = b""
+        self._digest = hashlib.sha256()
+        self._file = tempfile.NamedTemporaryFile(
+            dir=store.tmp_dir, suffix=".part", delete=False
+        )
+
+    def write(self, data: bytes):
+        self.size += len(data)
+        if self.size > self.store.max_bytes:
+            self.abort()
+            raise ValueError(f"Upload exceeds {self.store.max_bytes} bytes")
+
+        if self.kind is None and len(self._head) < _SNIFF_BYTES:
+            self._head += data[:_SNIFF_BYTES - len(self._head)]
+            if len(self._head) == _SNIFF_BYTES:
+                # Reject unsupported content before it is all written
+                self._sniff()
+
+        self._digest.update(data)
+        self._file.write(data)
+
+    def commit(self) -> Dict[str, Any]:
+        """
+        Returns {"blob_id", "size", "type", "deduplicated"}.
+        """
+
+        if self.kind is None:
+            self._sniff()
+        self._file.close()
+
+        blob_id = f"{self._digest.hexdigest()}.{self.kind}"
+        path = self.store.path_for(blob_id)
+
+        deduplicated = os.path.exists(path)
+        if deduplicated:
+            os.unlink(self._file.name)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(self._file.name, path)
+
+        return {
+            "blob_id": blob_id,
+            "size": self.size,
+            "type": self.kind,
+            "deduplicated": deduplicated
+        }
+
+    def abort(self):
+        if not self._file.closed:
+            self._file.close()
+        if os.path.exists(self._file.name):
+            os.unlink(self._file.name)
+
+    def _sniff(self):
+        for offset, magic, kind in _SIGNATURES:
+            if self._head[offset:offset + len(magic)] == magic:
+                self.kind = kind
+                return
+        self.abort()
+        raise ValueError("Unsupported upload type (expected an image, DICOM or PDF)")
+
+
+class BlobStore:
+    """
+    Content-addressed on-disk store for uploads.
+
+    - A blob's id is the sha256 of its bytes plus its sniffed type,
+      so the same file uploaded twice is stored once
+    - Writes stream through a temp file and are moved into place
+      atomically; readers never see partial blobs
+    - Blobs are sharded by the first two hex digits of their id
+    """
+
+    def __init__(
+        self,
+        root: str = BLOB_STORE_PATH,
+        max_bytes: int = MAX_UPLOAD_BYTES
+    ):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.tmp_dir = os.path.join(root, "tmp")
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def writer(self) -> BlobWriter:
+        return BlobWriter(self)
+
+    def put(self, chunks: Iterable[bytes]) -> Dict[str, Any]:
+        writer = self.writer()
+        try:
+            for chunk in chunks:
+                writer.write(chunk)
+        except BaseException:
+            writer.abort()
+            raise
+        return writer.commit()
+
+    def path(self, blob_id: str) -> str:
+        """
+        Local path of a stored blob.
+        """
+        path = self.path_for(blob_id)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Unknown blob: {blob_id}")
+        return path
+
+    def path_for(self, blob_id: str) -> str:
+        # fullmatch: "$" alone would also accept a trailing newline
+        if not isinstance(blob_id, str) or not _BLOB_ID_RE.fullmatch(blob_id):
+            raise ValueError(f"Invalid blob id: {blob_id!r}")
+        return os.path.join(self.root, blob_id[:2], blob_id)
+
+
+def blob_digest(blob_id: str) -> str:
+    """
+    The sha256 of a blob's content, i.e. its id without the type.
+    """
+    return blob_id.split(".", 1)[0]
+
+
+class MultipartUpload:
+    """
+    Push parser for a multipart/form-data request body: feed() it
+    chunks as they arrive; file parts are streamed straight into the
+    blob store, so no part is ever held in memory whole.
+
+    close() returns
+    {
+        "blobs": [{"field", "filename", "blob_id", "size", "type",
+                   "deduplicated"}, ...],
+        "fields": {name: value}
+    }
+    """
+
+    def __init__(self, store: BlobStore, content_type: Optional[str]):
+        mimetype, options = parse_options_header(content_type or "")
+        if mimetype != "multipart/form-data" or "boundary" not in options:
+            raise ValueError("Expected a multipart/form-data body")
+
+        self.store = store
+        self.blobs: List[Dict[str, Any]] = []
+        self.fields: Dict[str, str] = {}
+
+        self._decoder = MultipartDecoder(
+            options["boundary"].encode("latin-1"),
+            max_form_memory_size=MAX_FIELD_BYTES
+        )
+        self._part = None
+        self._writer: Optional[BlobWriter] = None
+        self._field_data = bytearray()
+        self._done = False
+
+    def feed(self, chunk: bytes):
+        try:
+            self._decoder.receive_data(chunk)
+            self._drain()
+        except BaseException:
+            self.abort()
+            raise
+
+    def close(self) -> Dict[str, Any]:
+        self.feed(None)
+        if not self._done:
+            self.abort()
+            raise ValueError("Truncated multipart body")
+        return {"blobs": self.blobs, "fields": self.fields}
+
+    def abort(self):
+        if self._writer is not None:
+            self._writer.abort()
+            self._writer = None
+
+    def _drain(self):
+        while True:
+            event = self._decoder.next_event()
+            if event is NEED_DATA:
+                return
+            if isinstance(event, Epilogue):
+                self._done = True
+                return
+
+            if isinstance(event, File):
+                self._part = event
+                self._writer = self.store.writer()
+            elif isinstance(event, Field):
+                self._part = event
+                self._field_data.clear()
+            elif isinstance(event, Data):
+                if self._writer is not None:
+                    self._writer.write(event.data)
+                else:
+                    self._field_data += event.data
+                    if len(self._field_data) > MAX_FIELD_BYTES:
+                        raise ValueError(f"Form field {self._part.name!r} is too large")
+
+                if not event.more_data:
+                    self._end_part()
+
+    def _end_part(self):
+        if self._writer is not None:
+            blob = self._writer.commit()
+            self._writer = None
+            self.blobs.append({
+                "field": self._part.name,
+                "filename": self._part.filename,
+                **blob
+            })
+        else:
+            self.fields[self._part.name] = self._field_data.decode("utf-8", errors="replace")
+        self._part = None
@@ -0,0 +1,229 @@
+import math
+import os
+from collections import Counter
+from typing import Dict, Any, List, Optional
+
+from tools.text_utils import estimate_tokens, split_sentences
+from vector_store.bm25_index import query_terms
+
+# Tokens left free in num_ctx for the model's answer
+RESPONSE_RESERVE_TOKENS = 1024
+
+# estimate_tokens() counts words and punctuation; BPE tokenizers split
+# lab names, units and numbers into more pieces than that, so budgets
+# assume each estimated token costs this many real ones
+TOKEN_SAFETY_FACTOR = float(os.environ.get("TOKEN_SAFETY_FACTOR", "1.3"))
+
+# MMR trade-off: 1.0 = relevance only, 0.0 = diversity only
+MMR_LAMBDA = 0.7
+
+# Chunks at least this similar to one already chosen are dropped
+DUPLICATE_SIMILARITY = 0.85
+
+_ELISION = "..."
+
+_INTAKE_FIELDS = ("demographics", "symptoms", "medications", "allergies", "vitals")
+
+
+def context_budget(
+    num_ctx: int,
+    template: str,
+    reserve: int = RESPONSE_RESERVE_TOKENS
+) -> int:
+    """
+    Tokens available for context once the prompt template and the
+    answer reserve are taken out of the model's context window.
+
+    Returned in estimate_tokens() units, scaled down by
+    TOKEN_SAFETY_FACTOR so the real prompt still fits num_ctx.
+    """
+    usable = (num_ctx - reserve) / TOKEN_SAFETY_FACTOR
+    return max(0, int(usable) - estimate_tokens(template))
+
+
+# --------------------------------------------------
+# RETRIEVED DOCUMENTS
+# --------------------------------------------------
+
+def select_documents(
+    query: str,
+    docs: List[Dict[str, Any]],
+    max_tokens: int,
+    max_documents: Optional[int] = None,
+    mmr_lambda: float = MMR_LAMBDA
+) -> List[Dict[str, Any]]:
+    """
+    Pick and trim retrieved chunks to fit `max_tokens`.
+
+    - Near-duplicate chunks (e.g. overlapping windows, the same
+      paragraph in two reports) are dropped; the rest are ordered by
+      MMR over query relevance and retrieval rank
+    - Each chunk gets a fair share of the budget; chunks that don't
+      fit keep only their most query-relevant sentences
+    Returned dicts are copies with "text" replaced.
+    """
+
+    if not docs or max_tokens <= 0:
+        return []
+
+    query_vector = Counter(query_terms(query))
+    vectors = [Counter(query_terms(doc["text"])) for doc in docs]
+    relevance = [
+        0.5 / (1 + rank) + 0.5 * _cosine(query_vector, vector)
+        for rank, vector in enumerate(vectors)
+    ]
+
+    chosen: List[int] = []
+    remaining = list(range(len(docs)))
+    limit = max_documents or len(docs)
+
+    while remaining and len(chosen) < limit:
+        best, best_score = None, -math.inf
+        for i in list(remaining):
+            redundancy = max((_cosine(vectors[i], vectors[j]) for j in chosen), default=0.0)
+            if redundancy >= DUPLICATE_SIMILARITY:
+                remaining.remove(i)
+                continue
+            score = mmr_lambda * relevance[i] - (1 - mmr_lambda) * redundancy
+            if score > best_score:
+                best, best_score = i, score
+        if best is None:
+            break
+        chosen.append(best)
+        remaining.remove(best)
+
+    selected = []
+    budget = max_tokens
+    for position, i in enumerate(chosen):
+        share = budget // (len(chosen) - position)
+        text = _fit_text(docs[i]["text"], query_vector, share)
+        if not text:
+            continue
+        budget -= estimate_tokens(text)
+        selected.append({**docs[i], "text": text})
+
+    return selected
+
+
+# --------------------------------------------------
+# PATIENT CONTEXT
+# --------------------------------------------------
+
+def serialize_context(context: Dict[str, Any], max_tokens: int) -> str:
+    """
+    Compact, line-per-field rendering of a MedicalContextStore context
+    within `max_tokens`. Empty fields are left out; intake fields come
+    first, then imaging, then report answers newest first (older ones
+    are dropped when the budget runs out).
+    """
+
+    lines: List[str] = []
+    budget = max_tokens
+
+    def add(line: str) -> bool:
+        nonlocal budget
+        line = _fit_text(line, Counter(), budget)
+        if not line:
+            return False
+        lines.append(line)
+        budget -= estimate_tokens(line)
+        return True
+
+    for key in _INTAKE_FIELDS:
+        value = _compact(context.get(key))
+        if value:
+            add(f"{key}: {value}")
+
+    imaging = context.get("imaging")
+    if imaging:
+        observations = imaging.get("observations") if isinstance(imaging, dict) else imaging
+        add(f"imaging (non-diagnostic): {_compact(observations)}")
+
+    reports = context.get("reports") or []
+    shown = 0
+    for report in reversed(reports):
+        sources = ", ".join(report.get("sources") or [])
+        line = f"report Q: {_compact(report.get('question'))} | A: {_compact(report.get('answer'))}"
+        if sources:
+            line += f" [{sources}]"
+        if not add(line):
+            break
+        shown += 1
+    if shown < len(reports):
+        lines.append(f"({len(reports) - shown} earlier report answers omitted)")
+
+    for key, value in context.items():
+        if key not in _INTAKE_FIELDS + ("imaging", "reports") and _compact(value):
+            add(f"{key}: {_compact(value)}")
+
+    return "\n".join(lines)
+
+
+# --------------------------------------------------
+# INTERNAL
+# --------------------------------------------------
+
+def _compact(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, dict):
+        return "; ".join(
+            f"{k}: {_compact(v)}" for k, v in value.items() if _compact(v)
+        )
+    if isinstance(value, (list, tuple, set)):
+        return ", ".join(_compact(v) for v in value if _compact(v))
+    return " ".join(str(value).split())
+
+
+def _cosine(a: Counter, b: Counter) -> float:
+    if not a or not b:
+        return 0.0
+    dot = sum(count * b[term] for term, count in a.items() if term in b)
+    if not dot:
+        return 0.0
+    norm = math.sqrt(sum(c * c for c in a.values())) * math.sqrt(sum(c * c for c in b.values()))
+    return dot / norm
+
+
+def _fit_text(text: str, query_vector: Counter, max_tokens: int) -> str:
+    """
+    `text` if it fits; otherwise its best sentences (by query-term
+    overlap, then position) in original order, elided.
+    """
+
+    if max_tokens <= 0:
+        return ""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    sentences = [s for s, _, _ in split_sentences(text)]
+    ranked = sorted(
+        range(len(sentences)),
+        key=lambda i: (-sum(query_vector[t] for t in query_terms(sentences[i])), i)
+    )
+
+    keep, used = set(), 0
+    for i in ranked:
+        # Leave room for an elision marker after each sentence
+        tokens = estimate_tokens(sentences[i]) + estimate_tokens(_ELISION)
+        if used + tokens <= max_tokens:
+            keep.add(i)
+            used += tokens
+
+    if not keep:
+        # A single sentence over budget: cut it on words
+        cut, used = [], 1
+        for word in text.split():
+            used += estimate_tokens(word)
+            if used > max_tokens:
+                break
+            cut.append(word)
+        return " ".join(cut + [_ELISION]) if cut else ""
+
+    out, previous = [], None
+    for i in sorted(keep):
+        if previous is not None and i != previous + 1:
+            out.append(_ELISION)
+        out.append(sentences[i])
+        previous = i
+    return " ".join(out)
@@ -0,0 +1,279 @@
+import math
+import os
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from tools.image_loader import VISION_MAX_SIDE, WINDOW_PERCENTILES, encode_vision_image
+
+DICOM_EXTENSIONS = (".dcm", ".dicom")
+
+# Vision calls per study: slices sampled from a series
+MAX_SERIES_SLICES = int(os.environ.get("MAX_SERIES_SLICES", "9"))
+
+# "variance": most informative slice per evenly sized bin of the
+# stack; "even": evenly spaced indices (no pixel reads to choose)
+SLICE_SELECTION = os.environ.get("SLICE_SELECTION", "variance")
+
+# "montage": one tiled image, one vision call per study;
+# "slices": one vision call per selected slice, issued in parallel
+SERIES_VISION_MODE = os.environ.get("SERIES_VISION_MODE", "montage")
+
+# Candidates decoded per bin when selecting by variance
+CANDIDATES_PER_SLICE = 4
+
+
+def is_dicom_path(path: str) -> bool:
+    """
+    A .dcm file, or a directory (a DICOM series).
+    """
+    return os.path.isdir(path) or path.lower().endswith(DICOM_EXTENSIONS)
+
+
+def prepare_vision_series(
+    path: str,
+    max_slices: int = MAX_SERIES_SLICES,
+    selection: str = SLICE_SELECTION,
+    mode: str = SERIES_VISION_MODE,
+    max_side: int = VISION_MAX_SIDE
+) -> Dict[str, Any]:
+    """
+    Load a DICOM series (a directory of .dcm files, or one multi-frame
+    .dcm) and prepare a bounded number of slices for the vision model.
+
+    - Headers are read without pixel data; only the slices considered
+      for selection are decoded
+    - Slices are ordered along the scan axis and windowed / leveled to
+      8-bit with the series' own window (percentiles as a fallback)
+    - At most `max_slices` slices are kept; with mode="montage" they
+      are tiled into one image
+
+    Returns the same fields as prepare_vision_image() for the montage
+    (mode="montage") plus series details; with mode="slices",
+    "frames" holds one encoded entry per selected slice.
+    {
+        "path", "format": "DICOM", "mode": "L", "size",
+        "modality": str, "description": str,
+        "slice_count": int, "selected_slices": [int, ...],
+        "image_bytes", "encoded_format", "encoded_size", "pixel_hash",
+        "frames": [{... "slice": int}, ...]      # mode="slices" only
+    }
+    """
+
+    pydicom = _pydicom()
+
+    if os.path.isdir(path):
+        headers = _read_series_headers(pydicom, path)
+        reference = headers[0][1]
+        count = len(headers)
+
+        def read(indices: List[int]) -> np.ndarray:
+            return np.stack([
+                _modality_values(pydicom.dcmread(headers[i][0]))
+                for i in indices
+            ])
+    else:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Image not found: {path}")
+        reference = pydicom.dcmread(path)
+        volume = _modality_values(reference)
+        if volume.ndim == 2:
+            volume = volume[None]
+        count = volume.shape[0]
+
+        def read(indices: List[int]) -> np.ndarray:
+            return volume[indices]
+
+    selected, pixels = _select_slices(read, count, max_slices, selection)
+    slices = _window(pixels, reference)
+
+    info = {
+        "path": path,
+        "format": "DICOM",
+        "mode": "L",
+        "size": (int(slices.shape[2]), int(slices.shape[1])),
+        "modality": str(reference.get("Modality", "unknown")),
+        "description": str(reference.get("SeriesDescription", "")),
+        "slice_count": count,
+        "selected_slices": selected
+    }
+
+    if mode == "slices":
+        frames = []
+        for index, array in zip(selected, slices):
+            frame = encode_vision_image(Image.fromarray(array), max_side)
+            frame["slice"] = index
+            frames.append(frame)
+        info["frames"] = frames
+        # Top-level payload: the middle selected slice
+        info.update({k: v for k, v in frames[len(frames) // 2].items() if k != "slice"})
+    elif mode == "montage":
+        info.update(encode_vision_image(build_montage(slices, max_side), max_side))
+    else:
+        raise ValueError(f"Unknown series vision mode: {mode!r}")
+
+    return info
+
+
+def build_montage(slices: np.ndarray, max_side: int = VISION_MAX_SIDE) -> Image.Image:
+    """
+    Tile (n, rows, cols) uint8 slices into a near-square grid, left to
+    right, top to bottom, sized so the whole montage fits `max_side`.
+    """
+
+    n, rows, cols = slices.shape
+    grid_cols = math.ceil(math.sqrt(n))
+    grid_rows = math.ceil(n / grid_cols)
+
+    tile = max(1, max_side // max(grid_cols, grid_rows))
+    scale = tile / max(rows, cols)
+    tile_w, tile_h = max(1, round(cols * scale)), max(1, round(rows * scale))
+
+    montage = Image.new("L", (grid_cols * tile_w, grid_rows * tile_h), 0)
+    for i, array in enumerate(slices):
+        thumb = Image.fromarray(array).resize((tile_w, tile_h), Image.Resampling.LANCZOS)
+        montage.paste(thumb, ((i % grid_cols) * tile_w, (i // grid_cols) * tile_h))
+
+    return montage
+
+
+# --------------------------------------------------
+# INTERNAL
+# --------------------------------------------------
+
+def _pydicom():
+    try:
+        import pydicom
+    except ImportError as e:
+        raise RuntimeError("DICOM input requires the pydicom package") from e
+    return pydicom
+
+
+def _read_series_headers(pydicom, directory: str) -> List[Tuple[str, Any]]:
+    """
+    (path, header) for the largest series in `directory`, ordered
+    along the scan axis. Pixel data is not read.
+    """
+
+    series: Dict[str, List[Tuple[str, Any]]] = {}
+    for root, _, files in os.walk(directory):
+        for name in sorted(files):
+            file_path = os.path.join(root, name)
+            try:
+                header = pydicom.dcmread(file_path, stop_before_pixels=True)
+            except Exception:
+                # Not DICOM (DICOMDIR, thumbnails, OS clutter)
+                continue
+            if "Rows" not in header:
+                continue
+            series.setdefault(str(header.get("SeriesInstanceUID", "")), []).append(
+                (file_path, header)
+            )
+
+    if not series:
+        raise ValueError(f"No DICOM images found in {directory}")
+
+    headers = max(series.values(), key=len)
+    headers.sort(key=lambda item: _slice_position(item[1]))
+    return headers
+
+
+def _slice_position(header) -> Tuple[float, float]:
+    # Distance along the slice normal, falling back to InstanceNumber
+    position = header.get("ImagePositionPatient")
+    orientation = header.get("ImageOrientationPatient")
+    if position is not None and orientation is not None and len(orientation) == 6:
+        normal = np.cross(
+            np.asarray(orientation[:3], dtype=float),
+            np.asarray(orientation[3:], dtype=float)
+        )
+        return float(np.dot(normal, np.asarray(position, dtype=float))), 0.0
+    return 0.0, float(header.get("InstanceNumber") or 0)
+
+
+def _modality_values(dataset) -> np.ndarray:
+    # Stored values -> modality units (e.g. Hounsfield for CT)
+    pixels = dataset.pixel_array.astype(np.float32)
+    slope = float(dataset.get("RescaleSlope", 1) or 1)
+    intercept = float(dataset.get("RescaleIntercept", 0) or 0)
+    if slope != 1 or intercept != 0:
+        pixels = pixels * slope + intercept
+    if pixels.ndim == 3 and dataset.get("SamplesPerPixel", 1) > 1:
+        # Color single frame (rows, cols, 3); reduce to luminance
+        pixels = pixels.mean(axis=-1)
+    elif pixels.ndim == 4:
+        pixels = pixels.mean(axis=-1)
+    return pixels
+
+
+def _select_slices(
+    read,
+    count: int,
+    max_slices: int,
+    selection: str
+) -> Tuple[List[int], np.ndarray]:
+    """
+    (sorted slice indices, their modality-value pixels).
+    """
+
+    if count <= max_slices:
+        indices = list(range(count))
+        return indices, read(indices)
+
+    if selection == "even":
+        indices = _evenly_spaced(count, max_slices)
+        return indices, read(indices)
+
+    if selection != "variance":
+        raise ValueError(f"Unknown slice selection: {selection!r}")
+
+    # Decode a bounded pool of candidates, then keep the most
+    # variable (most structure) candidate in each of max_slices bins,
+    # so picks are informative and still cover the whole volume
+    pool = _evenly_spaced(count, min(count, max_slices * CANDIDATES_PER_SLICE))
+    pixels = read(pool)
+    variance = pixels[:, ::4, ::4].reshape(len(pool), -1).var(axis=1)
+
+    bins = np.minimum((np.asarray(pool) * max_slices) // count, max_slices - 1)
+    chosen = []
+    for b in range(max_slices):
+        members = np.flatnonzero(bins == b)
+        if len(members):
+            chosen.append(int(members[np.argmax(variance[members])]))
+
+    return [pool[i] for i in chosen], pixels[chosen]
+
+
+def _evenly_spaced(count: int, k: int) -> List[int]:
+    return sorted(set(np.linspace(0, count - 1, k).round().astype(int).tolist()))
+
+
+def _window(pixels: np.ndarray, reference) -> np.ndarray:
+    """
+    Vectorized window / level of (n, rows, cols) modality values to
+    uint8, using the series' first WindowCenter / WindowWidth.
+    """
+
+    center, width = _first(reference.get("WindowCenter")), _first(reference.get("WindowWidth"))
+    if center is None or not width or width <= 1:
+        low, high = np.percentile(pixels, WINDOW_PERCENTILES)
+    else:
+        low, high = center - width / 2.0, center + width / 2.0
+    if high <= low:
+        high = low + 1.0
+
+    scaled = np.clip((pixels - low) * (255.0 / (high - low)), 0, 255).astype(np.uint8)
+    if str(reference.get("PhotometricInterpretation", "")) == "MONOCHROME1":
+        # Inverted grayscale: low values are bright
+        scaled = 255 - scaled
+    return scaled
+
+
+def _first(value) -> Optional[float]:
+    if value is None:
+        return None
+    try:
+        return float(value[0] if hasattr(value, "__len__") and not isinstance(value, str) else value)
+    except (TypeError, ValueError, IndexError):
+        return None
@@ -1,10 +1,25 @@
-from PIL import Image
-from typing import Dict
+from PIL import Image, ImageOps, UnidentifiedImageError
+from typing import Dict, Any
+import hashlib
+import io
 import os
 
+import numpy as np
+
 
 SUPPORTED_IMAGE_FORMATS = (".png", ".jpg", ".jpeg", ".bmp", ".tiff")
 
+# Longest side sent to the vision model. LLaVA tiles/resizes to
+# 336-672 px internally, so anything larger is wasted bandwidth.
+VISION_MAX_SIDE = int(os.environ.get("VISION_MAX_SIDE", "672"))
+JPEG_QUALITY = 90
+
+# Refuse decompression bombs well before they exhaust memory
+MAX_IMAGE_PIXELS = 200_000_000
+
+# Percentiles used to window high bit-depth scans down to 8 bits
+WINDOW_PERCENTILES = (0.5, 99.5)
+
 
 def load_medical_image(image_path: str) -> Dict[str, str]:
     """
@@ -19,11 +34,7 @@ def load_medical_image(image_path: str) -> Dict[str, str]:
     }
     """
 
-    if not os.path.exists(image_path):
-        raise FileNotFoundError(f"Image not found: {image_path}")
-
-    if not image_path.lower().endswith(SUPPORTED_IMAGE_FORMATS):
-        raise ValueError("Unsupported image format")
+    _validate_path(image_path)
 
     image = Image.open(image_path)
 
@@ -33,3 +44,141 @@ def load_medical_image(image_path: str) -> Dict[str, str]:
         "mode": image.mode,
         "size": image.size
     }
+
+
+def prepare_vision_image(
+    image_path: str,
+    max_side: int = VISION_MAX_SIDE
+) -> Dict[str, Any]:
+    """
+    Decode an image once and produce a compact payload for the
+    vision model:
+
+    - validates the path, format and pixel count
+    - applies EXIF orientation and takes the first frame of
+      multi-page files
+    - maps 16-bit / float grayscale to 8-bit (percentile window) and
+      palette / alpha / CMYK images to L or RGB
+    - downsamples so the longest side is at most `max_side`
+    - re-encodes grayscale as PNG and color as JPEG
+
+    Returns load_medical_image()'s fields (describing the original)
+    plus:
+    {
+        "image_bytes": bytes,          # encoded payload
+        "encoded_format": "PNG" | "JPEG",
+        "encoded_size": (width, height),
+        "original_bytes": int,
+        "pixel_hash": str              # sha256 of the prepared pixels
+    }
+
+    pixel_hash covers exactly what the model sees, so the same scan
+    saved as TIFF or PNG (or re-saved with other metadata) matches.
+    """
+
+    _validate_path(image_path)
+
+    try:
+        with Image.open(image_path) as image:
+            if image.width * image.height > MAX_IMAGE_PIXELS:
+                raise ValueError(
+                    f"Image too large: {image.width}x{image.height} pixels"
+                )
+
+            info = {
+                "path": image_path,
+                "format": image.format,
+                "mode": image.mode,
+                "size": image.size,
+                "original_bytes": os.path.getsize(image_path)
+            }
+
+            image.seek(0)
+            # Shrink during decode where the codec supports it (JPEG)
+            image.draft(image.mode, (max_side, max_side))
+            image = ImageOps.exif_transpose(image)
+            image = _to_8bit(image)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        raise ValueError(f"Unreadable image: {image_path}") from e
+
+    info.update(encode_vision_image(image, max_side))
+    return info
+
+
+def encode_vision_image(
+    image: Image.Image,
+    max_side: int = VISION_MAX_SIDE
+) -> Dict[str, Any]:
+    """
+    Downsample an 8-bit L / RGB image to `max_side` and encode it
+    (grayscale as PNG, color as JPEG). Returns image_bytes,
+    encoded_format, encoded_size and pixel_hash.
+    """
+
+    if max(image.size) > max_side:
+        image = image.copy()
+        image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+
+    buffer = io.BytesIO()
+    if image.mode == "L":
+        image.save(buffer, format="PNG", optimize=True)
+        encoded_format = "PNG"
+    else:
+        image.save(buffer, format="JPEG", quality=JPEG_QUALITY)
+        encoded_format = "JPEG"
+
+    pixels = hashlib.sha256(f"{image.mode}:{image.size}:".encode("utf-8"))
+    pixels.update(image.tobytes())
+
+    return {
+        "image_bytes": buffer.getvalue(),
+        "encoded_format": encoded_format,
+        "encoded_size": image.size,
+        "pixel_hash": pixels.hexdigest()
+    }
+
+
+def _validate_path(image_path: str):
+    if not os.path.exists(image_path):
+        raise FileNotFoundError(f"Image not found: {image_path}")
+
+    if not image_path.lower().endswith(SUPPORTED_IMAGE_FORMATS):
+        raise ValueError("Unsupported image format")
+
+
+def _to_8bit(image: Image.Image) -> Image.Image:
+    """
+    L (grayscale) or RGB, 8 bits per channel.
+    """
+
+    if image.mode in ("L", "RGB"):
+        return image.copy()
+
+    if image.mode in ("I", "I;16", "I;16B", "I;16L", "I;16N", "F"):
+        # Window to the bulk of the intensity range; a plain cast
+        # would clip 16-bit scans to near-white or near-black
+        pixels = np.asarray(image, dtype=np.float32)
+        low, high = np.percentile(pixels, WINDOW_PERCENTILES)
+        if high <= low:
+            high = low + 1.0
+        scaled = np.clip((pixels - low) * (255.0 / (high - low)), 0, 255)
+        return Image.fromarray(scaled.astype(np.uint8))
+
+    if image.mode in ("1", "LA", "La"):
+        return image.convert("L")
+
+    if image.mode == "P" and "transparency" not in image.info:
+        converted = image.convert("RGB")
+    else:
+        # Alpha, CMYK, YCbCr, LAB, ...; flatten alpha onto black,
+        # the usual background for scans
+        converted = image.convert("RGBA")
+        background = Image.new("RGB", converted.size, (0, 0, 0))
+        background.paste(converted, mask=converted.getchannel("A"))
+        converted = background
+
+    # Color-space conversions of grayscale sources stay grayscale
+    array = np.asarray(converted)
+    if np.array_equal(array[..., 0], array[..., 1]) and np.array_equal(array[..., 1], array[..., 2]):
+        return converted.convert("L")
+    return converted
@@ -1,29 +1,330 @@
 import fitz  # PyMuPDF
-from typing import List, Dict
+import atexit
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Iterator, Optional, Tuple, Union
 
+# Extracted pages, keyed by PDF content hash; PDF_CACHE=0 disables
+PDF_CACHE_DIR = "./pdf_cache"
+PDF_CACHE_ENABLED = os.environ.get("PDF_CACHE", "1") == "1"
 
-def extract_text_from_pdf(pdf_path: str) -> Dict[str, str]:
+# Cached pages are patient data: bounded in age and total size, with
+# the least recently used files pruned first
+PDF_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+PDF_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Bump when extraction or cleaning changes, to ignore old cache files
+EXTRACTOR_VERSION = "1"
+
+# PDFs with at least this many pages are split across a process pool
+PARALLEL_MIN_PAGES = 32
+PAGES_PER_TASK = 16
+PDF_EXTRACT_WORKERS = int(
+    os.environ.get("PDF_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1)))
+)
+
+# A line among the first / last EDGE_LINES of a page is a running
+# header / footer when it recurs on at least this share of pages
+EDGE_LINES = 3
+HEADER_FOOTER_MIN_SHARE = 0.5
+HEADER_FOOTER_MIN_PAGES = 3
+
+PdfSource = Union[str, bytes]
+
+# One pool per process, created on first use. Workers are spawned,
+# not forked: forking a threaded server (HTTP pools, SQLite, torch)
+# can deadlock the child
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+_DIGITS_RE = re.compile(r"\d+")
+_PAGE_NUMBER_RE = re.compile(r"^[-\s]*(page\s*)?#+(\s*(of|/)\s*#+)?[-\s]*$")
+
+
+def iter_pdf_pages(
+    source: PdfSource,
+    use_cache: bool = PDF_CACHE_ENABLED,
+    cache_dir: str = PDF_CACHE_DIR
+) -> Iterator[Tuple[int, str]]:
+    """
+    Lazily yield (page_no, text) for a PDF (path or bytes), 1-based,
+    with running headers / footers removed.
+
+    - Large PDFs are extracted by page range in a process pool
+    - Raw pages are spooled to disk rather than kept in memory, and
+      only one page is held at a time while cleaning
+    - Cleaned pages are cached under the PDF's content hash, so the
+      same file (under any name, re-uploaded or not) is extracted once;
+      the cache is pruned by age and size on every write
+    """
+
+    cache_path = None
+    if use_cache:
+        cache_path = os.path.join(cache_dir, f"{pdf_content_hash(source)}.jsonl")
+        if _cache_hit(cache_path):
+            yield from _read_pages(cache_path)
+            return
+
+    spool = tempfile.NamedTemporaryFile(
+        "w+", encoding="utf-8", suffix=".jsonl", delete=False
+    )
+    out = None
+    try:
+        # Pass 1: extract to the spool, keeping only page edge lines
+        edges: List[Tuple[List[str], List[str]]] = []
+        with spool:
+            for page_no, text in _extract_pages(source):
+                edges.append(_edge_lines(text))
+                spool.write(json.dumps([page_no, text]) + "\n")
+
+        boilerplate = _running_lines(edges)
+
+        # Pass 2: clean page by page, filling the cache as we go
+        if cache_path is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            out = tempfile.NamedTemporaryFile(
+                "w", encoding="utf-8", dir=cache_dir, suffix=".tmp", delete=False
+            )
+
+        for page_no, text in _read_pages(spool.name):
+            text = _strip_running_lines(text, boilerplate)
+            if out is not None:
+                out.write(json.dumps([page_no, text]) + "\n")
+            yield page_no, text
+
+        if out is not None:
+            out.close()
+            os.replace(out.name, cache_path)
+            out = None
+            prune_pdf_cache(cache_dir, PDF_CACHE_TTL_SECONDS, PDF_CACHE_MAX_BYTES)
+    finally:
+        os.unlink(spool.name)
+        if out is not None:
+            # Consumer stopped early or extraction failed: no partial cache
+            out.close()
+            os.unlink(out.name)
+
+
+def extract_text_from_pdf(pdf_path: str) -> Dict[str, Any]:
     """
     Extract raw text from a PDF file.
 
     Returns:
     {
         "text": "...",
+        "pages": ["page 1 text", ...],   # for chunk page provenance
         "source": "filename.pdf"
     }
-    """
-
-    doc = fitz.open(pdf_path)
-    pages_text: List[str] = []
 
-    for page in doc:
-        text = page.get_text()
-        if text:
-            pages_text.append(text)
+    Prefer iter_pdf_pages() for large files; this holds every page.
+    """
 
-    full_text = "\n".join(pages_text)
+    pages_text = [text for _, text in iter_pdf_pages(pdf_path)]
+    full_text = "\n".join(text for text in pages_text if text)
 
     return {
         "text": full_text.strip(),
-        "source": pdf_path.split("/")[-1]
+        "pages": pages_text,
+        "source": os.path.basename(pdf_path)
     }
+
+
+def remove_running_lines(pages: List[str]) -> List[str]:
+    """
+    Drop running headers / footers from page texts already in memory
+    (e.g. extracted client-side), as iter_pdf_pages() does.
+    """
+
+    boilerplate = _running_lines([_edge_lines(text) for text in pages])
+    return [_strip_running_lines(text, boilerplate) for text in pages]
+
+
+def pdf_content_hash(source: PdfSource) -> str:
+    """
+    sha256 of the PDF bytes (read in blocks for paths), salted with
+    the extractor version.
+    """
+
+    digest = hashlib.sha256(f"pdf-v{EXTRACTOR_VERSION}:".encode("utf-8"))
+    if isinstance(source, (bytes, bytearray)):
+        digest.update(source)
+    else:
+        with open(source, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def prune_pdf_cache(
+    cache_dir: str = PDF_CACHE_DIR,
+    ttl_seconds: float = PDF_CACHE_TTL_SECONDS,
+    max_bytes: int = PDF_CACHE_MAX_BYTES
+) -> int:
+    """
+    Delete cached page files older than `ttl_seconds` (by last use),
+    then the least recently used ones until the cache fits
+    `max_bytes`. Returns the number of files removed.
+    """
+
+    entries = []
+    for name in os.listdir(cache_dir) if os.path.isdir(cache_dir) else []:
+        if not name.endswith(".jsonl"):
+            continue
+        path = os.path.join(cache_dir, name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    # Oldest first
+    entries.sort()
+    now = time.time()
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+
+    for mtime, size, path in entries:
+        if now - mtime <= ttl_seconds and total <= max_bytes:
+            break
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+
+    return removed
+
+
+# --------------------------------------------------
+# INTERNAL
+# --------------------------------------------------
+
+def _cache_hit(cache_path: str) -> bool:
+    try:
+        mtime = os.path.getmtime(cache_path)
+    except FileNotFoundError:
+        return False
+    if time.time() - mtime > PDF_CACHE_TTL_SECONDS:
+        return False
+    # mtime marks last use, for LRU pruning
+    os.utime(cache_path)
+    return True
+
+
+def _open(source: PdfSource) -> fitz.Document:
+    if isinstance(source, (bytes, bytearray)):
+        return fitz.open(stream=bytes(source), filetype="pdf")
+    return fitz.open(source)
+
+
+def _extract_pages(source: PdfSource) -> Iterator[Tuple[int, str]]:
+    with _open(source) as doc:
+        page_count = doc.page_count
+
+        if page_count < PARALLEL_MIN_PAGES or PDF_EXTRACT_WORKERS <= 1:
+            for index in range(page_count):
+                yield index + 1, doc.load_page(index).get_text()
+            return
+
+    # Workers reopen the PDF themselves (documents don't pickle); give
+    # them a path so the bytes aren't pickled into every task
+    spooled = None
+    if isinstance(source, (bytes, bytearray)):
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+            f.write(source)
+        source = spooled = f.name
+
+    try:
+        starts = list(range(0, page_count, PAGES_PER_TASK))
+        # map() returns ranges in order as they complete
+        results = _extract_pool().map(
+            _extract_range,
+            [source] * len(starts),
+            starts,
+            [min(start + PAGES_PER_TASK, page_count) for start in starts]
+        )
+        for start, texts in zip(starts, results):
+            for offset, text in enumerate(texts):
+                yield start + offset + 1, text
+    finally:
+        if spooled is not None:
+            os.unlink(spooled)
+
+
+def _extract_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=PDF_EXTRACT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            atexit.register(_pool.shutdown)
+        return _pool
+
+
+def _extract_range(source: str, start: int, stop: int) -> List[str]:
+    # Runs in a worker process
+    with _open(source) as doc:
+        return [doc.load_page(index).get_text() for index in range(start, stop)]
+
+
+def _read_pages(path: str) -> Iterator[Tuple[int, str]]:
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            page_no, text = json.loads(line)
+            yield page_no, text
+
+
+def _edge_lines(text: str) -> Tuple[List[str], List[str]]:
+    lines = [line for line in text.splitlines() if line.strip()]
+    return lines[:EDGE_LINES], lines[-EDGE_LINES:]
+
+
+def _normalize_line(line: str) -> str:
+    line = " ".join(line.split()).lower()
+    # "Page 3 of 12" and "Page 4 of 12" are the same footer; other
+    # lines must repeat exactly (lab values differ only in digits)
+    masked = _DIGITS_RE.sub("#", line)
+    return masked if _PAGE_NUMBER_RE.match(masked) else line
+
+
+def _running_lines(edges: List[Tuple[List[str], List[str]]]) -> set:
+    """
+    Normalized lines that recur at the top or bottom of many pages.
+    """
+
+    if len(edges) < HEADER_FOOTER_MIN_PAGES:
+        return set()
+
+    counts: Counter = Counter()
+    for head, foot in edges:
+        counts.update({_normalize_line(line) for line in head + foot})
+
+    minimum = max(HEADER_FOOTER_MIN_PAGES, HEADER_FOOTER_MIN_SHARE * len(edges))
+    return {line for line, count in counts.items() if line and count >= minimum}
+
+
+def _strip_running_lines(text: str, boilerplate: set) -> str:
+    if not boilerplate:
+        return text
+
+    lines = text.splitlines()
+    content = [i for i, line in enumerate(lines) if line.strip()]
+
+    # Only edge lines are candidates; the same words in the body stay
+    edge = set(content[:EDGE_LINES] + content[-EDGE_LINES:])
+    drop = {i for i in edge if _normalize_line(lines[i]) in boilerplate}
+    if not drop:
+        return text
+
+    return "\n".join(line for i, line in enumerate(lines) if i not in drop)
@@ -0,0 +1,157 @@
+import re
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+
+# Chunking defaults (approximate tokens)
+CHUNK_MAX_TOKENS = 256
+CHUNK_OVERLAP_TOKENS = 40
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_PARAGRAPH_RE = re.compile(r"\S(?:.*?\S)?(?=[ \t]*\n\s*\n|\s*\Z)", re.S)
+_SENTENCE_RE = re.compile(r"\S.*?(?:[.!?](?=\s)|\n|\Z)", re.S)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap, tokenizer-free token estimate (words + punctuation).
+    Close enough to BPE counts for budgeting prompts and chunks.
+    """
+    return len(_TOKEN_RE.findall(text))
+
+
+def is_section_heading(line: str) -> bool:
+    """
+    Heuristic for report section headings, e.g. "IMPRESSION:",
+    "LABORATORY RESULTS", "Findings:".
+    """
+    line = line.strip()
+    if not line or len(line) > 60 or "\n" in line:
+        return False
+    if line.endswith(":") and len(line.split()) <= 6:
+        return True
+    letters = [c for c in line if c.isalpha()]
+    return len(letters) >= 3 and all(c.isupper() for c in letters)
+
+
+def split_sentences(text: str, offset: int = 0) -> Iterator[Tuple[str, int, int]]:
+    """
+    Yields (sentence, start, end); offsets are relative to `text`
+    plus `offset`. Line breaks count as sentence boundaries since
+    report lines (lab rows, list items) rarely end with a period.
+    """
+    for match in _SENTENCE_RE.finditer(text):
+        sentence = match.group().strip()
+        if sentence:
+            yield sentence, offset + match.start(), offset + match.start() + len(sentence)
+
+
+def chunk_pages(
+    pages: Iterable[Tuple[int, str]],
+    max_tokens: int = CHUNK_MAX_TOKENS,
+    overlap_tokens: int = CHUNK_OVERLAP_TOKENS
+) -> Iterator[Dict[str, Any]]:
+    """
+    Stream token-budgeted chunks from (page_no, page_text) pairs.
+
+    - Chunks end on sentence boundaries and never span a section
+      heading; a new section starts a new chunk
+    - Consecutive chunks in a section share ~overlap_tokens of text
+    - Each chunk records where it came from:
+      {
+          "text": str,
+          "section": str | None,
+          "page_start": int, "char_start": int,   # offset within page_start
+          "page_end": int,   "char_end": int      # offset within page_end
+      }
+    """
+
+    # (text, tokens, page, start, end) for sentences in the open chunk
+    current: List[Tuple[str, int, int, int, int]] = []
+    current_tokens = 0
+    section: Optional[str] = None
+
+    def emit() -> Dict[str, Any]:
+        first, last = current[0], current[-1]
+        return {
+            "text": " ".join(s[0] for s in current),
+            "section": section,
+            "page_start": first[2],
+            "char_start": first[3],
+            "page_end": last[2],
+            "char_end": last[4]
+        }
+
+    def overlap_tail() -> List[Tuple[str, int, int, int, int]]:
+        tail, tokens = [], 0
+        for sentence in reversed(current):
+            if tokens + sentence[1] > overlap_tokens:
+                break
+            tail.insert(0, sentence)
+            tokens += sentence[1]
+        # Never carry the whole chunk over
+        return tail if len(tail) < len(current) else []
+
+    for page_no, page_text in pages:
+        for paragraph in _PARAGRAPH_RE.finditer(page_text):
+            para_text = paragraph.group()
+            first_line = para_text.split("\n", 1)[0]
+
+            if is_section_heading(first_line):
+                if current:
+                    yield emit()
+                    current, current_tokens = [], 0
+                section = first_line.strip().rstrip(":")
+
+            for sentence, start, end in split_sentences(para_text, paragraph.start()):
+                for piece, p_start, p_end in _split_oversized(sentence, start, max_tokens):
+                    tokens = estimate_tokens(piece)
+
+                    if current and current_tokens + tokens > max_tokens:
+                        yield emit()
+                        current = overlap_tail()
+                        current_tokens = sum(s[1] for s in current)
+
+                    current.append((piece, tokens, page_no, p_start, p_end))
+                    current_tokens += tokens
+
+    if current:
+        yield emit()
+
+
+def chunk_text(
+    text: str,
+    max_tokens: int = CHUNK_MAX_TOKENS,
+    overlap_tokens: int = CHUNK_OVERLAP_TOKENS
+) -> Iterator[Dict[str, Any]]:
+    """
+    chunk_pages() for a single block of text (treated as page 1).
+    Form feeds, if present, are treated as page breaks.
+    """
+    pages = ((i + 1, page) for i, page in enumerate(text.split("\f")))
+    return chunk_pages(pages, max_tokens=max_tokens, overlap_tokens=overlap_tokens)
+
+
+def _split_oversized(
+    sentence: str,
+    start: int,
+    max_tokens: int
+) -> Iterator[Tuple[str, int, int]]:
+    # Hard-split sentences that alone exceed the budget, on whitespace
+    if estimate_tokens(sentence) <= max_tokens:
+        yield sentence, start, start + len(sentence)
+        return
+
+    words = list(re.finditer(r"\S+", sentence))
+    piece_start, tokens = None, 0
+    piece_end = 0
+    for word in words:
+        word_tokens = estimate_tokens(word.group())
+        if piece_start is not None and tokens + word_tokens > max_tokens:
+            yield sentence[piece_start:piece_end], start + piece_start, start + piece_end
+            piece_start, tokens = None, 0
+        if piece_start is None:
+            piece_start = word.start()
+        piece_end = word.end()
+        tokens += word_tokens
+
+    if piece_start is not None:
+        yield sentence[piece_start:piece_end], start + piece_start, start + piece_end
@@ -1,10 +1,50 @@
 import streamlit as st
 import requests
 import json
-import os
-import tempfile
 
 API_URL = "http://127.0.0.1:5000/analyze"
+STREAM_URL = f"{API_URL}/stream"
+UPLOAD_URL = "http://127.0.0.1:5000/upload"
+
+STAGE_LABELS = {
+    "intake_agent": "Patient intake structured",
+    "vision_agent": "Image analyzed",
+    "rag_report_agent": "Report question answered",
+    "guidance_agent": "Guidance drafted",
+    "safety_agent": "Safety review complete"
+}
+
+
+def upload_file(uploaded) -> str:
+    """
+    Send a Streamlit upload to the backend blob store; returns its id.
+    Re-sending the same file is cheap: the store deduplicates it.
+    """
+    response = requests.post(
+        UPLOAD_URL,
+        files={"file": (uploaded.name, uploaded.getvalue())}
+    )
+    body = response.json()
+    if not body.get("success"):
+        raise RuntimeError(body.get("error", "Upload failed"))
+    return body["data"]["blobs"][0]["blob_id"]
+
+
+def iter_sse(response):
+    """
+    Parse a Server-Sent-Events response into (event, data) pairs.
+    """
+    event, data_lines = None, []
+    for line in response.iter_lines(decode_unicode=True):
+        if line:
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                data_lines.append(line[len("data:"):].strip())
+            continue
+        if event and data_lines:
+            yield event, json.loads("\n".join(data_lines))
+        event, data_lines = None, []
 
 st.set_page_config(
     page_title="Medical AI Assistant",
@@ -79,7 +119,7 @@ col1, col2 = st.columns(2)
 with col1:
     image_file = st.file_uploader(
         "Upload MRI / X-ray / Scan Image",
-        type=["png", "jpg", "jpeg"]
+        type=["png", "jpg", "jpeg", "bmp", "tiff", "dcm"]
     )
 
 with col2:
@@ -93,68 +133,108 @@ user_query = st.text_input(
     placeholder="e.g. What does the report mention about troponin?"
 )
 
+# Follow-up questions reuse the backend session's imaging, reports
+# and intake instead of recomputing them
+if "session_id" not in st.session_state:
+    st.session_state.session_id = None
+
+if st.session_state.session_id:
+    st.caption(f"Continuing session `{st.session_state.session_id}`")
+    if st.button("🔄 Start New Session"):
+        st.session_state.session_id = None
+        st.rerun()
+
 # --------------------------------------------------
 # SUBMIT
 # --------------------------------------------------
 
 if st.button("🧠 Run Medical AI Analysis", type="primary"):
 
-    with st.spinner("Running medical AI pipeline..."):
-
-        image_path = None
-        reports_payload = []
+    image_blob_id = None
+    reports_payload = []
 
-        # Handle image
+    # Files go to /upload; /analyze only carries their blob ids, so
+    # the API need not share a filesystem with the UI
+    try:
         if image_file:
-            tmp_img = tempfile.NamedTemporaryFile(delete=False, suffix=".png")
-            tmp_img.write(image_file.read())
-            tmp_img.close()
-            image_path = tmp_img.name
+            image_blob_id = upload_file(image_file)
 
-        # Handle PDF
         if report_file:
-            import fitz
-            doc = fitz.open(stream=report_file.read(), filetype="pdf")
-            text = ""
-            for page in doc:
-                text += page.get_text()
-
             reports_payload.append({
-                "id": "report_1",
-                "text": text,
+                "id": report_file.name,
+                "blob_id": upload_file(report_file),
                 "source": report_file.name
             })
+    except (requests.RequestException, RuntimeError, ValueError) as e:
+        st.error(f"❌ Upload failed: {e}")
+        st.stop()
+
+    payload = {
+        "session_id": st.session_state.session_id,
+        "intake": intake_data,
+        "image_blob_id": image_blob_id,
+        "reports": reports_payload,
+        "user_query": user_query
+    }
 
-        payload = {
-            "intake": intake_data,
-            "image_path": image_path,
-            "reports": reports_payload,
-            "user_query": user_query
-        }
-
-        response = requests.post(API_URL, json=payload)
+    status_box = st.status("Running medical AI pipeline...", expanded=True)
+    rag_placeholder = st.empty()
+    guidance_placeholder = st.empty()
+    rag_answer = ""
+    result = None
+    error = None
 
+    with requests.post(STREAM_URL, json=payload, stream=True) as response:
         if response.status_code != 200:
-            st.error("❌ Backend error occurred.")
+            error = "Backend error occurred."
         else:
-            result = response.json()["data"]
-
-            st.success("✅ Analysis completed safely.")
-
-            # --------------------------------------------------
-            # RESULTS
-            # --------------------------------------------------
-
-            st.subheader("🧠 AI Medical Guidance")
-            st.markdown(result["final_output"]["final_output"])
-
-            with st.expander("📊 Structured Medical Context"):
-                st.json(result["patient_context"])
-
-            if result.get("imaging_findings"):
-                with st.expander("🖼 Imaging Observations"):
-                    st.json(result["imaging_findings"])
-
-            if result.get("uploaded_reports"):
-                with st.expander("📄 Report-Based Answers (RAG)"):
-                    st.json(result["uploaded_reports"])
+            for event, data in iter_sse(response):
+                if event == "stage":
+                    status_box.write(f"✔️ {STAGE_LABELS.get(data['stage'], data['stage'])}")
+                elif event == "token":
+                    if data["stage"] == "rag_report_agent":
+                        rag_answer += data["data"]
+                        rag_placeholder.markdown(
+                            f"**📄 Report answer (streaming)**\n\n{rag_answer}"
+                        )
+                    else:
+                        # Unchecked draft: never shown before the safety
+                        # agent has reviewed it
+                        guidance_placeholder.info(
+                            "🧠 Drafting guidance... it is shown once the safety review passes."
+                        )
+                elif event == "complete":
+                    result = data
+                    st.session_state.session_id = data.get("session_id")
+                elif event == "error":
+                    error = data.get("error", "Backend error occurred.")
+
+    # Streamed text is provisional; only the final result is displayed
+    rag_placeholder.empty()
+    guidance_placeholder.empty()
+
+    if error or result is None:
+        status_box.update(label="Pipeline failed", state="error")
+        st.error(f"❌ {error or 'Backend error occurred.'}")
+    else:
+        status_box.update(label="Pipeline complete", state="complete", expanded=False)
+
+        st.success("✅ Analysis completed safely.")
+
+        # --------------------------------------------------
+        # RESULTS
+        # --------------------------------------------------
+
+        st.subheader("🧠 AI Medical Guidance")
+        st.markdown(result["final_output"]["final_output"])
+
+        with st.expander("📊 Structured Medical Context"):
+            st.json(result["patient_context"])
+
+        if result.get("imaging_findings"):
+            with st.expander("🖼 Imaging Observations"):
+                st.json(result["imaging_findings"])
+
+        if result.get("uploaded_reports"):
+            with st.expander("📄 Report-Based Answers (RAG)"):
+                st.json(result["uploaded_reports"])
@@ -0,0 +1,139 @@
+import os
+from abc import ABC, abstractmethod
+from typing import List, Dict, Any, Optional, Tuple
+
+# "chroma" or "numpy"; see create_vector_store()
+VECTOR_STORE_BACKEND = os.environ.get("VECTOR_STORE_BACKEND", "chroma")
+
+# Partition keys: "<tenant>/<patient id>", or "<tenant>/session:<id>"
+# for sessions without a patient id
+_SESSION_MARKER = "/session:"
+
+
+class VectorStore(ABC):
+    """
+    Interface RAGReportAgent depends on.
+
+    Documents are chunk dicts ({"id", "text", "source", "metadata"});
+    query results are the chunk's metadata merged with "id", "text"
+    and "source". An optional `partition` key (see partition_key())
+    scopes every call to one patient's (or session's) chunks.
+    """
+
+    # --------------------------------------------------
+    # LIFECYCLE
+    # --------------------------------------------------
+
+    @abstractmethod
+    def open(self):
+        """
+        Load any persisted index. Safe to call repeatedly.
+        """
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        ...
+
+    # --------------------------------------------------
+    # INGEST DOCUMENTS
+    # --------------------------------------------------
+
+    @abstractmethod
+    def add_documents(
+        self,
+        documents: List[Dict[str, Any]],
+        partition: Optional[str] = None
+    ) -> int:
+        """
+        Add chunks not already stored (by id); returns how many were
+        embedded and added.
+        """
+
+    @abstractmethod
+    def remove_stale(
+        self,
+        report_id: str,
+        keep_ids: List[str],
+        partition: Optional[str] = None
+    ) -> int:
+        """
+        Delete a report's chunks that are not in `keep_ids`.
+        """
+
+    @abstractmethod
+    def documents(self, partition: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Every stored chunk in `partition`, in query-result form (used
+        to rebuild in-process indexes such as BM25 after a restart).
+        """
+
+    # --------------------------------------------------
+    # QUERY
+    # --------------------------------------------------
+
+    @abstractmethod
+    def query(
+        self,
+        query: str,
+        top_k: int = 3,
+        partition: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        ...
+
+    def query_many(
+        self,
+        queries: List[str],
+        top_k: int = 3,
+        partition: Optional[str] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Results for several queries, in order. Backends that can
+        search a batch at once override this.
+        """
+        return [self.query(q, top_k=top_k, partition=partition) for q in queries]
+
+
+def partition_key(partition: Optional[Dict[str, str]]) -> Optional[str]:
+    """
+    Vector-store partition for a tenant + patient (or, without a
+    patient id, the session). None means the shared collection.
+    """
+    if not partition:
+        return None
+    tenant = partition.get("tenant_id") or "default"
+    if partition.get("patient_id"):
+        return f"{tenant}/{partition['patient_id']}"
+    return f"{tenant}{_SESSION_MARKER}{partition.get('session_id')}"
+
+
+def split_session_partition(key: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """
+    (tenant key, session id) for a session-scoped key, else (key, None).
+
+    Sessions are short-lived and numerous, so backends keep their
+    chunks in the tenant's storage, filtered by session id, rather
+    than in storage of their own.
+    """
+    if key is not None and _SESSION_MARKER in key:
+        tenant, session_id = key.split(_SESSION_MARKER, 1)
+        return tenant, session_id
+    return key, None
+
+
+def create_vector_store(backend: Optional[str] = None, **kwargs) -> VectorStore:
+    """
+    Build the configured backend (VECTOR_STORE_BACKEND by default).
+    Backends are imported lazily so the NumPy store runs without
+    chromadb installed.
+    """
+
+    backend = (backend or VECTOR_STORE_BACKEND).lower()
+
+    if backend == "chroma":
+        from vector_store.chroma_store import ChromaVectorStore
+        return ChromaVectorStore(**kwargs)
+    if backend == "numpy":
+        from vector_store.numpy_store import NumpyVectorStore
+        return NumpyVectorStore(**kwargs)
+
+    raise ValueError(f"Unknown vector store backend: {backend!r}")
@@ -0,0 +1,279 @@
+import hashlib
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Partitions kept in memory (LRU); evicted ones are rebuilt on demand
+MAX_OPEN_PARTITIONS = 64
+
+# Queries with at most this many content terms, all of them indexed,
+# are answered lexically without embedding
+LEXICAL_MAX_TERMS = 3
+
+# Keeps lab names like "HbA1c", "NT-proBNP", "LDL-C" as one token
+_TERM_RE = re.compile(r"[a-z0-9]+(?:[-.][a-z0-9]+)*")
+
+_STOPWORDS = frozenset("""
+a about above after all also an and any are as at be been before being
+between both but by can could did do does doing during each for from had
+has have having he her here his how i if in into is it its me mention
+mentioned mentions more most my no not of on or other our patient report
+reports say says she should show shows so some state states such than
+that the their them then there these they this those to under up was we
+were what when where which while who why will with would you your
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    return _TERM_RE.findall(text.lower())
+
+
+def query_terms(query: str) -> List[str]:
+    """
+    Distinct content terms of a query, in order.
+    """
+    return list(dict.fromkeys(t for t in tokenize(query) if t not in _STOPWORDS))
+
+
+class _Postings:
+    """
+    One partition's inverted index.
+    """
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.lengths: Dict[str, int] = {}
+        self.docs: Dict[str, Dict[str, Any]] = {}
+        self.total_length = 0
+        self._fingerprint: Optional[str] = None
+
+    @property
+    def fingerprint(self) -> str:
+        # Chunk ids are content-addressed, so this changes exactly
+        # when the partition's report content does
+        if self._fingerprint is None:
+            digest = hashlib.sha256()
+            for doc_id in sorted(self.docs):
+                digest.update(doc_id.encode("utf-8") + b"\0")
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    def add(self, doc_id: str, doc: Dict[str, Any]):
+        if doc_id in self.docs:
+            # Same content address, same terms; refresh the payload only
+            self.docs[doc_id] = doc
+            return
+
+        counts = Counter(tokenize(doc["text"]))
+        for term, tf in counts.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+
+        length = sum(counts.values())
+        self.lengths[doc_id] = length
+        self.total_length += length
+        self.docs[doc_id] = doc
+        self._fingerprint = None
+
+    def remove(self, doc_id: str):
+        doc = self.docs.pop(doc_id, None)
+        if doc is None:
+            return
+
+        for term in set(tokenize(doc["text"])):
+            docs = self.postings.get(term)
+            if docs is not None:
+                docs.pop(doc_id, None)
+                if not docs:
+                    del self.postings[term]
+
+        self.total_length -= self.lengths.pop(doc_id)
+        self._fingerprint = None
+
+    def search(self, terms: List[str], top_k: int) -> List[Tuple[str, float]]:
+        n = len(self.docs)
+        if not n:
+            return []
+
+        avg_length = self.total_length / n
+        scores: Dict[str, float] = {}
+
+        for term in terms:
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            df = len(docs)
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for doc_id, tf in docs.items():
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+
+
+class BM25Index:
+    """
+    In-process BM25 inverted index over report chunks, kept alongside
+    the vector store and partitioned the same way.
+
+    The vector store stays the source of truth: a partition that is
+    not in memory (after a restart or an LRU eviction) is rebuilt from
+    `loader(partition)` on first use.
+    """
+
+    def __init__(
+        self,
+        loader: Optional[Callable[[Optional[str]], List[Dict[str, Any]]]] = None,
+        max_partitions: int = MAX_OPEN_PARTITIONS
+    ):
+        self.loader = loader
+        self.max_partitions = max_partitions
+        self._partitions: "OrderedDict[Optional[str], _Postings]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    # --------------------------------------------------
+    # INGEST DOCUMENTS
+    # --------------------------------------------------
+
+    def add_documents(
+        self,
+        documents: List[Dict[str, Any]],
+        partition: Optional[str] = None
+    ):
+        """
+        documents: chunk dicts as passed to VectorStore.add_documents()
+        """
+
+        with self._lock:
+            index = self._partition(partition)
+            for doc in documents:
+                index.add(doc["id"], {
+                    **doc.get("metadata", {}),
+                    "id": doc["id"],
+                    "text": doc["text"],
+                    "source": doc["source"]
+                })
+
+    def remove_stale(
+        self,
+        report_id: str,
+        keep_ids: List[str],
+        partition: Optional[str] = None
+    ):
+        keep = set(keep_ids)
+
+        with self._lock:
+            index = self._partition(partition)
+            stale = [
+                doc_id for doc_id, doc in index.docs.items()
+                if doc.get("report_id") == report_id and doc_id not in keep
+            ]
+            for doc_id in stale:
+                index.remove(doc_id)
+
+    # --------------------------------------------------
+    # QUERY
+    # --------------------------------------------------
+
+    def query(
+        self,
+        query: str,
+        top_k: int = 3,
+        partition: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Top-k chunks by BM25 score, in vector-store result form.
+        """
+
+        terms = query_terms(query)
+        if not terms:
+            return []
+
+        with self._lock:
+            index = self._partition(partition)
+            return [index.docs[doc_id] for doc_id, _ in index.search(terms, top_k)]
+
+    def is_lexical(self, query: str, partition: Optional[str] = None) -> bool:
+        """
+        True for short keyword queries ("troponin", "HbA1c trend")
+        whose content terms all occur in the partition; dense
+        retrieval adds little there, so embedding can be skipped.
+        """
+
+        terms = query_terms(query)
+        if not terms or len(terms) > LEXICAL_MAX_TERMS:
+            return False
+
+        with self._lock:
+            postings = self._partition(partition).postings
+            return all(term in postings for term in terms)
+
+    def key_terms(self, query: str, partition: Optional[str] = None) -> frozenset:
+        """
+        The query's terms that pin down what is asked: those that
+        occur in the partition's reports (lab and drug names, ...)
+        and any containing a digit ("day 3", "5.2").
+        """
+
+        terms = query_terms(query)
+        with self._lock:
+            postings = self._partition(partition).postings
+            return frozenset(
+                term for term in terms
+                if term in postings or any(c.isdigit() for c in term)
+            )
+
+    def fingerprint(self, partition: Optional[str] = None) -> str:
+        """
+        Hash of the partition's chunk ids (its current report set).
+        """
+        with self._lock:
+            return self._partition(partition).fingerprint
+
+    # --------------------------------------------------
+    # INTERNAL
+    # --------------------------------------------------
+
+    def _partition(self, partition: Optional[str]) -> _Postings:
+        # Caller holds self._lock
+        index = self._partitions.get(partition)
+        if index is not None:
+            self._partitions.move_to_end(partition)
+            return index
+
+        index = _Postings()
+        if self.loader is not None:
+            for doc in self.loader(partition):
+                index.add(doc["id"], doc)
+
+        self._partitions[partition] = index
+        while len(self._partitions) > self.max_partitions:
+            self._partitions.popitem(last=False)
+
+        return index
+
+
+def reciprocal_rank_fusion(
+    rankings: List[List[Dict[str, Any]]],
+    top_k: int,
+    k: int = 60
+) -> List[Dict[str, Any]]:
+    """
+    Merge ranked result lists by sum of 1 / (k + rank), keyed on
+    chunk id. Chunks ranked well by both lists rise to the top.
+    """
+
+    scores: Dict[str, float] = {}
+    docs: Dict[str, Dict[str, Any]] = {}
+
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            scores[doc["id"]] = scores.get(doc["id"], 0.0) + 1.0 / (k + rank)
+            docs.setdefault(doc["id"], doc)
+
+    best = sorted(scores, key=scores.get, reverse=True)[:top_k]
+    return [docs[doc_id] for doc_id in best]
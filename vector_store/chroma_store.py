@@ -1,83 +1,346 @@
-from typing import List, Dict
+from typing import List, Dict, Any, Optional
+from collections import OrderedDict
+import hashlib
+import threading
+import time
 import chromadb
 from chromadb.config import Settings
+from vector_store.base import VectorStore, split_session_partition
 from vector_store.embeddings import EmbeddingGenerator
 
+CHROMA_PATH = "./chroma_db"
 
-class ChromaVectorStore:
+# Open per-partition collection handles kept around (LRU)
+MAX_OPEN_PARTITIONS = 64
+
+# stats() keeps a running document count and only re-counts every
+# collection this often (it's served on /health)
+DOCUMENT_RECOUNT_SECONDS = 300
+
+
+class ChromaVectorStore(VectorStore):
     """
     ChromaDB wrapper for medical RAG.
+
+    Backed by an on-disk client at `persist_directory` (None for an
+    in-memory store), so embedded reports survive restarts. The
+    collection is opened lazily on first use, or eagerly via open().
+
+    Passing a `partition` key (e.g. one patient) to add/query routes
+    to a collection of its own, so searches only scan that
+    partition's chunks. Session-scoped partitions share their tenant's
+    collection, filtered by session id, so anonymous sessions don't
+    each leave a collection behind. Handles are pooled in a small LRU.
     """
 
-    def __init__(self, collection_name: str = "medical_reports"):
-        self.embedding_generator = EmbeddingGenerator()
+    def __init__(
+        self,
+        collection_name: str = "medical_reports",
+        persist_directory: Optional[str] = CHROMA_PATH,
+        embedding_generator: Optional[EmbeddingGenerator] = None
+    ):
+        self.embedding_generator = embedding_generator or EmbeddingGenerator()
+        self.collection_name = collection_name
+        self.persist_directory = persist_directory
+
+        self._client = None
+        self._collection = None
+        self._partitions: "OrderedDict[str, Any]" = OrderedDict()
+        self._open_lock = threading.Lock()
+        self.load_seconds: Optional[float] = None
+
+        # Running total across all collections; None until counted
+        self._document_count: Optional[int] = None
+        self._counted_at = 0.0
+        self._count_lock = threading.Lock()
+
+    # --------------------------------------------------
+    # LIFECYCLE
+    # --------------------------------------------------
+
+    @property
+    def client(self):
+        if self._client is None:
+            self.open()
+        return self._client
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            self.open()
+        return self._collection
+
+    def open(self):
+        """
+        Open the client and collection, loading the on-disk index.
+        Safe to call repeatedly; only the first call does work.
+        """
+
+        with self._open_lock:
+            if self._collection is not None:
+                return
+
+            started = time.perf_counter()
+            settings = Settings(anonymized_telemetry=False)
 
-        self.client = chromadb.Client(
-            Settings(
-                persist_directory="./chroma_db",
-                anonymized_telemetry=False
+            if self.persist_directory is None:
+                client = chromadb.Client(settings)
+            elif hasattr(chromadb, "PersistentClient"):
+                client = chromadb.PersistentClient(
+                    path=self.persist_directory,
+                    settings=settings
+                )
+            else:
+                # chromadb < 0.4
+                client = chromadb.Client(Settings(
+                    chroma_db_impl="duckdb+parquet",
+                    persist_directory=self.persist_directory,
+                    anonymized_telemetry=False
+                ))
+
+            collection = client.get_or_create_collection(
+                name=self.collection_name,
+                embedding_function=None  # we supply embeddings manually
             )
-        )
 
-        self.collection = self.client.get_or_create_collection(
-            name=collection_name,
-            embedding_function=None  # we supply embeddings manually
+            # Touch the indexes so load cost is paid here, not on first
+            # query: the shared collection and the most recent partitions
+            collection.count()
+            for name in self._partition_collection_names(client)[-MAX_OPEN_PARTITIONS:]:
+                handle = client.get_collection(name=name, embedding_function=None)
+                handle.count()
+                partition = (handle.metadata or {}).get("partition")
+                if partition is not None:
+                    self._partitions[partition] = handle
+
+            self._client = client
+            self._collection = collection
+            self.load_seconds = time.perf_counter() - started
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "chroma",
+            "path": self.persist_directory,
+            "collection": self.collection_name,
+            "documents": self._documents(),
+            "open_partitions": len(self._partitions),
+            "load_seconds": self.load_seconds
+        }
+
+    def _documents(self) -> int:
+        with self._count_lock:
+            stale = time.monotonic() - self._counted_at > DOCUMENT_RECOUNT_SECONDS
+            if self._document_count is None or stale:
+                # One count() per collection; also corrects drift from
+                # other processes writing to the same directory
+                self._document_count = self.collection.count() + sum(
+                    self.client.get_collection(name=name, embedding_function=None).count()
+                    for name in self._partition_collection_names(self.client)
+                )
+                self._counted_at = time.monotonic()
+            return self._document_count
+
+    def _count_change(self, delta: int):
+        with self._count_lock:
+            if self._document_count is not None:
+                self._document_count += delta
+
+    def _partition_collection_names(self, client) -> List[str]:
+        prefix = _partition_collection_name(self.collection_name, "")[:-24]
+        # chromadb >= 0.6 lists names; older versions list collections
+        names = [
+            c if isinstance(c, str) else c.name
+            for c in client.list_collections()
+        ]
+        return [name for name in names if name.startswith(prefix)]
+
+    def _scope(self, partition: Optional[str]):
+        """
+        (collection, where filter, stored-id prefix) for a partition.
+        Session chunks get their session id prefixed to their ids, as
+        two sessions can upload the same report into one collection.
+        """
+        collection_key, session_id = split_session_partition(partition)
+        collection = self._collection_for(collection_key)
+        if session_id is None:
+            return collection, None, ""
+        return collection, {"session_id": session_id}, f"{session_id}/"
+
+    def _collection_for(self, partition: Optional[str]):
+        if partition is None:
+            return self.collection
+
+        with self._open_lock:
+            handle = self._partitions.get(partition)
+            if handle is not None:
+                self._partitions.move_to_end(partition)
+                return handle
+
+        handle = self.client.get_or_create_collection(
+            name=_partition_collection_name(self.collection_name, partition),
+            metadata={"partition": partition},
+            embedding_function=None
         )
 
+        with self._open_lock:
+            self._partitions[partition] = handle
+            self._partitions.move_to_end(partition)
+            while len(self._partitions) > MAX_OPEN_PARTITIONS:
+                self._partitions.popitem(last=False)
+
+        return handle
+
+    def _persist(self):
+        # Only legacy clients need an explicit flush
+        persist = getattr(self.client, "persist", None)
+        if persist is not None and not hasattr(chromadb, "PersistentClient"):
+            persist()
+
     # --------------------------------------------------
     # INGEST DOCUMENTS
     # --------------------------------------------------
 
-    def add_documents(self, documents: List[Dict[str, str]]):
+    def add_documents(
+        self,
+        documents: List[Dict[str, Any]],
+        partition: Optional[str] = None
+    ) -> int:
         """
         documents: [
             {
                 "id": str,
                 "text": str,
-                "source": str
+                "source": str,
+                "metadata": {...}   # optional, e.g. page provenance
             }
         ]
+
+        Ids are treated as content addresses: documents whose id is
+        already stored are not re-embedded, only their metadata is
+        refreshed. Returns the number of newly embedded documents.
         """
 
-        texts = [doc["text"] for doc in documents]
-        embeddings = self.embedding_generator.embed_documents(texts)
+        if not documents:
+            return 0
 
-        ids = [doc["id"] for doc in documents]
-        metadatas = [{"source": doc["source"]} for doc in documents]
+        collection, _, prefix = self._scope(partition)
 
-        self.collection.add(
-            documents=texts,
-            embeddings=embeddings,
-            metadatas=metadatas,
-            ids=ids
-        )
+        # Last write wins for duplicate ids within one call
+        by_id = {prefix + doc["id"]: doc for doc in documents}
+        existing = set(collection.get(ids=list(by_id), include=[])["ids"])
 
-        self.client.persist()
+        fresh = [doc for doc_id, doc in by_id.items() if doc_id not in existing]
+        known = [doc for doc_id, doc in by_id.items() if doc_id in existing]
+
+        if known:
+            collection.update(
+                ids=[prefix + doc["id"] for doc in known],
+                metadatas=[_metadata(doc) for doc in known]
+            )
+
+        if fresh:
+            # One batched embedding pass for everything new
+            texts = [doc["text"] for doc in fresh]
+            # Chroma copies into its own storage; older versions only
+            # accept plain lists
+            embeddings = self.embedding_generator.embed_documents(texts).tolist()
+
+            collection.add(
+                documents=texts,
+                embeddings=embeddings,
+                metadatas=[_metadata(doc) for doc in fresh],
+                ids=[prefix + doc["id"] for doc in fresh]
+            )
+            self._count_change(len(fresh))
+
+        self._persist()
+        return len(fresh)
+
+    def remove_stale(
+        self,
+        report_id: str,
+        keep_ids: List[str],
+        partition: Optional[str] = None
+    ) -> int:
+        """
+        Delete a report's chunks that are not in `keep_ids`
+        (left over from a previous version of the report).
+        Returns the number of chunks removed.
+        """
+
+        collection, where, prefix = self._scope(partition)
+        if where is not None:
+            where = {"$and": [{"report_id": report_id}, where]}
+        else:
+            where = {"report_id": report_id}
+
+        stored = collection.get(where=where, include=[])["ids"]
+        keep = {prefix + doc_id for doc_id in keep_ids}
+        stale = [doc_id for doc_id in stored if doc_id not in keep]
+
+        if stale:
+            collection.delete(ids=stale)
+            self._count_change(-len(stale))
+            self._persist()
+
+        return len(stale)
 
     # --------------------------------------------------
     # QUERY
     # --------------------------------------------------
 
-    def query(self, query: str, top_k: int = 3) -> List[Dict[str, str]]:
+    def query(
+        self,
+        query: str,
+        top_k: int = 3,
+        partition: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
         """
-        Retrieve top-k relevant document chunks.
+        Retrieve top-k relevant document chunks, from `partition` only
+        when one is given.
         """
 
+        collection, where, prefix = self._scope(partition)
+        if collection.count() == 0:
+            return []
+
         query_embedding = self.embedding_generator.embed_query(query)
 
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=top_k
+        results = collection.query(
+            query_embeddings=[query_embedding.tolist()],
+            n_results=top_k,
+            where=where
         )
 
-        documents = results.get("documents", [[]])[0]
-        metadatas = results.get("metadatas", [[]])[0]
+        return [
+            _result(doc_id[len(prefix):], doc, meta)
+            for doc_id, doc, meta in zip(
+                results["ids"][0],
+                results.get("documents", [[]])[0],
+                results.get("metadatas", [[]])[0]
+            )
+        ]
+
+    def documents(self, partition: Optional[str] = None) -> List[Dict[str, Any]]:
+        collection, where, prefix = self._scope(partition)
+        stored = collection.get(where=where, include=["documents", "metadatas"])
+        return [
+            _result(doc_id[len(prefix):], doc, meta)
+            for doc_id, doc, meta in zip(
+                stored["ids"], stored["documents"], stored["metadatas"]
+            )
+        ]
+
+
+def _metadata(doc: Dict[str, Any]) -> Dict[str, Any]:
+    return {**doc.get("metadata", {}), "source": doc["source"]}
+
+
+def _result(doc_id: str, text: str, meta: Dict[str, Any]) -> Dict[str, Any]:
+    return {**meta, "id": doc_id, "text": text, "source": meta.get("source", "unknown")}
 
-        retrieved = []
-        for doc, meta in zip(documents, metadatas):
-            retrieved.append({
-                "text": doc,
-                "source": meta.get("source", "unknown")
-            })
 
-        return retrieved
+def _partition_collection_name(base: str, partition: str) -> str:
+    # Chroma names are limited to 3-63 chars of [a-zA-Z0-9._-]
+    digest = hashlib.sha256(partition.encode("utf-8")).hexdigest()[:24]
+    return f"{base[:30]}-p-{digest}"
@@ -0,0 +1,231 @@
+import fcntl
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+DEFAULT_CACHE_DIR = "./embedding_cache"
+MAX_MEMORY_ENTRIES = 4096
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Content-addressed, persistent embedding cache for one model.
+
+    Layout in `cache_dir`:
+    - <model>.f32   float32 vectors, one row per entry, append-only,
+                    read through a memory map
+    - <model>.index SQLite index: sha256(text) -> row number
+    - <model>.lock  flock held by writers, so processes sharing the
+                    directory never claim the same rows
+
+    A warm LRU sits in front of the files; get_many() probes the LRU
+    and then the index once for the whole batch.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        cache_dir: str = DEFAULT_CACHE_DIR,
+        max_memory_entries: int = MAX_MEMORY_ENTRIES
+    ):
+        os.makedirs(cache_dir, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9_.-]", "_", model)
+
+        self.model = model
+        self.max_memory_entries = max_memory_entries
+        self.vectors_path = os.path.join(cache_dir, f"{slug}.f32")
+        self.lock_path = os.path.join(cache_dir, f"{slug}.lock")
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._mmap: Optional[np.memmap] = None
+
+        self._index = sqlite3.connect(
+            os.path.join(cache_dir, f"{slug}.index"),
+            check_same_thread=False
+        )
+        self._index.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "hash TEXT PRIMARY KEY, row INTEGER NOT NULL)"
+        )
+        self._index.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+        )
+        self._index.commit()
+
+        self.dim: Optional[int] = self._stored_dim()
+
+        self.hits = 0
+        self.misses = 0
+
+    # --------------------------------------------------
+    # ACCESS
+    # --------------------------------------------------
+
+    def get_many(self, hashes: Sequence[str]) -> Dict[str, np.ndarray]:
+        """
+        Returns {hash: vector} for every hash already cached.
+        """
+
+        found: Dict[str, np.ndarray] = {}
+
+        with self._lock:
+            missing = []
+            for h in hashes:
+                vector = self._memory.get(h)
+                if vector is not None:
+                    self._memory.move_to_end(h)
+                    found[h] = vector
+                elif h not in found:
+                    missing.append(h)
+
+            if missing and self.dim is None:
+                # Another process may have written the first entries
+                self.dim = self._stored_dim()
+
+            if missing and self.dim is not None:
+                rows = self._lookup_rows(missing)
+                if rows:
+                    vectors = self._vectors()
+                    for h, row in rows.items():
+                        vector = np.array(vectors[row])
+                        found[h] = vector
+                        self._remember(h, vector)
+
+            self.hits += sum(1 for h in hashes if h in found)
+            self.misses += sum(1 for h in hashes if h not in found)
+
+        return found
+
+    def put_many(self, entries: Dict[str, Sequence[float]]):
+        """
+        Persist new {hash: vector} entries.
+        """
+
+        if not entries:
+            return
+
+        with self._lock:
+            new = {
+                h: np.asarray(v, dtype=np.float32)
+                for h, v in entries.items()
+                if h not in self._memory
+            }
+            if not new:
+                return
+
+            # Other processes append to the same files: everything from
+            # reading the row count to committing the index is one
+            # critical section
+            with open(self.lock_path, "a") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    self._append(new)
+                finally:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+            for h, vector in new.items():
+                self._remember(h, vector)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "memory_entries": len(self._memory),
+                "disk_entries": self._row_count()
+            }
+
+    # --------------------------------------------------
+    # INTERNAL
+    # --------------------------------------------------
+
+    def _append(self, new: Dict[str, np.ndarray]):
+        # Caller holds self._lock and the file lock
+        known = self._lookup_rows(list(new))
+        new = {h: v for h, v in new.items() if h not in known}
+        if not new:
+            return
+
+        if self.dim is None:
+            # Another process may have fixed the dimension meanwhile
+            self.dim = self._stored_dim() or len(next(iter(new.values())))
+            self._index.execute(
+                "INSERT OR REPLACE INTO meta VALUES ('dim', ?)",
+                (str(self.dim),)
+            )
+
+        matrix = np.stack(list(new.values())).astype(np.float32, copy=False)
+        if matrix.shape[1] != self.dim:
+            raise ValueError(
+                f"Embedding dimension {matrix.shape[1]} does not match "
+                f"cache dimension {self.dim} for model {self.model}"
+            )
+
+        # Vectors first, then the index, so the index never points
+        # past the end of the file
+        start = self._row_count()
+        with open(self.vectors_path, "ab") as f:
+            # Drop a torn row left by a writer that died mid-append;
+            # appending after it would shift every later row
+            f.truncate(start * self.dim * 4)
+            f.write(matrix.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+        self._index.executemany(
+            "INSERT OR IGNORE INTO entries VALUES (?, ?)",
+            [(h, start + i) for i, h in enumerate(new)]
+        )
+        self._index.commit()
+
+    def _stored_dim(self) -> Optional[int]:
+        row = self._index.execute(
+            "SELECT value FROM meta WHERE key = 'dim'"
+        ).fetchone()
+        return int(row[0]) if row else None
+
+    def _lookup_rows(self, hashes: List[str]) -> Dict[str, int]:
+        rows: Dict[str, int] = {}
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(hashes), 500):
+            chunk = hashes[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows.update(self._index.execute(
+                f"SELECT hash, row FROM entries WHERE hash IN ({placeholders})",
+                chunk
+            ).fetchall())
+        return rows
+
+    def _row_count(self) -> int:
+        # Whole rows only; a trailing partial row is ignored
+        if self.dim is None or not os.path.exists(self.vectors_path):
+            return 0
+        return os.path.getsize(self.vectors_path) // (self.dim * 4)
+
+    def _vectors(self) -> np.memmap:
+        rows = self._row_count()
+        # Re-map only when the file has grown past the current mapping
+        if self._mmap is None or self._mmap.shape[0] < rows:
+            self._mmap = np.memmap(
+                self.vectors_path,
+                dtype=np.float32,
+                mode="r",
+                shape=(rows, self.dim)
+            )
+        return self._mmap
+
+    def _remember(self, h: str, vector: np.ndarray):
+        self._memory[h] = vector
+        self._memory.move_to_end(h)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
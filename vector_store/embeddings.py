@@ -1,27 +1,90 @@
-from typing import List
+import os
+from typing import List, Optional
+
+import numpy as np
+
 from llm.ollama_client import OllamaClient
+from vector_store.embedding_cache import EmbeddingCache, DEFAULT_CACHE_DIR, text_hash
+from vector_store.local_embeddings import LocalEmbeddingModel
+
+# "ollama" (HTTP, shares the Ollama queue) or "local" (in-process
+# sentence-transformers on CPU)
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "ollama")
 
 
 class EmbeddingGenerator:
     """
-    Generates embeddings using a local Ollama embedding model.
+    Generates embeddings with Ollama or a local sentence-transformers
+    model, per EMBEDDING_BACKEND (or `backend`). The two backends use
+    different models, so switching needs a freshly built vector index.
+
+    Embeddings are cached on disk by (model, sha256 of text), so
+    re-uploaded reports and repeated questions are not re-embedded.
+    Pass cache_dir=None to disable the cache.
     """
 
-    def __init__(self):
-        self.client = OllamaClient()
+    def __init__(
+        self,
+        batch_size: Optional[int] = None,
+        cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+        backend: Optional[str] = None
+    ):
+        backend = (backend or EMBEDDING_BACKEND).lower()
+        if backend == "ollama":
+            self.client = OllamaClient()
+        elif backend == "local":
+            self.client = LocalEmbeddingModel()
+        else:
+            raise ValueError(f"Unknown embedding backend: {backend!r}")
+
+        self.backend = backend
+        self.batch_size = batch_size
+        self.cache = (
+            EmbeddingCache(self.client.embedding_model, cache_dir)
+            if cache_dir else None
+        )
+
+    def load(self):
+        """
+        Load a local model up front; no-op for Ollama.
+        """
+        if self.backend == "local":
+            self.client.load()
 
-    def embed_documents(self, documents: List[str]) -> List[List[float]]:
+    def embed_documents(self, documents: List[str]) -> np.ndarray:
         """
-        Convert a list of documents into embeddings.
+        Convert a list of documents into a (len(documents), dim)
+        float32 array. Batched (or concurrent) under the hood; order
+        is preserved. Only texts missing from the cache are sent to
+        the model.
         """
         if not documents:
-            return []
+            return np.empty((0, 0), dtype=np.float32)
+
+        if self.cache is None:
+            return self.client.embed_texts(documents, batch_size=self.batch_size)
+
+        hashes = [text_hash(doc) for doc in documents]
+        cached = self.cache.get_many(hashes)
+
+        # Embed each distinct missing text once
+        missing = {}
+        for h, doc in zip(hashes, documents):
+            if h not in cached and h not in missing:
+                missing[h] = doc
+
+        if missing:
+            embedded = self.client.embed_texts(
+                list(missing.values()), batch_size=self.batch_size
+            )
+            fresh = dict(zip(missing.keys(), embedded))
+            self.cache.put_many(fresh)
+            cached.update(fresh)
 
-        return self.client.embed_texts(documents)
+        return np.stack([cached[h] for h in hashes]).astype(np.float32, copy=False)
 
-    def embed_query(self, query: str) -> List[float]:
+    def embed_query(self, query: str) -> np.ndarray:
         """
         Embed a single query string.
         """
-        embeddings = self.client.embed_texts([query])
-        return embeddings[0]
+        return self.embed_documents([query])[0]
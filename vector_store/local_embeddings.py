@@ -0,0 +1,87 @@
+import os
+import threading
+from typing import List, Optional
+
+import numpy as np
+
+LOCAL_EMBEDDING_MODEL = os.environ.get("LOCAL_EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+LOCAL_EMBED_BATCH_SIZE = 32
+# 0 leaves torch's default (all cores)
+LOCAL_EMBED_THREADS = int(os.environ.get("LOCAL_EMBED_THREADS", "0"))
+
+
+class LocalEmbeddingModel:
+    """
+    CPU-local sentence-transformers model with the same embed_texts()
+    interface as OllamaClient, so embedding never waits behind text
+    and vision generations in the Ollama queue.
+
+    The model is loaded on first use (or via load()); sentence-
+    transformers is only imported then.
+    """
+
+    def __init__(
+        self,
+        model_name: str = LOCAL_EMBEDDING_MODEL,
+        batch_size: int = LOCAL_EMBED_BATCH_SIZE,
+        num_threads: int = LOCAL_EMBED_THREADS,
+        device: str = "cpu"
+    ):
+        self.model_name = model_name
+        # Namespaced so cached vectors never mix with an Ollama model's
+        self.embedding_model = f"local-{model_name}"
+        self.batch_size = batch_size
+        self.num_threads = num_threads
+        self.device = device
+
+        self._model = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """
+        Load the model. Safe to call repeatedly; only the first call
+        does work.
+        """
+
+        with self._lock:
+            if self._model is not None:
+                return
+
+            try:
+                from sentence_transformers import SentenceTransformer
+            except ImportError as e:
+                raise RuntimeError(
+                    "EMBEDDING_BACKEND=local requires the sentence-transformers package"
+                ) from e
+
+            if self.num_threads:
+                import torch
+                torch.set_num_threads(self.num_threads)
+
+            self._model = SentenceTransformer(self.model_name, device=self.device)
+
+    def embed_texts(
+        self,
+        texts: List[str],
+        batch_size: Optional[int] = None
+    ) -> np.ndarray:
+        """
+        (len(texts), dim) float32 embeddings, in input order.
+        """
+
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+
+        self.load()
+
+        # One forward pass at a time; a single model already uses
+        # every configured thread
+        with self._lock:
+            embeddings = self._model.encode(
+                texts,
+                batch_size=batch_size or self.batch_size,
+                convert_to_numpy=True,
+                show_progress_bar=False
+            )
+
+        return np.asarray(embeddings, dtype=np.float32)
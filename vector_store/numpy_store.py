@@ -0,0 +1,606 @@
+from typing import List, Dict, Any, Optional, Tuple
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from vector_store.base import VectorStore, split_session_partition
+from vector_store.embeddings import EmbeddingGenerator
+
+NUMPY_STORE_PATH = "./numpy_index"
+
+# How vectors are held for scanning: "float32" (exact), "float16" or
+# "int8" (per-row scalar quantization). Quantized scans are re-scored
+# exactly against float32 vectors read from disk.
+VECTOR_STORAGE = os.environ.get("VECTOR_STORAGE", "float32")
+STORAGE_DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+
+# Quantized scans keep top_k * RESCORE_FACTOR candidates for re-scoring
+RESCORE_FACTOR = 4
+
+# Rows dequantized per step while scanning, to bound temporary memory
+SCAN_BLOCK_ROWS = 8192
+
+# Loaded partitions kept in memory (LRU); only evicted when persisted
+MAX_OPEN_PARTITIONS = 64
+
+# Initial row capacity of a partition's matrix; doubles as it fills
+INITIAL_CAPACITY = 256
+
+_DEFAULT_PARTITION = "__default__"
+
+
+class _Partition:
+    """
+    One partition's chunks: a contiguous matrix of row-normalized
+    vectors in the storage dtype plus parallel id / text / metadata
+    lists. Quantized partitions also keep per-row int8 scales and the
+    exact float32 vectors (memory-mapped once persisted).
+    """
+
+    def __init__(self, storage: str = "float32"):
+        self.storage = storage
+        self.ids: List[str] = []
+        self.texts: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        self.rows: Dict[str, int] = {}
+        self.codes: Optional[np.ndarray] = None
+        self.scales: Optional[np.ndarray] = None
+        self.full: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def quantized(self) -> bool:
+        return self.storage != "float32"
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """
+        Exact float32 vectors.
+        """
+        return (self.full if self.quantized else self.codes)[:len(self.ids)]
+
+    def nbytes(self) -> int:
+        # Resident scan index only; memory-mapped float32 is paged in on demand
+        size = len(self.ids)
+        total = 0 if self.codes is None else self.codes[:size].nbytes
+        if self.scales is not None:
+            total += self.scales[:size].nbytes
+        if self.quantized and self.full is not None and not isinstance(self.full, np.memmap):
+            total += self.full[:size].nbytes
+        return total
+
+    def append(
+        self,
+        ids: List[str],
+        texts: List[str],
+        metadatas: List[Dict[str, Any]],
+        vectors: np.ndarray
+    ):
+        size, needed = len(self.ids), len(self.ids) + len(ids)
+        dim = vectors.shape[1]
+
+        codes, scales = _encode(vectors, self.storage)
+        self.codes = _reserve(self.codes, size, needed, dim, STORAGE_DTYPES[self.storage])
+        self.codes[size:needed] = codes
+        if scales is not None:
+            self.scales = _reserve(self.scales, size, needed, None, np.float32)
+            self.scales[size:needed] = scales
+        if self.quantized:
+            self.full = _reserve(self.full, size, needed, dim, np.float32)
+            self.full[size:needed] = vectors
+
+        for offset, doc_id in enumerate(ids):
+            self.rows[doc_id] = size + offset
+        self.ids.extend(ids)
+        self.texts.extend(texts)
+        self.metadatas.extend(metadatas)
+
+    def delete(self, ids: List[str]):
+        drop = {self.rows[doc_id] for doc_id in ids if doc_id in self.rows}
+        if not drop:
+            return
+
+        size = len(self.ids)
+        keep = [row for row in range(size) if row not in drop]
+        self.codes = np.ascontiguousarray(self.codes[:size][keep])
+        if self.scales is not None:
+            self.scales = np.ascontiguousarray(self.scales[:size][keep])
+        if self.full is not None:
+            self.full = np.ascontiguousarray(self.full[:size][keep])
+        self.ids = [self.ids[row] for row in keep]
+        self.texts = [self.texts[row] for row in keep]
+        self.metadatas = [self.metadatas[row] for row in keep]
+        self.rows = {doc_id: row for row, doc_id in enumerate(self.ids)}
+
+    def result(self, row: int) -> Dict[str, Any]:
+        meta = self.metadatas[row]
+        return {
+            **meta,
+            "id": self.ids[row],
+            "text": self.texts[row],
+            "source": meta.get("source", "unknown")
+        }
+
+    def search(
+        self,
+        queries: np.ndarray,
+        k: int,
+        rows: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Row indices of the k best rows per (normalized) query, best
+        first. Quantized partitions scan the compact codes, then
+        re-score the best top_k * RESCORE_FACTOR candidates exactly.
+        `rows` limits the search to those rows (one session's chunks).
+        """
+
+        index = slice(0, len(self.ids)) if rows is None else rows
+        codes = self.codes[index]
+
+        if not self.quantized:
+            top = _top_k(queries @ codes.T, k)
+        else:
+            size = len(codes)
+            scales = None if self.scales is None else self.scales[index]
+            scores = np.empty((len(queries), size), dtype=np.float32)
+            for start in range(0, size, SCAN_BLOCK_ROWS):
+                end = min(size, start + SCAN_BLOCK_ROWS)
+                block = queries @ codes[start:end].astype(np.float32).T
+                if scales is not None:
+                    block *= scales[start:end]
+                scores[:, start:end] = block
+
+            candidates = _top_k(scores, k * RESCORE_FACTOR)
+            exact = np.einsum("qd,qcd->qc", queries, self.vectors[index][candidates])
+            top = np.take_along_axis(candidates, _top_k(exact, k), axis=1)
+
+        return top if rows is None else rows[top]
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    In-process brute-force vector store.
+
+    Each partition is a contiguous float32 matrix of L2-normalized
+    embeddings; a query is one matrix-vector product plus an
+    argpartition top-k, which beats an ANN index for the few hundred
+    chunks a patient or session has.
+
+    With a `persist_directory`, every partition is written to
+    <dir>/<collection>/<partition hash>/ (vectors.f32 + records.json)
+    after each change and memory-mapped read-only on load.
+
+    Session partitions live in their tenant's partition, filtered by
+    "session_id" metadata, with the session id prefixed to their ids
+    (see ChromaVectorStore._scope()).
+
+    `storage` ("float32", "float16", "int8") picks the dtype scanned
+    at query time; quantized modes re-score candidates against the
+    float32 vectors. They only shrink memory with a persist_directory,
+    since the float32 copy then lives on disk rather than in RAM.
+    """
+
+    def __init__(
+        self,
+        collection_name: str = "medical_reports",
+        persist_directory: Optional[str] = NUMPY_STORE_PATH,
+        storage: str = VECTOR_STORAGE,
+        embedding_generator: Optional[EmbeddingGenerator] = None
+    ):
+        if storage not in STORAGE_DTYPES:
+            raise ValueError(f"Unknown vector storage: {storage!r}")
+
+        self.embedding_generator = embedding_generator or EmbeddingGenerator()
+        self.collection_name = collection_name
+        self.persist_directory = persist_directory
+        self.storage = storage
+
+        self._partitions: "OrderedDict[str, _Partition]" = OrderedDict()
+        self._lock = threading.RLock()
+        self.load_seconds: Optional[float] = None
+
+    # --------------------------------------------------
+    # LIFECYCLE
+    # --------------------------------------------------
+
+    def open(self):
+        """
+        Load the shared (unpartitioned) index. Partitions load on
+        first use.
+        """
+
+        with self._lock:
+            if self.load_seconds is not None:
+                return
+            started = time.perf_counter()
+            self._partition(None)
+            self.load_seconds = time.perf_counter() - started
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": "numpy",
+                "path": self.persist_directory,
+                "collection": self.collection_name,
+                "storage": self.storage,
+                "documents": self._document_count(),
+                "open_partitions": len(self._partitions) - 1,
+                "index_bytes": sum(part.nbytes() for part in self._partitions.values()),
+                "load_seconds": self.load_seconds
+            }
+
+    # --------------------------------------------------
+    # INGEST DOCUMENTS
+    # --------------------------------------------------
+
+    def add_documents(
+        self,
+        documents: List[Dict[str, Any]],
+        partition: Optional[str] = None
+    ) -> int:
+        """
+        Embeds and adds chunks whose ids are not stored yet; chunks
+        already stored only have their metadata refreshed.
+        """
+
+        if not documents:
+            return 0
+
+        partition, prefix = self._scope(partition)
+
+        with self._lock:
+            part = self._partition(partition)
+
+            by_id = {prefix + doc["id"]: doc for doc in documents}
+            fresh = [(doc_id, doc) for doc_id, doc in by_id.items() if doc_id not in part.rows]
+
+            changed = False
+            for doc_id, doc in by_id.items():
+                row = part.rows.get(doc_id)
+                if row is not None and part.metadatas[row] != _metadata(doc):
+                    part.metadatas[row] = _metadata(doc)
+                    changed = True
+
+        if fresh:
+            # Embed outside the lock; it's the slow part
+            vectors = _normalize(
+                self.embedding_generator.embed_documents([doc["text"] for _, doc in fresh])
+            )
+
+        with self._lock:
+            part = self._partition(partition)
+            if fresh:
+                # Another thread may have added some of these meanwhile
+                keep = [i for i, (doc_id, _) in enumerate(fresh) if doc_id not in part.rows]
+                fresh = [fresh[i] for i in keep]
+                if fresh:
+                    part.append(
+                        [doc_id for doc_id, _ in fresh],
+                        [doc["text"] for _, doc in fresh],
+                        [_metadata(doc) for _, doc in fresh],
+                        vectors[keep]
+                    )
+            if fresh or changed:
+                self._save(partition, part)
+
+        return len(fresh)
+
+    def remove_stale(
+        self,
+        report_id: str,
+        keep_ids: List[str],
+        partition: Optional[str] = None
+    ) -> int:
+        """
+        Delete a report's chunks that are not in `keep_ids`.
+        Returns the number of chunks removed.
+        """
+
+        session_id = split_session_partition(partition)[1]
+        partition, prefix = self._scope(partition)
+        keep = {prefix + doc_id for doc_id in keep_ids}
+
+        with self._lock:
+            part = self._partition(partition)
+            stale = [
+                doc_id for doc_id, meta in zip(part.ids, part.metadatas)
+                if meta.get("report_id") == report_id
+                and doc_id not in keep
+                and (session_id is None or meta.get("session_id") == session_id)
+            ]
+            if stale:
+                part.delete(stale)
+                self._save(partition, part)
+
+        return len(stale)
+
+    # --------------------------------------------------
+    # QUERY
+    # --------------------------------------------------
+
+    def query(
+        self,
+        query: str,
+        top_k: int = 3,
+        partition: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Retrieve top-k chunks by cosine similarity.
+        """
+        return self.query_many([query], top_k=top_k, partition=partition)[0]
+
+    def query_many(
+        self,
+        queries: List[str],
+        top_k: int = 3,
+        partition: Optional[str] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Batched search: all queries are embedded together and scored
+        with a single matrix product.
+        """
+
+        if not queries:
+            return []
+
+        session_id = split_session_partition(partition)[1]
+        partition, prefix = self._scope(partition)
+
+        with self._lock:
+            part = self._partition(partition)
+            if not len(part):
+                return [[] for _ in queries]
+
+        embedded = _normalize(self.embedding_generator.embed_documents(queries))
+
+        with self._lock:
+            part = self._partition(partition)
+            rows = _session_rows(part, session_id)
+            if not len(part) or (rows is not None and not len(rows)):
+                return [[] for _ in queries]
+            top_rows = part.search(embedded, top_k, rows=rows)
+            return [[_result(part, row, prefix) for row in top] for top in top_rows]
+
+    def documents(self, partition: Optional[str] = None) -> List[Dict[str, Any]]:
+        session_id = split_session_partition(partition)[1]
+        partition, prefix = self._scope(partition)
+
+        with self._lock:
+            part = self._partition(partition)
+            rows = _session_rows(part, session_id)
+            return [
+                _result(part, row, prefix)
+                for row in (range(len(part)) if rows is None else rows)
+            ]
+
+    # --------------------------------------------------
+    # INTERNAL
+    # --------------------------------------------------
+
+    def _scope(self, partition: Optional[str]) -> Tuple[Optional[str], str]:
+        """
+        (stored partition, stored-id prefix). Session chunks are kept
+        in the tenant's partition, so anonymous sessions don't each
+        leave a directory behind.
+        """
+        tenant_key, session_id = split_session_partition(partition)
+        if session_id is None:
+            return tenant_key, ""
+        return tenant_key, f"{session_id}/"
+
+    def _partition(self, partition: Optional[str]) -> _Partition:
+        # Caller holds self._lock
+        key = partition or _DEFAULT_PARTITION
+
+        part = self._partitions.get(key)
+        if part is not None:
+            self._partitions.move_to_end(key)
+            return part
+
+        part = self._load(key)
+        self._partitions[key] = part
+
+        if self.persist_directory is not None:
+            # In-memory partitions can't be reloaded, so only evict
+            # persisted ones; the shared partition stays resident
+            while len(self._partitions) > MAX_OPEN_PARTITIONS + 1:
+                oldest = next(k for k in self._partitions if k != _DEFAULT_PARTITION)
+                del self._partitions[oldest]
+
+        return part
+
+    def _document_count(self) -> int:
+        # Caller holds self._lock. Loaded partitions, plus persisted
+        # ones sized from their vector files without loading them
+        self._partition(None)
+        count = sum(len(part) for part in self._partitions.values())
+        if self.persist_directory is None:
+            return count
+
+        loaded = {self._directory(key) for key in self._partitions}
+        root = os.path.join(self.persist_directory, self.collection_name)
+        dim = next((part.vectors.shape[1] for part in self._partitions.values() if len(part)), None)
+
+        for name in os.listdir(root) if os.path.isdir(root) else []:
+            directory = os.path.join(root, name)
+            vectors_path = os.path.join(directory, "vectors.f32")
+            if directory in loaded or not os.path.exists(vectors_path):
+                continue
+            if dim is None:
+                with open(os.path.join(directory, "records.json"), "r", encoding="utf-8") as f:
+                    count += len(json.load(f)["ids"])
+                continue
+            count += os.path.getsize(vectors_path) // (dim * 4)
+
+        return count
+
+    def _directory(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:24]
+        return os.path.join(self.persist_directory, self.collection_name, digest)
+
+    def _load(self, key: str) -> _Partition:
+        part = _Partition(self.storage)
+        if self.persist_directory is None:
+            return part
+
+        directory = self._directory(key)
+        records_path = os.path.join(directory, "records.json")
+        vectors_path = os.path.join(directory, "vectors.f32")
+        if not os.path.exists(records_path):
+            return part
+
+        with open(records_path, "r", encoding="utf-8") as f:
+            records = json.load(f)
+
+        count, dim = len(records["ids"]), records["dim"]
+        if count == 0 or os.path.getsize(vectors_path) < count * dim * 4:
+            # Empty, or a torn write; start over and let ingest re-fill it
+            return part
+
+        vectors = np.memmap(vectors_path, dtype=np.float32, mode="r", shape=(count, dim))
+        codes_path = os.path.join(directory, f"codes.{self.storage}")
+
+        if not part.quantized:
+            part.codes = vectors
+        elif records.get("storage") == self.storage and os.path.exists(codes_path):
+            part.full = vectors
+            part.codes = np.fromfile(codes_path, dtype=STORAGE_DTYPES[self.storage]).reshape(count, dim)
+            if self.storage == "int8":
+                part.scales = np.fromfile(os.path.join(directory, "scales.f32"), dtype=np.float32)
+        else:
+            # Stored under another mode; re-encode from the exact vectors
+            part.full = vectors
+            part.codes, part.scales = _encode(np.asarray(vectors), self.storage)
+
+        part.ids = records["ids"]
+        part.texts = records["texts"]
+        part.metadatas = records["metadatas"]
+        part.rows = {doc_id: row for row, doc_id in enumerate(part.ids)}
+        return part
+
+    def _save(self, partition: Optional[str], part: _Partition):
+        if self.persist_directory is None:
+            return
+
+        directory = self._directory(partition or _DEFAULT_PARTITION)
+        os.makedirs(directory, exist_ok=True)
+
+        size = len(part)
+        vectors = part.vectors if size else np.empty((0, 0), dtype=np.float32)
+        records = {
+            "partition": partition,
+            "storage": self.storage,
+            "dim": int(vectors.shape[1]),
+            "ids": part.ids,
+            "texts": part.texts,
+            "metadatas": part.metadatas
+        }
+
+        # Arrays first, then records, each replaced atomically; a
+        # crash in between leaves records that _load() rejects or
+        # re-encodes
+        vectors_path = os.path.join(directory, "vectors.f32")
+        _write_atomic(vectors_path, vectors)
+        if part.quantized and size:
+            _write_atomic(os.path.join(directory, f"codes.{self.storage}"), part.codes[:size])
+            if part.scales is not None:
+                _write_atomic(os.path.join(directory, "scales.f32"), part.scales[:size])
+
+        records_path = os.path.join(directory, "records.json")
+        with open(records_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(records, f)
+        os.replace(records_path + ".tmp", records_path)
+
+        if part.quantized and size:
+            # Exact vectors are only read for re-scoring; leave them on disk
+            part.full = np.memmap(
+                vectors_path, dtype=np.float32, mode="r", shape=vectors.shape
+            )
+
+
+def _session_rows(part: _Partition, session_id: Optional[str]) -> Optional[np.ndarray]:
+    # None: every row
+    if session_id is None:
+        return None
+    return np.asarray(
+        [row for row, meta in enumerate(part.metadatas) if meta.get("session_id") == session_id],
+        dtype=np.intp
+    )
+
+
+def _result(part: _Partition, row: int, prefix: str) -> Dict[str, Any]:
+    result = part.result(row)
+    result["id"] = result["id"][len(prefix):]
+    return result
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    # float64 queries would upcast the whole matrix on every search
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Column indices of the k highest scores per row, best first.
+    """
+
+    k = min(k, scores.shape[1])
+
+    if k < scores.shape[1]:
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+
+    order = np.argsort(-np.take_along_axis(scores, candidates, axis=1), axis=1)
+    return np.take_along_axis(candidates, order, axis=1)
+
+
+def _encode(vectors: np.ndarray, storage: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    (codes, per-row scales) for normalized float32 vectors. Only int8
+    has scales: symmetric, max-abs per row.
+    """
+
+    if storage == "int8":
+        scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127.0
+        codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return codes, scales.astype(np.float32)
+    return vectors.astype(STORAGE_DTYPES[storage]), None
+
+
+def _reserve(
+    buffer: Optional[np.ndarray],
+    size: int,
+    needed: int,
+    dim: Optional[int],
+    dtype
+) -> np.ndarray:
+    # Grow (or copy a read-only memmap) into a writable buffer
+    capacity = 0 if buffer is None else buffer.shape[0]
+    if needed <= capacity and buffer.flags.writeable:
+        return buffer
+
+    capacity = max(INITIAL_CAPACITY, needed, 2 * capacity)
+    grown = np.empty((capacity,) if dim is None else (capacity, dim), dtype=dtype)
+    if size:
+        grown[:size] = buffer[:size]
+    return grown
+
+
+def _write_atomic(path: str, array: np.ndarray):
+    with open(path + ".tmp", "wb") as f:
+        f.write(np.ascontiguousarray(array).tobytes())
+    os.replace(path + ".tmp", path)
+
+
+def _metadata(doc: Dict[str, Any]) -> Dict[str, Any]:
+    return {**doc.get("metadata", {}), "source": doc["source"]}